@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from .authentication import revoke_tokens
 from .models import CustomUser
 
 
@@ -9,6 +10,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('is_staff', 'is_superuser', 'is_active')
     search_fields = ('phone_number', 'username', 'email')
     ordering = ('-date_joined',)
+    actions = ['revoke_user_tokens']
     
     fieldsets = (
         (None, {'fields': ('phone_number', 'username', 'password')}),
@@ -23,3 +25,9 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('phone_number', 'username', 'password1', 'password2'),
         }),
     )
+    
+    @admin.action(description='ابطال همه توکن‌های کاربران انتخاب‌شده')
+    def revoke_user_tokens(self, request, queryset):
+        for user_id in queryset.values_list('pk', flat=True):
+            revoke_tokens(user_id)
+        self.message_user(request, 'توکن‌های کاربران انتخاب‌شده باطل شد')
@@ -0,0 +1,8 @@
+from django.urls import path
+from .async_views import AsyncRequestOTPView, AsyncVerifyOTPView, AsyncProfileView
+
+urlpatterns = [
+    path('auth/register/', AsyncRequestOTPView.as_view(), name='async-request-otp'),
+    path('auth/verify/', AsyncVerifyOTPView.as_view(), name='async-verify-otp'),
+    path('auth/profile/', AsyncProfileView.as_view(), name='async-profile'),
+]
@@ -0,0 +1,106 @@
+import secrets
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core.async_views import AsyncAPIView, json_response
+from .otp_store import (
+    get_otp_store, LOCK_DURATION_MINUTES,
+    OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_LOCKED_NOW,
+)
+from .sms import aenqueue_sms
+from .serializers import RequestOTPSerializer, VerifyOTPSerializer, ProfileSerializer
+from .tokens import aissue_tokens
+
+User = get_user_model()
+
+
+class AsyncRequestOTPView(AsyncAPIView):
+    """Async (ASGI) variant of ``RequestOTPView``."""
+    throttle_scope = 'otp'
+    throttle_keys = ('phone', 'ip')
+
+    async def post(self, request):
+        serializer = RequestOTPSerializer(data=request.data)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        phone_number = serializer.validated_data['phone_number']
+        auth_code = secrets.randbelow(900000) + 100000
+
+        await User.objects.aget_or_create(
+            phone_number=phone_number,
+            defaults={'is_active': False}
+        )
+        await sync_to_async(get_otp_store().issue)(phone_number, auth_code)
+        await aenqueue_sms(phone_number, 'users', str(auth_code))
+
+        return json_response({'message': 'کد تایید ارسال شد'}, status=status.HTTP_200_OK)
+
+
+class AsyncVerifyOTPView(AsyncAPIView):
+    """Async (ASGI) variant of ``VerifyOTPView``."""
+    throttle_scope = 'otp_verify'
+    throttle_keys = ('phone', 'ip')
+
+    async def post(self, request):
+        serializer = VerifyOTPSerializer(data=request.data)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        phone_number = serializer.validated_data['phone_number']
+        code = serializer.validated_data['code']
+
+        user = await User.objects.filter(phone_number=phone_number).afirst()
+        if user is None:
+            return json_response({'error': 'اطلاعات ورود نامعتبر است'}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = await sync_to_async(get_otp_store().verify)(phone_number, code)
+
+        if result.status == OTP_LOCKED:
+            remaining = result.locked_seconds // 60
+            return json_response(
+                {'error': f'حساب به مدت {remaining} دقیقه قفل شده است. لطفاً بعداً تلاش کنید'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        if result.status == OTP_EXPIRED:
+            return json_response({'error': 'کد منقضی شده است. لطفاً کد جدید درخواست کنید'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if result.status == OTP_LOCKED_NOW:
+            return json_response(
+                {'error': f'تعداد تلاش‌های نادرست بیش از حد مجاز. حساب برای {LOCK_DURATION_MINUTES} دقیقه قفل شد'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+
+        if result.status == OTP_INVALID:
+            return json_response(
+                {'error': f'کد نادرست است. {result.remaining_attempts} تلاش باقی مانده'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        is_first_login = user.last_login is None
+
+        user.is_active = True
+        user.last_login = timezone.now()
+        await user.asave(update_fields=['is_active', 'last_login'])
+
+        if is_first_login:
+            await aenqueue_sms(phone_number, 'first-log', '')
+
+        refresh = await aissue_tokens(user)
+
+        return json_response({
+            'message': 'ورود موفق',
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }, status=status.HTTP_200_OK)
+
+
+class AsyncProfileView(AsyncAPIView):
+    """Async (ASGI) variant of ``ProfileView.get``."""
+    authentication_required = True
+
+    async def get(self, request):
+        return json_response(ProfileSerializer(request.user).data)
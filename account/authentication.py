@@ -0,0 +1,144 @@
+"""
+JWT authentication without a user query per request.
+
+simplejwt's ``JWTAuthentication`` loads the whole ``CustomUser`` row on every
+authenticated request just to check ``is_active``. ``ClaimsJWTAuthentication``
+validates the token signature as before, then takes the authorization state
+(``is_active``, ``is_staff``, ``is_superuser`` and ``token_version``) from a
+small per-user cache entry and returns a ``ClaimsUser``. The ``CustomUser``
+row is only loaded when a view reads a field outside that state (e.g. the
+profile) or needs a model instance (``get_full_user``). Subscription state
+already comes from the entitlement cache (``payment.entitlements``).
+
+Revocation: tokens carry the user's ``token_version`` at issue time
+(``account.tokens.issue_tokens``). ``revoke_tokens`` increments the counter, so every token
+issued before it is rejected. The cache entry is dropped whenever the user is
+saved (``account.signals``) and otherwise expires after
+``AUTH_STATE_CACHE_TIMEOUT`` seconds, which bounds staleness for bulk
+``update()`` calls that bypass signals.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import router, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from core.cache import namespace
+
+cache = namespace('account')
+
+VERSION_CLAIM = 'ver'
+
+AuthState = namedtuple('AuthState', 'is_active is_staff is_superuser token_version')
+
+_NO_USER = 'none'
+
+
+def _cache_key(user_id):
+    return f'auth:state:{user_id}'
+
+
+def get_auth_state(user_id):
+    """Cached ``AuthState`` for ``user_id``, or None when the user does not exist."""
+    key = _cache_key(user_id)
+    cached = cache.get(key)
+    if cached is not None:
+        return None if cached == _NO_USER else AuthState(*cached)
+
+    User = get_user_model()
+    # Always from the primary: a revocation must not be undone by replica lag
+    row = User.objects.using(router.db_for_write(User)).filter(
+        **{api_settings.USER_ID_FIELD: user_id}
+    ).values_list(*AuthState._fields).first()
+    cache.set(key, row if row is not None else _NO_USER, settings.AUTH_STATE_CACHE_TIMEOUT)
+    return AuthState(*row) if row is not None else None
+
+
+def invalidate_auth_state(user_id):
+    key = _cache_key(user_id)
+    cache.delete(key)
+    # Again after commit, so a value read before the commit does not linger
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def check_token_version(token, token_version):
+    # Tokens issued before versioning carry no claim and count as version 0
+    if token.get(VERSION_CLAIM, 0) != token_version:
+        raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to ``user_id`` so far."""
+    get_user_model().objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    invalidate_auth_state(user_id)
+
+
+class ClaimsUser:
+    """
+    Authenticated user backed by the token and the cached ``AuthState``.
+
+    ``id``/``pk`` and the authorization flags need no query; reading any other
+    attribute loads the ``CustomUser`` row once and delegates to it.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, state):
+        self.id = self.pk = user_id
+        self.is_active = state.is_active
+        self.is_staff = state.is_staff
+        self.is_superuser = state.is_superuser
+        self.token_version = state.token_version
+
+    def __str__(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk and getattr(other, 'is_authenticated', False)
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    @cached_property
+    def user(self):
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    def __getattr__(self, name):
+        # Only called for attributes not set above
+        if name.startswith('__') or name == 'user':
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def get_full_user(user):
+    """The ``CustomUser`` instance behind ``request.user`` (loaded at most once)."""
+    return user.user if isinstance(user, ClaimsUser) else user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # needs the password hash, i.e. the full row
+            user = super().get_user(validated_token)
+            check_token_version(validated_token, user.token_version)
+            return user
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        state = get_auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if api_settings.CHECK_USER_IS_ACTIVE and not state.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        check_token_version(validated_token, state.token_version)
+        return ClaimsUser(user_id, state)
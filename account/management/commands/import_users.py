@@ -0,0 +1,63 @@
+import csv
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from account.imports import FORMATS, REJECT_REASONS, guess_format, import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = 'ایمپورت دسته‌ای کاربران (بیماران کلینیک) از فایل CSV یا NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='مسیر فایل؛ - برای stdin')
+        parser.add_argument('--format', dest='file_format', choices=FORMATS,
+                            help='پیش‌فرض بر اساس پسوند فایل (.ndjson/.jsonl یا csv)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--rejects', help='مسیر فایل CSV ردیف‌های ردشده')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['file_format'] or guess_format(path)
+
+        try:
+            if path == '-':
+                stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+            else:
+                stream = open(path, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(e)
+
+        rejects_file = open(options['rejects'], 'w', encoding='utf-8', newline='') if options['rejects'] else None
+        writer = csv.writer(rejects_file) if rejects_file else None
+        if writer:
+            writer.writerow(['line', 'phone_number', 'reason'])
+
+        def on_reject(row):
+            if writer:
+                writer.writerow([row.line, row.phone_number, row.reason])
+
+        try:
+            with stream:
+                stats = import_users(
+                    read_rows(stream, file_format), batch_size=options['batch_size'],
+                    on_reject=on_reject, progress=self.report_progress,
+                )
+        except UnicodeDecodeError:
+            raise CommandError('فایل باید با کدگذاری UTF-8 باشد')
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats.created} کاربر ایجاد شد، {stats.skipped} ردیف نادیده گرفته شد '
+            f'(همزمان ثبت‌نام شده)، {sum(stats.rejected.values())} ردیف رد شد '
+            f'({stats.read} ردیف در {stats.elapsed:.1f} ثانیه)'
+        ))
+        for reason, count in stats.rejected.most_common():
+            self.stdout.write(f'  {REJECT_REASONS[reason]} ({reason}): {count}')
+
+    def report_progress(self, stats):
+        if stats.batches % 10 == 0:
+            self.stdout.write(f'  {stats.read} ردیف خوانده شد ({stats.rate:.0f} ردیف در ثانیه)')
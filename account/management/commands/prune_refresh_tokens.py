@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from account.tokens import prune_refresh_tokens
+
+
+class Command(BaseCommand):
+    help = 'حذف دسته‌ای ردیف‌های توکن‌های refresh منقضی‌شده'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=None, help='حداکثر تعداد ردیف حذف‌شده در هر دور')
+        parser.add_argument('--loop', action='store_true', help='اجرای دوره‌ای (زمان‌بند)')
+        parser.add_argument('--interval', type=int, default=3600, help='فاصله اجراها در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            deleted = prune_refresh_tokens(
+                batch_size=options['batch_size'], limit=options['limit'], progress=self.report_progress
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'{deleted} توکن منقضی حذف شد ({time.monotonic() - started:.2f} ثانیه)'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report_progress(self, deleted, elapsed):
+        self.stdout.write(f'  {deleted} ردیف تا اینجا ({elapsed:.1f} ثانیه)')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from account.sms import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'ارسال پیامک‌های در انتظار صف خروجی (بازیابی پس از ری‌استارت یا اجرای دوره‌ای)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--limit', type=int, default=None, help='حداکثر تعداد پیامک در این اجرا')
+
+    def handle(self, *args, **options):
+        processed = drain_outbox(batch_size=options['batch_size'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'{processed} پیامک پردازش شد'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:59
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('receptor', models.CharField(max_length=11)),
+                ('template', models.CharField(max_length=50)),
+                ('token', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'در انتظار'), ('sent', 'ارسال شده'), ('failed', 'ناموفق')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'پیامک خروجی',
+                'verbose_name_plural': 'صف پیامک\u200cها',
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='account_sms_status_6d2e85_idx')],
+            },
+        ),
+    ]
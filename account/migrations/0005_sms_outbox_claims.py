@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+def clear_delivered_tokens(apps, schema_editor):
+    SMSOutbox = apps.get_model('account', 'SMSOutbox')
+    SMSOutbox.objects.filter(status__in=['sent', 'failed']).exclude(token='').update(token='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_issued_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='smsoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'در انتظار'), ('sending', 'در حال ارسال'), ('sent', 'ارسال شده'), ('failed', 'ناموفق')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(clear_delivered_tokens, migrations.RunPython.noop),
+    ]
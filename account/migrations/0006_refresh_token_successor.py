@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0005_sms_outbox_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issuedrefreshtoken',
+            name='replaced_by',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='issuedrefreshtoken',
+            name='revoked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
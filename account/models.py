@@ -57,6 +57,8 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
     is_active = models.BooleanField(default=False)
     is_staff = models.BooleanField(default=False)
+    # Bumped to revoke every token issued so far (account.authentication)
+    token_version = models.PositiveIntegerField(default=0)
     
     date_joined = models.DateTimeField(default=timezone.now)
     last_login = models.DateTimeField(null=True, blank=True)
@@ -72,3 +74,57 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     
     def __str__(self):
         return self.phone_number or self.username or str(self.id)
+
+
+class SMSOutbox(models.Model):
+    """Persistent outbox for SMS messages sent by the dispatch queue."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'در انتظار'),
+        (STATUS_SENDING, 'در حال ارسال'),
+        (STATUS_SENT, 'ارسال شده'),
+        (STATUS_FAILED, 'ناموفق'),
+    ]
+    
+    receptor = models.CharField(max_length=11)
+    template = models.CharField(max_length=50)
+    # Cleared once the message is sent or has failed for good
+    token = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'پیامک خروجی'
+        verbose_name_plural = 'صف پیامک‌ها'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f'{self.receptor} - {self.template} - {self.status}'
+
+
+class IssuedRefreshToken(models.Model):
+    """Outstanding refresh tokens (account.tokens); expired rows are pruned in batches."""
+    jti = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='refresh_tokens')
+    expires_at = models.DateTimeField(db_index=True)
+    # Set once the token has been exchanged for a new one, together with the new token's jti
+    rotated_at = models.DateTimeField(null=True, blank=True)
+    replaced_by = models.CharField(max_length=64, null=True, blank=True)
+    # Set on logout
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'توکن refresh'
+        verbose_name_plural = 'توکن‌های refresh'
+    
+    def __str__(self):
+        return f'{self.user_id} - {self.jti}'
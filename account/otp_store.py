@@ -0,0 +1,292 @@
+"""
+Pluggable storage for OTP state.
+
+OTP codes, failed attempt counters and lockouts are short-lived and written
+on every request/wrong guess, so they live in a TTL-backed store instead of
+on the ``CustomUser`` row. The backend is selected with the
+``OTP_STORE_BACKEND`` setting:
+
+* ``account.otp_store.CacheOTPStore`` - Django cache (default; use a shared
+  cache such as Redis when running more than one worker)
+* ``account.otp_store.LRUOTPStore`` - bounded in-process LRU (single process)
+* ``account.otp_store.DatabaseOTPStore`` - legacy ``auth_*`` user columns
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# OTP Configuration
+OTP_EXPIRY_MINUTES = 5
+MAX_OTP_ATTEMPTS = 3
+LOCK_DURATION_MINUTES = 15
+
+# Verification outcomes
+OTP_OK = 'ok'
+OTP_INVALID = 'invalid'
+OTP_EXPIRED = 'expired'
+OTP_LOCKED = 'locked'
+OTP_LOCKED_NOW = 'locked_now'
+
+
+@dataclass(frozen=True)
+class OTPVerification:
+    status: str
+    remaining_attempts: int = 0
+    locked_seconds: int = 0
+
+    @property
+    def ok(self):
+        return self.status == OTP_OK
+
+
+class BaseOTPStore:
+    """
+    Verification and lockout policy on top of a minimal key/value contract.
+
+    Subclasses implement ``_load``, ``_save`` and ``_delete`` for a state dict
+    with the keys ``code``, ``issued_at``, ``attempts`` and ``locked_until``
+    (timestamps are epoch seconds), and ``_incr_attempts``, which counts a
+    guess against the current code atomically so parallel guesses cannot
+    overwrite each other's count.
+    """
+
+    def __init__(self, expiry_seconds=None, max_attempts=None, lock_seconds=None):
+        self.expiry_seconds = expiry_seconds or OTP_EXPIRY_MINUTES * 60
+        self.max_attempts = max_attempts or MAX_OTP_ATTEMPTS
+        self.lock_seconds = lock_seconds or LOCK_DURATION_MINUTES * 60
+
+    def _now(self):
+        return time.time()
+
+    def _load(self, phone_number):
+        raise NotImplementedError
+
+    def _save(self, phone_number, state, ttl):
+        raise NotImplementedError
+
+    def _delete(self, phone_number):
+        raise NotImplementedError
+
+    def _incr_attempts(self, phone_number, state):
+        """Count one more guess against the code in ``state``; returns the new count."""
+        raise NotImplementedError
+
+    def _remaining_ttl(self, state):
+        return max(1, int(state['issued_at'] + self.expiry_seconds - self._now()))
+
+    def issue(self, phone_number, code):
+        """Store a fresh code, resetting attempts and any lock."""
+        state = {
+            'code': code,
+            'issued_at': self._now(),
+            'attempts': 0,
+            'locked_until': None,
+        }
+        self._save(phone_number, state, self.expiry_seconds)
+
+    def get_code(self, phone_number):
+        """Return the pending code for ``phone_number`` (or ``None``)."""
+        state = self._load(phone_number)
+        return state['code'] if state else None
+
+    def verify(self, phone_number, code):
+        now = self._now()
+        state = self._load(phone_number)
+        if state is None:
+            return OTPVerification(OTP_EXPIRED)
+
+        locked_until = state.get('locked_until')
+        if locked_until and now < locked_until:
+            return OTPVerification(OTP_LOCKED, locked_seconds=int(locked_until - now))
+
+        issued_at = state.get('issued_at')
+        if state.get('code') is None or issued_at is None:
+            return OTPVerification(OTP_EXPIRED)
+
+        if now - issued_at > self.expiry_seconds:
+            self._delete(phone_number)
+            return OTPVerification(OTP_EXPIRED)
+
+        # Counted before comparing, so at most max_attempts guesses are ever compared
+        attempts = self._incr_attempts(phone_number, state)
+        if attempts > self.max_attempts:
+            # A parallel guess took the last attempt and is locking the code
+            return OTPVerification(OTP_LOCKED, locked_seconds=self.lock_seconds)
+
+        if state['code'] != code:
+            if attempts >= self.max_attempts:
+                state.update(attempts=attempts, locked_until=now + self.lock_seconds)
+                self._save(phone_number, state, self.lock_seconds)
+                return OTPVerification(OTP_LOCKED_NOW, locked_seconds=self.lock_seconds)
+
+            return OTPVerification(
+                OTP_INVALID,
+                remaining_attempts=self.max_attempts - attempts,
+            )
+
+        self._delete(phone_number)
+        return OTPVerification(OTP_OK)
+
+    def clear(self, phone_number):
+        self._delete(phone_number)
+
+
+class CacheOTPStore(BaseOTPStore):
+    """OTP state in a Django cache; entries expire with the cache timeout."""
+
+    key_prefix = 'otp'
+
+    def __init__(self, cache_alias=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache_alias = cache_alias or getattr(settings, 'OTP_STORE_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, phone_number):
+        return f'{self.key_prefix}:{phone_number}'
+
+    def _load(self, phone_number):
+        return self.cache.get(self._key(phone_number))
+
+    def _save(self, phone_number, state, ttl):
+        self.cache.set(self._key(phone_number), state, ttl)
+
+    def _delete(self, phone_number):
+        self.cache.delete(self._key(phone_number))
+
+    def _incr_attempts(self, phone_number, state):
+        # One counter per issued code, so a reissue starts from zero
+        key = f'{self._key(phone_number)}:attempts:{state["issued_at"]}'
+        if self.cache.add(key, 1, self._remaining_ttl(state)):
+            return 1
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # Expired between add and incr
+            self.cache.add(key, 1, self._remaining_ttl(state))
+            return 1
+
+
+class LRUOTPStore(BaseOTPStore):
+    """Bounded in-process LRU; only suitable for single-process deployments."""
+
+    def __init__(self, max_entries=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_entries = max_entries or getattr(settings, 'OTP_STORE_MAX_ENTRIES', 100_000)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, phone_number):
+        with self._lock:
+            entry = self._data.get(phone_number)
+            if entry is None:
+                return None
+            expires_at, state = entry
+            if expires_at <= self._now():
+                del self._data[phone_number]
+                return None
+            self._data.move_to_end(phone_number)
+            return dict(state)
+
+    def _save(self, phone_number, state, ttl):
+        with self._lock:
+            self._data[phone_number] = (self._now() + ttl, dict(state))
+            self._data.move_to_end(phone_number)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def _delete(self, phone_number):
+        with self._lock:
+            self._data.pop(phone_number, None)
+
+    def _incr_attempts(self, phone_number, state):
+        with self._lock:
+            entry = self._data.get(phone_number)
+            if entry is None or entry[1]['issued_at'] != state['issued_at']:
+                # Expired or reissued meanwhile; count against the caller's copy
+                return state.get('attempts', 0) + 1
+            entry[1]['attempts'] += 1
+            return entry[1]['attempts']
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """Legacy backend that keeps OTP state on the ``CustomUser`` row."""
+
+    fields = ('auth_code', 'auth_code_created_at', 'auth_attempts', 'auth_locked_until')
+
+    @property
+    def users(self):
+        from django.contrib.auth import get_user_model
+        return get_user_model().objects
+
+    @staticmethod
+    def _to_datetime(value):
+        if value is None:
+            return None
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+
+    def _load(self, phone_number):
+        row = self.users.filter(phone_number=phone_number).values(*self.fields).first()
+        if row is None or (row['auth_code'] is None and row['auth_locked_until'] is None):
+            return None
+        created_at = row['auth_code_created_at']
+        locked_until = row['auth_locked_until']
+        return {
+            'code': row['auth_code'],
+            'issued_at': created_at.timestamp() if created_at else None,
+            'attempts': row['auth_attempts'],
+            'locked_until': locked_until.timestamp() if locked_until else None,
+        }
+
+    def _save(self, phone_number, state, ttl):
+        self.users.filter(phone_number=phone_number).update(
+            auth_code=state['code'],
+            auth_code_created_at=self._to_datetime(state['issued_at']),
+            auth_attempts=state['attempts'],
+            auth_locked_until=self._to_datetime(state['locked_until']),
+        )
+
+    def _delete(self, phone_number):
+        self.users.filter(phone_number=phone_number).update(
+            auth_code=None,
+            auth_code_created_at=None,
+            auth_attempts=0,
+            auth_locked_until=None,
+        )
+
+    def _incr_attempts(self, phone_number, state):
+        from django.db.models import F
+
+        # Conditional UPDATE: only max_attempts guesses per code can get a slot
+        rows = self.users.filter(
+            phone_number=phone_number,
+            auth_code=state['code'],
+            auth_attempts__lt=self.max_attempts,
+        )
+        if not rows.update(auth_attempts=F('auth_attempts') + 1):
+            return self.max_attempts + 1
+        return self.users.filter(phone_number=phone_number).values_list('auth_attempts', flat=True).first()
+
+
+@lru_cache(maxsize=None)
+def get_otp_store():
+    backend = getattr(settings, 'OTP_STORE_BACKEND', 'account.otp_store.CacheOTPStore')
+    return import_string(backend)()
+
+
+@receiver(setting_changed)
+def _reset_otp_store(sender, setting, **kwargs):
+    if setting.startswith('OTP_STORE'):
+        get_otp_store.cache_clear()
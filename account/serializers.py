@@ -1,21 +1,22 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
+from core.serializers import CompiledSerializer
+
 User = get_user_model()
 
 
+# Persian to English digit mapping
+PERSIAN_DIGITS = str.maketrans('۰۱۲۳۴۵۶۷۸۹', '0123456789')
+
+
 def normalize_phone_number(phone):
     """Normalize phone number by removing spaces, converting Persian digits, and handling country codes."""
     if not phone:
         return phone
     
-    # Persian to English digit mapping
-    persian_digits = '۰۱۲۳۴۵۶۷۸۹'
-    english_digits = '0123456789'
-    translation_table = str.maketrans(persian_digits, english_digits)
-    
     # Remove spaces and convert Persian digits
-    phone = phone.replace(' ', '').replace('-', '').translate(translation_table)
+    phone = phone.replace(' ', '').replace('-', '').translate(PERSIAN_DIGITS)
     
     # Handle country codes (+98, 0098, 98)
     if phone.startswith('+98'):
@@ -28,6 +29,19 @@ def normalize_phone_number(phone):
     return phone
 
 
+def normalize_phone_numbers(phones):
+    """``normalize_phone_number`` over a batch; numbers already in ``09xxxxxxxxx`` form pass straight through."""
+    return [
+        phone if len(phone) == 11 and phone.startswith('09') and phone.isascii() and phone.isdigit()
+        else normalize_phone_number(phone)
+        for phone in phones
+    ]
+
+
+def is_valid_phone_number(phone):
+    return bool(phone) and len(phone) == 11 and phone.startswith('09') and phone.isascii() and phone.isdigit()
+
+
 class RequestOTPSerializer(serializers.Serializer):
     phone_number = serializers.CharField(max_length=20, required=True)
     
@@ -70,3 +84,17 @@ class ProfileSerializer(serializers.ModelSerializer):
         model = User
         fields = ('id', 'phone_number', 'username', 'email', 'first_name', 'last_name', 'date_joined')
         read_only_fields = ('id', 'phone_number', 'date_joined')
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+
+class UserImportSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    # Guessed from the file name when omitted (account.imports.guess_format)
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], required=False)
+
+
+# Read-only compiled counterpart, same output as ProfileSerializer
+profile_reader = CompiledSerializer(ProfileSerializer)
@@ -0,0 +1,102 @@
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.contrib.auth import get_user_model
+from asgiref.sync import sync_to_async
+
+from account.otp_store import get_otp_store
+from account.models import SMSOutbox
+
+User = get_user_model()
+
+
+@override_settings(
+    KAVEH_NEGAR_API_KEY='test-api-key',
+    SMS_PROVIDER='account.sms.FakeSMSProvider',
+    SMS_QUEUE_EAGER=True,
+    REST_FRAMEWORK={
+        'DEFAULT_THROTTLE_RATES': {
+            'otp': '1000/min',
+        }
+    }
+)
+class AsyncAuthTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = AsyncClient()
+    
+    async def test_request_and_verify_otp(self):
+        response = await self.client.post(
+            reverse('async-request-otp'), {'phone_number': '۰۹۱۲۳۴۵۶۷۸۹'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['message'], 'کد تایید ارسال شد')
+        
+        code = await sync_to_async(get_otp_store().get_code)('09123456789')
+        self.assertIsNotNone(code)
+        
+        response = await self.client.post(
+            reverse('async-verify-otp'), {'phone_number': '09123456789', 'code': code},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.json())
+        
+        user = await User.objects.aget(phone_number='09123456789')
+        self.assertTrue(user.is_active)
+        templates = [m.template async for m in SMSOutbox.objects.order_by('id')]
+        self.assertEqual(templates, ['users', 'first-log'])
+    
+    async def test_verify_wrong_code(self):
+        await User.objects.acreate(phone_number='09123456789')
+        await sync_to_async(get_otp_store().issue)('09123456789', 123456)
+        
+        response = await self.client.post(
+            reverse('async-verify-otp'), {'phone_number': '09123456789', 'code': 654321},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('کد نادرست است', response.json()['error'])
+    
+    async def test_profile_requires_token(self):
+        response = await self.client.get(reverse('async-profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    async def test_profile_with_token(self):
+        user = await User.objects.acreate(phone_number='09123456789', is_active=True)
+        access = str(RefreshToken.for_user(user).access_token)
+        
+        response = await self.client.get(reverse('async-profile'), headers={'Authorization': f'Bearer {access}'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['phone_number'], '09123456789')
+
+
+@override_settings(
+    SMS_PROVIDER='account.sms.FakeSMSProvider',
+    SMS_QUEUE_EAGER=True,
+    REST_FRAMEWORK={
+        'DEFAULT_THROTTLE_RATES': {
+            'otp': '3/min',
+        }
+    }
+)
+class AsyncThrottlingTestCase(TestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.client = AsyncClient()
+    
+    async def test_otp_throttling(self):
+        for _ in range(3):
+            response = await self.client.post(
+                reverse('async-request-otp'), {'phone_number': '09123456789'}, content_type='application/json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response = await self.client.post(
+            reverse('async-request-otp'), {'phone_number': '09123456789'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('throttled', response.json()['detail'])
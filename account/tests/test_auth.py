@@ -2,16 +2,18 @@ from unittest.mock import patch, MagicMock
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
-from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.contrib.auth import get_user_model
 
+from account.otp_store import get_otp_store
+
 User = get_user_model()
 
 
 @override_settings(
     KAVEH_NEGAR_API_KEY='test-api-key',
+    SMS_QUEUE_EAGER=True,
     REST_FRAMEWORK={
         'DEFAULT_THROTTLE_RATES': {
             'otp': '1000/min',
@@ -27,7 +29,7 @@ class OTPAuthTestCase(TestCase):
         self.verify_url = reverse('verify-otp')
         self.profile_url = reverse('profile')
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_request_otp_success(self, mock_kavenegar):
         mock_api = MagicMock()
         mock_kavenegar.return_value = mock_api
@@ -38,27 +40,27 @@ class OTPAuthTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('کد تایید ارسال شد', response.data['message'])
 
+        code = get_otp_store().get_code('09123456789')
+        self.assertIsNotNone(code)
+        self.assertTrue(100000 <= code <= 999999)
+        # OTP state must not be written on the user row
         user = User.objects.get(phone_number='09123456789')
-        self.assertIsNotNone(user.auth_code)
-        self.assertTrue(100000 <= user.auth_code <= 999999)
+        self.assertIsNone(user.auth_code)
 
         mock_api.verify_lookup.assert_called_once()
         call_args = mock_api.verify_lookup.call_args[0][0]
         self.assertEqual(call_args['receptor'], '09123456789')
         self.assertEqual(call_args['template'], 'users')
-        self.assertEqual(call_args['token'], str(user.auth_code))
+        self.assertEqual(call_args['token'], str(code))
         # KavenegarAPI باید با کلید تنظیمات صدا شده باشه
         mock_kavenegar.assert_called_once_with(settings.KAVEH_NEGAR_API_KEY)
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_verify_otp_success(self, mock_kavenegar):
         mock_api = MagicMock()
         mock_kavenegar.return_value = mock_api
 
-        user = User.objects.create(
-            phone_number='09123456789', 
-            auth_code=123456,
-            auth_code_created_at=timezone.now()
-        )
+        user = User.objects.create(phone_number='09123456789')
+        get_otp_store().issue('09123456789', 123456)
 
         data = {'phone_number': '09123456789', 'code': 123456}
         response = self.client.post(self.verify_url, data)
@@ -69,19 +71,16 @@ class OTPAuthTestCase(TestCase):
         self.assertIn('ورود موفق', response.data.get('message', ''))
 
         user.refresh_from_db()
-        self.assertIsNone(user.auth_code)
+        self.assertIsNone(get_otp_store().get_code('09123456789'))
         self.assertTrue(user.is_active)
         self.assertIsNotNone(user.last_login)
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_verify_otp_first_login(self, mock_kavenegar):
         mock_api = MagicMock()
         mock_kavenegar.return_value = mock_api
         
-        user = User.objects.create(
-            phone_number='09123456789', 
-            auth_code=123456,
-            auth_code_created_at=timezone.now()
-        )
+        user = User.objects.create(phone_number='09123456789')
+        get_otp_store().issue('09123456789', 123456)
         
         data = {'phone_number': '09123456789', 'code': 123456}
         response = self.client.post(self.verify_url, data)
@@ -95,7 +94,7 @@ class OTPAuthTestCase(TestCase):
         self.assertEqual(calls[0][0][0]['receptor'], '09123456789')
         self.assertEqual(calls[0][0][0]['token'], '')
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_verify_otp_second_login_no_first_log(self, mock_kavenegar):
         """Test that second login does NOT send first-log template"""
         mock_api = MagicMock()
@@ -104,7 +103,7 @@ class OTPAuthTestCase(TestCase):
         # First login cycle: request OTP and verify
         self.client.post(self.register_url, {'phone_number': '09123456789'}, format='json')
         user = User.objects.get(phone_number='09123456789')
-        first_code = user.auth_code
+        first_code = get_otp_store().get_code('09123456789')
         response = self.client.post(self.verify_url, {'phone_number': '09123456789', 'code': first_code}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
@@ -124,10 +123,8 @@ class OTPAuthTestCase(TestCase):
         otp_response = self.client.post(self.register_url, {'phone_number': '09123456789'}, format='json')
         self.assertEqual(otp_response.status_code, status.HTTP_200_OK)
         
-        user.refresh_from_db()
-        second_code = user.auth_code
+        second_code = get_otp_store().get_code('09123456789')
         self.assertIsNotNone(second_code)
-        self.assertIsNotNone(user.auth_code_created_at)
         
         response = self.client.post(self.verify_url, {'phone_number': '09123456789', 'code': second_code}, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -138,11 +135,8 @@ class OTPAuthTestCase(TestCase):
         self.assertEqual(len(second_login_calls), 0)
     
     def test_verify_otp_wrong_code(self):
-        user = User.objects.create(
-            phone_number='09123456789', 
-            auth_code=123456,
-            auth_code_created_at=timezone.now()
-        )
+        user = User.objects.create(phone_number='09123456789')
+        get_otp_store().issue('09123456789', 123456)
         
         data = {'phone_number': '09123456789', 'code': 654321}
         response = self.client.post(self.verify_url, data)
@@ -159,14 +153,12 @@ class OTPAuthTestCase(TestCase):
     
     def test_otp_expiry(self):
         """Test that expired OTP codes are rejected"""
-        from datetime import timedelta
+        import time
         
-        # Create user with expired OTP
-        user = User.objects.create(
-            phone_number='09123456789',
-            auth_code=123456,
-            auth_code_created_at=timezone.now() - timedelta(minutes=10)
-        )
+        # Create user with an OTP issued 10 minutes ago
+        User.objects.create(phone_number='09123456789')
+        with patch('account.otp_store.time.time', return_value=time.time() - 600):
+            get_otp_store().issue('09123456789', 123456)
         
         data = {'phone_number': '09123456789', 'code': 123456}
         response = self.client.post(self.verify_url, data)
@@ -176,12 +168,8 @@ class OTPAuthTestCase(TestCase):
     
     def test_otp_attempt_limiting(self):
         """Test that account gets locked after max attempts"""
-        user = User.objects.create(
-            phone_number='09123456789',
-            auth_code=123456,
-            auth_code_created_at=timezone.now(),
-            auth_attempts=0
-        )
+        User.objects.create(phone_number='09123456789')
+        get_otp_store().issue('09123456789', 123456)
         
         # Try wrong code 3 times
         for i in range(3):
@@ -196,8 +184,12 @@ class OTPAuthTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
         self.assertIn('قفل', response.data['error'])
         
-        user.refresh_from_db()
-        self.assertIsNotNone(user.auth_locked_until)
+        # Correct code is rejected while locked
+        response = self.client.post(self.verify_url, {
+            'phone_number': '09123456789',
+            'code': 123456
+        })
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
     
     def test_profile_get(self):
         user = User.objects.create(phone_number='09123456789')
@@ -219,7 +211,7 @@ class OTPAuthTestCase(TestCase):
         self.assertEqual(user.username, 'testuser')
         self.assertEqual(user.email, 'test@example.com')
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_phone_normalization_persian_digits(self, mock_kavenegar):
         """Test phone number normalization with Persian digits"""
         mock_api = MagicMock()
@@ -232,7 +224,7 @@ class OTPAuthTestCase(TestCase):
         user = User.objects.get(phone_number='09123456789')
         self.assertIsNotNone(user)
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_phone_normalization_country_code(self, mock_kavenegar):
         """Test phone number normalization with +98 prefix"""
         mock_api = MagicMock()
@@ -245,7 +237,7 @@ class OTPAuthTestCase(TestCase):
         user = User.objects.get(phone_number='09123456789')
         self.assertIsNotNone(user)
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_phone_normalization_with_spaces(self, mock_kavenegar):
         """Test phone number normalization with spaces"""
         mock_api = MagicMock()
@@ -261,6 +253,7 @@ class OTPAuthTestCase(TestCase):
 
 @override_settings(
     KAVEH_NEGAR_API_KEY='test-api-key',
+    SMS_QUEUE_EAGER=True,
     REST_FRAMEWORK={
         'DEFAULT_THROTTLE_RATES': {
             'otp': '3/min',
@@ -274,7 +267,7 @@ class OTPThrottlingTestCase(TestCase):
         self.client = APIClient()
         self.register_url = reverse('request-otp')
     
-    @patch('account.views.KavenegarAPI')
+    @patch('account.sms.KavenegarAPI')
     def test_otp_throttling(self, mock_kavenegar):
         mock_api = MagicMock()
         mock_kavenegar.return_value = mock_api
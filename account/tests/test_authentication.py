@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.authentication import ClaimsUser, get_auth_state, revoke_tokens
+from account.tokens import aissue_tokens, issue_tokens
+
+User = get_user_model()
+
+
+class ClaimsAuthenticationTestCase(TestCase):
+    """Token auth served from the cached auth state instead of the user row"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(phone_number='09123456789', is_active=True)
+
+    def _authenticate(self, refresh):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def test_no_user_query_when_cached(self):
+        self._authenticate(issue_tokens(self.user))
+        url = reverse('payment:user-subscription')
+        self.client.get(url)
+
+        # auth state and the (empty) entitlement both come from the cache
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+
+    def test_full_user_loaded_on_demand(self):
+        self._authenticate(issue_tokens(self.user))
+        get_auth_state(self.user.pk)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['phone_number'], '09123456789')
+
+        response = self.client.patch(reverse('profile'), {'first_name': 'علی'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'علی')
+
+    def test_revoke_tokens(self):
+        old = issue_tokens(self.user)
+        self._authenticate(old)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+
+        revoke_tokens(self.user.pk)
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'token_revoked')
+
+        self.user.refresh_from_db()
+        self._authenticate(issue_tokens(self.user))
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+
+    def test_unversioned_tokens_count_as_version_zero(self):
+        self._authenticate(RefreshToken.for_user(self.user))
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+
+    def test_deactivation_and_staff_change_apply_immediately(self):
+        self._authenticate(issue_tokens(self.user))
+        export_url = reverse('payment:export', args=['transactions'])
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(export_url).status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'user_inactive')
+
+    def test_deleted_user(self):
+        self._authenticate(issue_tokens(self.user))
+        self.user.delete()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_views_reject_revoked_tokens(self):
+        refresh = await aissue_tokens(self.user)
+        headers = {'Authorization': f'Bearer {refresh.access_token}'}
+        response = await AsyncClient().get(reverse('async-profile'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        await User.objects.filter(pk=self.user.pk).aupdate(token_version=1)
+        response = await AsyncClient().get(reverse('async-profile'), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,193 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from account.imports import CSV, NDJSON, existing_phone_numbers, import_users, is_utf8, read_rows
+from account.serializers import normalize_phone_number, normalize_phone_numbers
+from account.tokens import issue_tokens
+
+User = get_user_model()
+
+HEADER = 'phone_number,first_name,last_name,email\n'
+
+
+def csv_rows(text):
+    return read_rows(io.StringIO(text), CSV)
+
+
+class NormalizePhoneNumbersTestCase(TestCase):
+
+    def test_same_as_single_normalize(self):
+        phones = ['09123456789', '+989123456789', '۰۹۱۲۳۴۵۶۷۸۹', '0912 345-6789', '', 'abc']
+        self.assertEqual(normalize_phone_numbers(phones), [normalize_phone_number(p) for p in phones])
+
+
+class IsUTF8TestCase(TestCase):
+
+    def test_chunk_boundaries(self):
+        # one byte per chunk splits every multi-byte character
+        self.assertTrue(is_utf8(io.BytesIO('علی'.encode()), chunk_size=1))
+        self.assertFalse(is_utf8(io.BytesIO('علی'.encode()[:-1]), chunk_size=1))
+        upload = io.BytesIO(b'ab\xe1\xed')
+        self.assertFalse(is_utf8(upload))
+        self.assertEqual(upload.tell(), 0)
+
+
+class ImportUsersTestCase(TestCase):
+    """Bulk import from CSV/NDJSON streams"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_csv_import(self):
+        stats = import_users(csv_rows(
+            HEADER
+            + '09120000001,علی,رضایی,Ali@EXAMPLE.com\n'
+            + '+989120000002,,,\n'
+            + '۰۹۱۲۰۰۰۰۰۰۳,مریم,,\n'
+        ))
+
+        self.assertEqual(stats.created, 3)
+        self.assertEqual(sum(stats.rejected.values()), 0)
+        user = User.objects.get(phone_number='09120000001')
+        self.assertEqual((user.first_name, user.last_name, user.email), ('علی', 'رضایی', 'Ali@example.com'))
+        self.assertFalse(user.is_active)
+        self.assertEqual(user.password, '')  # as create_user leaves it
+        self.assertIsNone(User.objects.get(phone_number='09120000002').email)
+        self.assertTrue(User.objects.filter(phone_number='09120000003').exists())
+
+    def test_ndjson_import(self):
+        text = '{"phone_number": "09120000001", "first_name": "علی"}\n\n[1, 2]\nnot json\n'
+        rejected = []
+        stats = import_users(read_rows(io.StringIO(text), NDJSON), on_reject=rejected.append)
+
+        self.assertEqual(stats.created, 1)
+        self.assertEqual(User.objects.get(phone_number='09120000001').first_name, 'علی')
+        self.assertEqual([(r.line, r.reason) for r in rejected], [(3, 'malformed'), (4, 'malformed')])
+
+    def test_rejected_rows(self):
+        User.objects.create_user(phone_number='09120000005')
+        rejected = []
+        stats = import_users(csv_rows(
+            HEADER
+            + '09120000001,,,\n'
+            + '12345,,,\n'
+            + '0912 000 0001,,,\n'
+            + '09120000002,,,not-an-email\n'
+            + '09120000003,' + 'x' * 151 + ',,\n'
+            + '09120000005,,,\n'
+        ), on_reject=rejected.append)
+
+        self.assertEqual(stats.created, 1)
+        self.assertEqual([(r.line, r.phone_number, r.reason) for r in rejected], [
+            (3, '12345', 'invalid_phone'),
+            (4, '09120000001', 'duplicate'),
+            (5, '09120000002', 'invalid_email'),
+            (6, '09120000003', 'invalid_name'),
+            (7, '09120000005', 'exists'),
+        ])
+        self.assertEqual(stats.rejected['exists'], 1)
+
+    def test_repeats_across_batches(self):
+        stats = import_users(csv_rows(HEADER + '09120000001,,,\n09120000002,,,\n09120000001,,,\n'), batch_size=2)
+        self.assertEqual((stats.created, stats.batches, dict(stats.rejected)), (2, 2, {'exists': 1}))
+
+    def test_concurrent_registration_is_skipped(self):
+        real_check = existing_phone_numbers
+
+        def check(phones, **filters):
+            if not filters:
+                # 09120000002 registers between the check and the insert
+                User.objects.get_or_create(phone_number='09120000002')
+                return set()
+            return real_check(phones, **filters)
+
+        with patch('account.imports.existing_phone_numbers', side_effect=check):
+            stats = import_users(csv_rows(HEADER + '09120000001,,,\n09120000002,,,\n'))
+        self.assertEqual((stats.created, stats.skipped), (1, 1))
+
+    def test_queries_per_batch(self):
+        text = HEADER + ''.join(f'0912{i:07d},,,\n' for i in range(50))
+        # existence check, then SAVEPOINT/INSERT/re-check/RELEASE, per batch
+        with self.assertNumQueries(5):
+            stats = import_users(csv_rows(text), batch_size=50)
+        self.assertEqual(stats.created, 50)
+
+
+class UserImportAPITestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('user-import')
+        self.admin = User.objects.create_user(phone_number='09100000000', is_active=True, is_staff=True)
+
+    def _post(self, user, content, name='patients.csv', **data):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        return self.client.post(self.url, {'file': upload, **data}, format='multipart')
+
+    def test_import(self):
+        response = self._post(self.admin, HEADER + '09120000001,,,\nbad,,,\n')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['rejected_by_reason'], {'invalid_phone': 1})
+        self.assertEqual(response.data['rejected_rows'], [{'line': 3, 'phone_number': 'bad', 'reason': 'invalid_phone'}])
+
+    def test_format_from_name_or_field(self):
+        line = json.dumps({'phone_number': '09120000001'}) + '\n'
+        self.assertEqual(self._post(self.admin, line, name='patients.jsonl').data['created'], 1)
+        line = json.dumps({'phone_number': '09120000002'}) + '\n'
+        self.assertEqual(self._post(self.admin, line, name='upload', file_format='ndjson').data['created'], 1)
+
+    def test_not_utf8(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_tokens(self.admin).access_token}')
+        # the bad byte comes after a full first batch
+        content = HEADER + ''.join(f'0912{i:07d},,,\n' for i in range(1500))
+        upload = SimpleUploadedFile('patients.csv', content.encode() + b'09120000001,\xe1\xed,,\n')
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_staff_only(self):
+        user = User.objects.create_user(phone_number='09120000009', is_active=True)
+        response = self._post(user, HEADER + '09120000001,,,\n')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(User.objects.filter(phone_number='09120000001').exists())
+
+
+class ImportUsersCommandTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def test_command(self):
+        path = os.path.join(self.dir.name, 'patients.csv')
+        rejects = os.path.join(self.dir.name, 'rejects.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(HEADER + '09120000001,,,\n09120000001,,,\n')
+
+        out = io.StringIO()
+        call_command('import_users', path, '--rejects', rejects, stdout=out)
+
+        self.assertIn('1 کاربر ایجاد شد، 0 ردیف نادیده گرفته شد (همزمان ثبت‌نام شده)، 1 ردیف رد شد', out.getvalue())
+        self.assertIn('duplicate', out.getvalue())
+        with open(rejects, encoding='utf-8') as f:
+            self.assertEqual(list(csv.reader(f)), [
+                ['line', 'phone_number', 'reason'], ['3', '09120000001', 'duplicate'],
+            ])
@@ -0,0 +1,110 @@
+import time
+from unittest.mock import patch
+from django.test import TestCase
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+
+from account.otp_store import (
+    CacheOTPStore, LRUOTPStore, DatabaseOTPStore,
+    OTP_OK, OTP_INVALID, OTP_EXPIRED, OTP_LOCKED, OTP_LOCKED_NOW,
+)
+
+User = get_user_model()
+
+
+class OTPStoreContractMixin:
+    """Behaviour shared by every OTP store backend"""
+    phone = '09123456789'
+    
+    def make_store(self):
+        raise NotImplementedError
+    
+    def setUp(self):
+        cache.clear()
+        User.objects.create(phone_number=self.phone)
+        self.store = self.make_store()
+    
+    def test_issue_and_verify(self):
+        self.store.issue(self.phone, 123456)
+        self.assertEqual(self.store.get_code(self.phone), 123456)
+        
+        self.assertEqual(self.store.verify(self.phone, 123456).status, OTP_OK)
+        # Code is single-use
+        self.assertIsNone(self.store.get_code(self.phone))
+        self.assertEqual(self.store.verify(self.phone, 123456).status, OTP_EXPIRED)
+    
+    def test_unknown_phone_is_expired(self):
+        self.assertEqual(self.store.verify('09120000000', 123456).status, OTP_EXPIRED)
+    
+    def test_expired_code(self):
+        with patch('account.otp_store.time.time', return_value=time.time() - 600):
+            self.store.issue(self.phone, 123456)
+        self.assertEqual(self.store.verify(self.phone, 123456).status, OTP_EXPIRED)
+    
+    def test_lockout_after_max_attempts(self):
+        self.store.issue(self.phone, 123456)
+        
+        first = self.store.verify(self.phone, 111111)
+        self.assertEqual(first.status, OTP_INVALID)
+        self.assertEqual(first.remaining_attempts, 2)
+        self.assertEqual(self.store.verify(self.phone, 111111).status, OTP_INVALID)
+        self.assertEqual(self.store.verify(self.phone, 111111).status, OTP_LOCKED_NOW)
+        
+        locked = self.store.verify(self.phone, 123456)
+        self.assertEqual(locked.status, OTP_LOCKED)
+        self.assertGreater(locked.locked_seconds, 0)
+    
+    def test_reissue_resets_lock(self):
+        self.store.issue(self.phone, 123456)
+        for _ in range(3):
+            self.store.verify(self.phone, 111111)
+        
+        self.store.issue(self.phone, 654321)
+        self.assertEqual(self.store.verify(self.phone, 654321).status, OTP_OK)
+
+    def test_parallel_guesses_share_attempts(self):
+        self.store.issue(self.phone, 123456)
+        # Parallel requests all load the state before any of them writes
+        snapshot = self.store._load(self.phone)
+        with patch.object(self.store, '_load', side_effect=lambda phone: dict(snapshot)):
+            statuses = [self.store.verify(self.phone, code).status for code in (1, 2, 3, 123456)]
+        self.assertEqual(statuses, [OTP_INVALID, OTP_INVALID, OTP_LOCKED_NOW, OTP_LOCKED])
+
+
+class CacheOTPStoreTestCase(OTPStoreContractMixin, TestCase):
+    def make_store(self):
+        return CacheOTPStore()
+    
+    def test_user_row_not_written(self):
+        self.store.issue(self.phone, 123456)
+        self.store.verify(self.phone, 111111)
+        
+        user = User.objects.get(phone_number=self.phone)
+        self.assertIsNone(user.auth_code)
+        self.assertEqual(user.auth_attempts, 0)
+
+
+class LRUOTPStoreTestCase(OTPStoreContractMixin, TestCase):
+    def make_store(self):
+        return LRUOTPStore(max_entries=2)
+    
+    def test_evicts_least_recently_used(self):
+        self.store.issue('09120000001', 111111)
+        self.store.issue('09120000002', 222222)
+        self.store.get_code('09120000001')
+        self.store.issue('09120000003', 333333)
+        
+        self.assertEqual(self.store.get_code('09120000001'), 111111)
+        self.assertIsNone(self.store.get_code('09120000002'))
+
+
+class DatabaseOTPStoreTestCase(OTPStoreContractMixin, TestCase):
+    def make_store(self):
+        return DatabaseOTPStore()
+    
+    def test_state_kept_on_user_row(self):
+        self.store.issue(self.phone, 123456)
+        
+        user = User.objects.get(phone_number=self.phone)
+        self.assertEqual(user.auth_code, 123456)
+        self.assertIsNotNone(user.auth_code_created_at)
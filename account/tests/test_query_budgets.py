@@ -0,0 +1,54 @@
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.core.cache import cache
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.otp_store import get_otp_store
+from core.testing import QueryBudgetMixin
+
+User = get_user_model()
+
+
+@override_settings(KAVEH_NEGAR_API_KEY='test-api-key', SMS_QUEUE_EAGER=True)
+class AccountQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Query budgets for the auth endpoints and the user changelist (query_budgets.json)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+    
+    def _authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    
+    @patch('account.sms.KavenegarAPI')
+    def test_request_otp(self, mock_kavenegar):
+        with self.assertQueryBudget('POST register (new user)'):
+            self.client.post(reverse('request-otp'), {'phone_number': '09123456789'}, format='json')
+    
+    @patch('account.sms.KavenegarAPI')
+    def test_verify_otp(self, mock_kavenegar):
+        User.objects.create(phone_number='09123456789')
+        get_otp_store().issue('09123456789', 123456)
+        with self.assertQueryBudget('POST verify'):
+            response = self.client.post(reverse('verify-otp'), {'phone_number': '09123456789', 'code': 123456})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_profile(self):
+        user = User.objects.create(phone_number='09123456789', is_active=True)
+        self._authenticate(user)
+        with self.assertQueryBudget('GET profile'):
+            self.client.get(reverse('profile'))
+        with self.assertQueryBudget('PATCH profile'):
+            self.client.patch(reverse('profile'), {'username': 'testuser'}, format='json')
+    
+    def test_admin_user_changelist(self):
+        admin = User.objects.create_superuser(phone_number='09120000000', password='admin-pass-123')
+        for i in range(3):
+            User.objects.create(phone_number=f'0912111111{i}')
+        self.client.force_login(admin)
+        with self.assertQueryBudget('admin user changelist'):
+            response = self.client.get(reverse('admin:account_customuser_changelist'))
+        self.assertEqual(response.status_code, 200)
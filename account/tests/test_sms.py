@@ -0,0 +1,104 @@
+from unittest.mock import patch
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from account.models import SMSOutbox
+from account.sms import FakeSMSProvider, SMSDispatcher, claim, deliver, drain_outbox, enqueue_many
+
+
+@override_settings(SMS_QUEUE_MAX_ATTEMPTS=3, SMS_QUEUE_RETRY_BACKOFF=2)
+class SMSDeliveryTestCase(TestCase):
+    def test_deliver_marks_sent(self):
+        provider = FakeSMSProvider()
+        message = SMSOutbox.objects.create(receptor='09123456789', template='users', token='123456')
+        
+        self.assertEqual(deliver([message], provider), [])
+        
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSOutbox.STATUS_SENT)
+        self.assertEqual(message.attempts, 1)
+        self.assertIsNotNone(message.sent_at)
+        self.assertEqual(provider.sent, [('09123456789', 'users', '123456')])
+        # The OTP is not kept once it has been delivered
+        self.assertEqual(message.token, '')
+    
+    def test_failure_is_retried_with_backoff(self):
+        provider = FakeSMSProvider(failure_rate=1.0)
+        message = SMSOutbox.objects.create(receptor='09123456789', template='users')
+        first_due = message.next_attempt_at
+        
+        message.token = '123456'
+        retry = deliver([message], provider)
+        self.assertEqual([m.id for m in retry], [message.id])
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSOutbox.STATUS_PENDING)
+        self.assertGreaterEqual((message.next_attempt_at - first_due).total_seconds(), 2)
+        
+        deliver([message], provider)
+        self.assertEqual(deliver([message], provider), [])
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSOutbox.STATUS_FAILED)
+        self.assertEqual(message.attempts, 3)
+        self.assertTrue(message.last_error)
+        self.assertEqual(message.token, '')
+    
+    def test_drain_outbox_only_sends_due_messages(self):
+        provider = FakeSMSProvider()
+        enqueue_many([('0912000000%d' % i, 'users', '') for i in range(5)])
+        SMSOutbox.objects.filter(receptor='09120000000').update(
+            next_attempt_at='2999-01-01T00:00:00Z'
+        )
+        
+        self.assertEqual(drain_outbox(batch_size=2, provider=provider), 4)
+        self.assertEqual(SMSOutbox.objects.filter(status=SMSOutbox.STATUS_PENDING).count(), 1)
+    
+    def test_claimed_rows_are_not_sent_twice(self):
+        provider = FakeSMSProvider()
+        message = SMSOutbox.objects.create(receptor='09123456789', template='users')
+        pending = SMSOutbox.objects.filter(id=message.id, status=SMSOutbox.STATUS_PENDING)
+        
+        self.assertEqual(claim(pending), [message])
+        self.assertEqual(claim(pending), [])
+        # The outbox command skips rows a worker is still sending
+        self.assertEqual(drain_outbox(provider=provider), 0)
+        self.assertEqual(provider.sent, [])
+    
+    def test_expired_claims_are_sent_again(self):
+        provider = FakeSMSProvider()
+        message = SMSOutbox.objects.create(receptor='09123456789', template='users')
+        with override_settings(SMS_QUEUE_CLAIM_TIMEOUT=-1):
+            claim(SMSOutbox.objects.filter(id=message.id))
+        
+        self.assertEqual(drain_outbox(provider=provider), 1)
+        message.refresh_from_db()
+        self.assertEqual(message.status, SMSOutbox.STATUS_SENT)
+    
+    @patch('account.sms.get_dispatcher')
+    def test_view_only_enqueues(self, mock_get_dispatcher):
+        client = APIClient()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post(reverse('request-otp'), {'phone_number': '09123456789'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        message = SMSOutbox.objects.get(receptor='09123456789')
+        self.assertEqual(message.status, SMSOutbox.STATUS_PENDING)
+        mock_get_dispatcher.return_value.submit.assert_called_once_with(message.id)
+
+
+class SMSDispatcherTestCase(TransactionTestCase):
+    def test_workers_drain_queue_in_batches(self):
+        provider = FakeSMSProvider()
+        # A single worker: the in-memory test database locks tables per connection
+        dispatcher = SMSDispatcher(workers=1, batch_size=10, provider=provider)
+        messages = SMSOutbox.objects.bulk_create([
+            SMSOutbox(receptor='0912%07d' % i, template='users') for i in range(25)
+        ])
+        
+        for message in messages:
+            dispatcher.submit(message.id)
+        dispatcher.join()
+        
+        self.assertEqual(len(provider.sent), 25)
+        self.assertFalse(SMSOutbox.objects.exclude(status=SMSOutbox.STATUS_SENT).exists())
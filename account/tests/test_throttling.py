@@ -0,0 +1,209 @@
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.throttling import (
+    CacheThrottleBackend, FakeRedis, MemoryThrottleBackend, RedisThrottleBackend,
+    check_throttle_backend, gcra, parse_rate,
+)
+
+User = get_user_model()
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        'DEFAULT_THROTTLE_RATES': {scope.replace('__', ':'): rate for scope, rate in rates.items()},
+    })
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    """GCRA arithmetic and the in-process/cache backends"""
+
+    def test_burst_then_steady_rate(self):
+        limits = [('k', *parse_rate('3/min'))]
+        tat = None
+        for _ in range(3):
+            wait, (tat,) = gcra([tat], 0.0, limits)
+            self.assertEqual(wait, 0.0)
+        self.assertEqual(gcra([tat], 0.0, limits), (20.0, None))
+        # one token back every 20 seconds
+        self.assertEqual(gcra([tat], 20.0, limits)[0], 0.0)
+
+    def test_all_buckets_or_none(self):
+        limits = [('phone', *parse_rate('1/min')), ('ip', *parse_rate('10/min'))]
+        backend = MemoryThrottleBackend()
+        self.assertEqual(backend.consume(limits), 0.0)
+        ip_tat = backend._data['ip']
+
+        self.assertGreater(backend.consume(limits), 0)
+        # the rejected request did not charge the ip bucket
+        self.assertEqual(backend._data['ip'], ip_tat)
+
+    def test_memory_backend_is_bounded(self):
+        backend = MemoryThrottleBackend(max_entries=2)
+        for key in 'abc':
+            backend.consume([(key, 1.0, 60)])
+        self.assertEqual(list(backend._data), ['b', 'c'])
+
+    def test_cache_backend_shared_between_instances(self):
+        cache.clear()
+        limits = [('throttle:test:ip:1', *parse_rate('2/min'))]
+        # two workers pointing at the same cache
+        first, second = CacheThrottleBackend(), CacheThrottleBackend()
+        self.assertEqual(first.consume(limits), 0.0)
+        self.assertEqual(second.consume(limits), 0.0)
+        self.assertGreater(first.consume(limits), 0)
+
+
+class RedisThrottleBackendTestCase(SimpleTestCase):
+    """The Lua script path, run by the in-process FakeRedis"""
+
+    def setUp(self):
+        self.now = 1_000_000.0
+        self.redis = FakeRedis(clock=lambda: self.now)
+        self.backend = RedisThrottleBackend(client=self.redis)
+
+    def test_burst_then_steady_rate(self):
+        limits = [('k', *parse_rate('3/min'))]
+        for _ in range(3):
+            self.assertEqual(self.backend.consume(limits), 0.0)
+        self.assertEqual(self.backend.consume(limits), 20.0)
+        self.now += 20
+        self.assertEqual(self.backend.consume(limits), 0.0)
+
+    def test_matches_gcra(self):
+        limits = [('phone', *parse_rate('2/min')), ('ip', *parse_rate('5/min'))]
+        memory = MemoryThrottleBackend()
+        with patch('core.throttling.time.time', lambda: self.now):
+            for step in range(8):
+                self.now += 7
+                self.assertAlmostEqual(self.backend.consume(limits), memory.consume(limits), msg=step)
+
+    def test_all_buckets_or_none(self):
+        limits = [('phone', *parse_rate('1/min')), ('ip', *parse_rate('10/min'))]
+        self.assertEqual(self.backend.consume(limits), 0.0)
+        ip_tat = self.redis.get('ip')
+
+        self.assertGreater(self.backend.consume(limits), 0)
+        self.assertEqual(self.redis.get('ip'), ip_tat)
+
+    def test_shared_between_workers_and_expires(self):
+        limits = [('k', *parse_rate('2/min'))]
+        other = RedisThrottleBackend(client=self.redis)
+        self.assertEqual(self.backend.consume(limits), 0.0)
+        self.assertEqual(other.consume(limits), 0.0)
+        self.assertGreater(self.backend.consume(limits), 0)
+
+        # the key lives until the bucket is full again
+        self.assertEqual(self.redis.pttl('k'), 60_000)
+        self.now += 60
+        self.assertIsNone(self.redis.get('k'))
+
+    def test_outage_allows_requests(self):
+        self.redis.available = False
+        with self.assertLogs('core.throttling', 'WARNING'):
+            self.assertEqual(self.backend.consume([('k', 60.0, 60)]), 0.0)
+
+
+class ThrottleBackendCheckTestCase(SimpleTestCase):
+
+    def test_process_local_cache_warns(self):
+        # the test settings use LocMem behind the tiered cache
+        self.assertEqual([w.id for w in check_throttle_backend(None)], ['core.W001'])
+        with override_settings(THROTTLE_BACKEND='core.throttling.MemoryThrottleBackend'):
+            self.assertEqual([w.id for w in check_throttle_backend(None)], ['core.W001'])
+
+    @override_settings(THROTTLE_BACKEND='core.throttling.RedisThrottleBackend')
+    def test_redis_backend_passes(self):
+        self.assertEqual(check_throttle_backend(None), [])
+
+
+@override_settings(KAVEH_NEGAR_API_KEY='test-api-key', SMS_QUEUE_EAGER=True)
+@patch('account.sms.KavenegarAPI', MagicMock())
+class EndpointThrottlingTestCase(TestCase):
+    """Per-phone, per-IP and per-user buckets on the OTP and payment views"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _request_otp(self, phone, ip='10.0.0.1'):
+        return self.client.post(reverse('request-otp'), {'phone_number': phone}, REMOTE_ADDR=ip)
+
+    @throttle_rates(otp='2/min', otp__ip='100/min')
+    def test_otp_per_phone(self):
+        for _ in range(2):
+            self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_200_OK)
+        # a new address does not help the same phone number
+        response = self._request_otp('09120000001', ip='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+        self.assertEqual(self._request_otp('09120000002').status_code, status.HTTP_200_OK)
+
+    @throttle_rates(otp='3/min', otp__ip='100/min')
+    def test_otp_phone_spellings_share_a_bucket(self):
+        for spelling in ('09120000001', '0912 000 0001', '+989120000001'):
+            self.assertEqual(self._request_otp(spelling).status_code, status.HTTP_200_OK)
+        for spelling in ('00989120000001', '۰۹۱۲۰۰۰۰۰۰۱'):
+            self.assertEqual(self._request_otp(spelling).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(otp='100/min', otp__ip='2/min')
+    def test_otp_per_ip(self):
+        self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_200_OK)
+        self.assertEqual(self._request_otp('09120000002').status_code, status.HTTP_200_OK)
+        self.assertEqual(self._request_otp('09120000003').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self._request_otp('09120000003', ip='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    @throttle_rates(otp='1/min', otp_verify='2/min')
+    def test_verify_has_its_own_phone_bucket(self):
+        self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_200_OK)
+        # a request plus typos does not use up the verify bucket, nor the other way round
+        for _ in range(2):
+            response = self.client.post(reverse('verify-otp'), {'phone_number': '09120000001', 'code': 111111})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('verify-otp'), {'phone_number': '09120000001', 'code': 111111})
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(otp='2/min', otp__ip='100/min')
+    def test_shared_redis_backend(self):
+        backend = RedisThrottleBackend(client=FakeRedis())
+        with patch('core.throttling.get_throttle_backend', return_value=backend):
+            for _ in range(2):
+                self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_200_OK)
+            response = self._request_otp('09120000001')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+
+    @throttle_rates(payment='2/min', payment__ip='100/min')
+    def test_create_transaction_per_user(self):
+        url = reverse('payment:create-transaction')
+        users = [User.objects.create_user(phone_number=f'0912000000{i}', is_active=True) for i in range(2)]
+
+        self.client.force_authenticate(users[0])
+        for _ in range(2):
+            # invalid amount: rejected after the throttle, without a gateway call
+            self.assertEqual(self.client.post(url, {'amount': 1}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {'amount': 1}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.client.force_authenticate(users[1])
+        self.assertEqual(self.client.post(url, {'amount': 1}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    @throttle_rates(payment_verify='2/min')
+    def test_verify_payment_per_ip(self):
+        url = reverse('payment:verify-payment')
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, {}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {}).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.post(url, {}, REMOTE_ADDR='10.0.0.9').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_scope_without_rate_is_not_limited(self):
+        with throttle_rates():
+            for _ in range(5):
+                self.assertEqual(self._request_otp('09120000001').status_code, status.HTTP_200_OK)
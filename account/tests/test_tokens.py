@@ -0,0 +1,123 @@
+import io
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.authentication import revoke_tokens
+from account.models import IssuedRefreshToken
+from account.otp_store import get_otp_store
+from account.tokens import issue_tokens, prune_refresh_tokens
+
+User = get_user_model()
+
+
+@override_settings(KAVEH_NEGAR_API_KEY='test-api-key', SMS_QUEUE_EAGER=True)
+class RefreshTokenTestCase(TestCase):
+    """Refresh token rotation, revocation and pruning"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(phone_number='09123456789', is_active=True)
+        self.refresh_url = reverse('token-refresh')
+
+    def _refresh(self, token):
+        return self.client.post(self.refresh_url, {'refresh': str(token)}, format='json')
+
+    @patch('account.sms.KavenegarAPI')
+    def test_login_records_refresh_token(self, mock_kavenegar):
+        get_otp_store().issue('09123456789', 123456)
+        response = self.client.post(reverse('verify-otp'), {'phone_number': '09123456789', 'code': 123456})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        row = IssuedRefreshToken.objects.get(user=self.user)
+        self.assertIsNone(row.rotated_at)
+        self.assertGreater(row.expires_at, timezone.now() + timedelta(days=29))
+        self.assertEqual(self._refresh(response.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_rotation(self):
+        old = issue_tokens(self.user)
+        response = self._refresh(old)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], str(old))
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_200_OK)
+        self.assertEqual(IssuedRefreshToken.objects.filter(rotated_at__isnull=True).count(), 1)
+
+        # the new one rotates again
+        self.assertEqual(self._refresh(response.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_concurrent_refresh_gets_same_successor(self):
+        old = issue_tokens(self.user)
+        first = self._refresh(old)
+        second = self._refresh(old)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+
+        successor = IssuedRefreshToken.objects.get(rotated_at__isnull=True)
+        self.assertEqual(IssuedRefreshToken.objects.get(jti=old['jti']).replaced_by, successor.jti)
+        for response in (first, second):
+            self.assertEqual(RefreshToken(response.data['refresh'])['jti'], successor.jti)
+        self.assertEqual(IssuedRefreshToken.objects.count(), 2)
+        self.assertEqual(self._refresh(second.data['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_reuse_revokes_all_tokens(self):
+        old = issue_tokens(self.user)
+        new = self._refresh(old).data
+        # past the grace window
+        IssuedRefreshToken.objects.filter(jti=old['jti']).update(rotated_at=timezone.now() - timedelta(minutes=1))
+
+        response = self._refresh(old)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'token_revoked')
+
+        # tokens issued from the leaked one are dead too
+        self.assertEqual(self._refresh(new['refresh']).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {new["access"]}')
+        self.assertEqual(self.client.get(reverse('profile')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout(self):
+        token = issue_tokens(self.user)
+        other = issue_tokens(self.user)
+        response = self.client.post(reverse('logout'), {'refresh': str(token)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(IssuedRefreshToken.objects.get(jti=token['jti']).revoked_at)
+
+        response = self._refresh(token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['code'], 'token_revoked')
+        # a replayed logout is not treated as theft: other sessions keep working
+        self.assertEqual(self._refresh(other).status_code, status.HTTP_200_OK)
+
+    def test_rejected_tokens(self):
+        token = issue_tokens(self.user)
+        self.assertEqual(self._refresh(token.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._refresh('not-a-token').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(self.refresh_url, {}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        revoke_tokens(self.user.pk)
+        self.assertEqual(self._refresh(token).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune(self):
+        for _ in range(5):
+            issue_tokens(self.user)
+        live = issue_tokens(self.user)
+        IssuedRefreshToken.objects.exclude(jti=live['jti']).update(expires_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertNumQueries(6):
+            # three batches of two SELECT + DELETE
+            self.assertEqual(prune_refresh_tokens(batch_size=2, limit=5), 5)
+        self.assertEqual(list(IssuedRefreshToken.objects.values_list('jti', flat=True)), [live['jti']])
+
+        out = io.StringIO()
+        call_command('prune_refresh_tokens', stdout=out)
+        self.assertIn('0 توکن منقضی حذف شد', out.getvalue())
@@ -0,0 +1,143 @@
+"""
+Refresh token issuance, rotation and the outstanding-token store.
+
+Every refresh token handed out is recorded in ``IssuedRefreshToken`` (one
+row, keyed by its unique ``jti``), in the same transaction as the login that
+issued it. ``rotate_refresh_token`` exchanges a refresh token for a new pair
+and marks the old row as rotated (recording the successor's jti) with a single
+conditional UPDATE. Within ``REFRESH_TOKEN_REUSE_GRACE`` seconds of that, the
+same token gets the same successor back, so concurrent refreshes from one
+client (several tabs, a retry after a timeout) do not look like theft.
+Presenting a rotated token after the grace window means it leaked: every
+token of that user is revoked (``revoke_tokens``). ``revoke_refresh_token``
+marks one token as revoked (logout); presenting it again is simply rejected.
+
+Rows are only needed until the token expires. ``prune_refresh_tokens``
+deletes expired rows in batches over the ``expires_at`` index, from the
+``prune_refresh_tokens`` command.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch, datetime_to_epoch
+
+from .authentication import VERSION_CLAIM, check_token_version, get_auth_state, revoke_tokens
+from .models import IssuedRefreshToken
+
+logger = logging.getLogger(__name__)
+
+
+def _build(user_id, token_version):
+    refresh = RefreshToken()
+    refresh[api_settings.USER_ID_CLAIM] = user_id
+    refresh[VERSION_CLAIM] = token_version
+    row = IssuedRefreshToken(
+        jti=refresh[api_settings.JTI_CLAIM], user_id=user_id, expires_at=datetime_from_epoch(refresh['exp'])
+    )
+    return refresh, row
+
+
+def _successor(row, token_version):
+    """Refresh token carrying an already recorded row's jti and expiry."""
+    refresh = RefreshToken()
+    refresh[api_settings.JTI_CLAIM] = row.jti
+    refresh['exp'] = datetime_to_epoch(row.expires_at)
+    refresh[api_settings.USER_ID_CLAIM] = row.user_id
+    refresh[VERSION_CLAIM] = token_version
+    return refresh
+
+
+def issue_tokens(user):
+    """Recorded refresh token (and its access token) stamped with the user's token version."""
+    refresh, row = _build(user.pk, user.token_version)
+    row.save(force_insert=True)
+    return refresh
+
+
+async def aissue_tokens(user):
+    refresh, row = _build(user.pk, user.token_version)
+    await row.asave(force_insert=True)
+    return refresh
+
+
+def _decode(raw):
+    try:
+        return RefreshToken(raw)
+    except TokenError as e:
+        raise InvalidToken(e.args[0]) from e
+
+
+def rotate_refresh_token(raw):
+    """Exchange refresh token ``raw`` for a new one; raises simplejwt's ``InvalidToken``/``AuthenticationFailed``."""
+    old = _decode(raw)
+    user_id = old[api_settings.USER_ID_CLAIM]
+    jti = old[api_settings.JTI_CLAIM]
+
+    state = get_auth_state(user_id)
+    if state is None:
+        raise AuthenticationFailed(_('User not found'), code='user_not_found')
+    if api_settings.CHECK_USER_IS_ACTIVE and not state.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    check_token_version(old, state.token_version)
+
+    with transaction.atomic():
+        refresh, row = _build(user_id, state.token_version)
+        rotated = IssuedRefreshToken.objects.filter(
+            jti=jti, user_id=user_id, rotated_at__isnull=True, revoked_at__isnull=True
+        ).update(rotated_at=timezone.now(), replaced_by=row.jti)
+        if rotated:
+            row.save(force_insert=True)
+            return refresh
+
+    old_row = IssuedRefreshToken.objects.filter(jti=jti).first()
+    if old_row is None:
+        raise InvalidToken(_('Token is invalid or expired'))
+    if old_row.revoked_at is not None:
+        raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+    grace = timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE)
+    if old_row.replaced_by and timezone.now() - old_row.rotated_at <= grace:
+        # Lost race with a concurrent refresh of the same token: hand out its result
+        successor = IssuedRefreshToken.objects.filter(jti=old_row.replaced_by).first()
+        if successor is not None and successor.revoked_at is not None:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if successor is not None and successor.rotated_at is None:
+            return _successor(successor, state.token_version)
+
+    logger.warning('Rotated refresh token reused, revoking all tokens of user %s', user_id)
+    revoke_tokens(user_id)
+    raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+
+
+def revoke_refresh_token(raw):
+    """Revoke a single refresh token (logout)."""
+    token = _decode(raw)
+    IssuedRefreshToken.objects.filter(
+        jti=token[api_settings.JTI_CLAIM], rotated_at__isnull=True, revoked_at__isnull=True
+    ).update(revoked_at=timezone.now())
+
+
+def prune_refresh_tokens(batch_size=1000, limit=None, now=None, progress=None):
+    """Delete expired token rows, ``batch_size`` at a time; returns the number deleted."""
+    now = now or timezone.now()
+    deleted = 0
+    started = time.monotonic()
+    while limit is None or deleted < limit:
+        size = batch_size if limit is None else min(batch_size, limit - deleted)
+        ids = list(IssuedRefreshToken.objects.filter(expires_at__lt=now).order_by(
+            'expires_at'
+        ).values_list('pk', flat=True)[:size])
+        if not ids:
+            break
+        deleted += IssuedRefreshToken.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress(deleted, time.monotonic() - started)
+    return deleted
@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import RequestOTPView, VerifyOTPView, ProfileView
+from .views import RequestOTPView, VerifyOTPView, TokenRefreshView, LogoutView, ProfileView, UserImportAPIView
 
 urlpatterns = [
     path('auth/register/', RequestOTPView.as_view(), name='request-otp'),
     path('auth/verify/', VerifyOTPView.as_view(), name='verify-otp'),
+    path('auth/token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('auth/logout/', LogoutView.as_view(), name='logout'),
     path('auth/profile/', ProfileView.as_view(), name='profile'),
+    path('auth/users/import/', UserImportAPIView.as_view(), name='user-import'),
 ]
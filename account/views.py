@@ -1,33 +1,39 @@
+import io
 import secrets
-import logging
-from datetime import timedelta
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework.throttling import ScopedRateThrottle
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
 from django.utils import timezone
-from kavenegar import KavenegarAPI
-from django.conf import settings
 
-from .serializers import RequestOTPSerializer, VerifyOTPSerializer, ProfileSerializer
+from core.db_router import ReplicaReadMixin, pin_to_primary
+from core.throttling import TokenBucketThrottle
 
-User = get_user_model()
-logger = logging.getLogger(__name__)
+from .authentication import ClaimsJWTAuthentication, get_full_user
+from .imports import guess_format, import_users, is_utf8, read_rows
+from .otp_store import (
+    get_otp_store, LOCK_DURATION_MINUTES,
+    OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_LOCKED_NOW,
+)
+from .sms import enqueue_sms
+from .serializers import (
+    RequestOTPSerializer, VerifyOTPSerializer, ProfileSerializer, RefreshTokenSerializer,
+    UserImportSerializer, profile_reader,
+)
+from .tokens import issue_tokens, rotate_refresh_token, revoke_refresh_token
 
-# OTP Configuration
-OTP_EXPIRY_MINUTES = 5
-MAX_OTP_ATTEMPTS = 3
-LOCK_DURATION_MINUTES = 15
+User = get_user_model()
 
 
 class RequestOTPView(APIView):
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
+    throttle_classes = [TokenBucketThrottle]
     throttle_scope = 'otp'
+    throttle_keys = ('phone', 'ip')
     
     def post(self, request):
         serializer = RequestOTPSerializer(data=request.data)
@@ -39,38 +45,25 @@ class RequestOTPView(APIView):
         # Generate cryptographically secure OTP
         auth_code = secrets.randbelow(900000) + 100000
         
-        user, created = User.objects.get_or_create(
+        User.objects.get_or_create(
             phone_number=phone_number,
             defaults={'is_active': False}
         )
         
-        # Reset OTP fields
-        user.auth_code = auth_code
-        user.auth_code_created_at = timezone.now()
-        user.auth_attempts = 0
-        user.auth_locked_until = None
-        user.save(update_fields=['auth_code', 'auth_code_created_at', 'auth_attempts', 'auth_locked_until'])
+        # Store OTP (resets attempts and lock)
+        get_otp_store().issue(phone_number, auth_code)
         
-        # Send OTP via SMS
-        try:
-            api = KavenegarAPI(settings.KAVEH_NEGAR_API_KEY)
-            api.verify_lookup({
-                'receptor': phone_number,
-                'token': str(auth_code),
-                'template': 'users'
-            })
-            logger.info(f'کد OTP با موفقیت به شماره {phone_number} ارسال شد')
-        except Exception as e:
-            logger.exception(f'خطا در ارسال کد OTP به شماره {phone_number}: {str(e)}')
-            # Continue even if SMS fails (for development/testing)
+        # Queue OTP SMS; delivery and retries happen in the SMS dispatcher
+        enqueue_sms(phone_number, 'users', str(auth_code))
         
         return Response({'message': 'کد تایید ارسال شد'}, status=status.HTTP_200_OK)
 
 
 class VerifyOTPView(APIView):
     permission_classes = [AllowAny]
-    throttle_classes = [ScopedRateThrottle]
-    throttle_scope = 'otp'
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'otp_verify'
+    throttle_keys = ('phone', 'ip')
     
     def post(self, request):
         serializer = VerifyOTPSerializer(data=request.data)
@@ -85,45 +78,27 @@ class VerifyOTPView(APIView):
         except User.DoesNotExist:
             return Response({'error': 'اطلاعات ورود نامعتبر است'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Check if account is locked
-        if user.auth_locked_until and timezone.now() < user.auth_locked_until:
-            remaining = (user.auth_locked_until - timezone.now()).seconds // 60
+        result = get_otp_store().verify(phone_number, code)
+        
+        if result.status == OTP_LOCKED:
+            remaining = result.locked_seconds // 60
             return Response(
                 {'error': f'حساب به مدت {remaining} دقیقه قفل شده است. لطفاً بعداً تلاش کنید'},
                 status=status.HTTP_429_TOO_MANY_REQUESTS
             )
         
-        # Check OTP expiry
-        if not user.auth_code_created_at:
+        if result.status == OTP_EXPIRED:
             return Response({'error': 'کد منقضی شده است. لطفاً کد جدید درخواست کنید'}, status=status.HTTP_400_BAD_REQUEST)
         
-        otp_age = timezone.now() - user.auth_code_created_at
-        if otp_age > timedelta(minutes=OTP_EXPIRY_MINUTES):
-            # Clear expired OTP
-            user.auth_code = None
-            user.auth_code_created_at = None
-            user.auth_attempts = 0
-            user.save(update_fields=['auth_code', 'auth_code_created_at', 'auth_attempts'])
-            return Response({'error': 'کد منقضی شده است. لطفاً کد جدید درخواست کنید'}, status=status.HTTP_400_BAD_REQUEST)
+        if result.status == OTP_LOCKED_NOW:
+            return Response(
+                {'error': f'تعداد تلاش‌های نادرست بیش از حد مجاز. حساب برای {LOCK_DURATION_MINUTES} دقیقه قفل شد'},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
         
-        # Verify code
-        if user.auth_code != code:
-            # Increment attempts
-            user.auth_attempts += 1
-            
-            # Lock account if too many attempts
-            if user.auth_attempts >= MAX_OTP_ATTEMPTS:
-                user.auth_locked_until = timezone.now() + timedelta(minutes=LOCK_DURATION_MINUTES)
-                user.save(update_fields=['auth_attempts', 'auth_locked_until'])
-                return Response(
-                    {'error': f'تعداد تلاش‌های نادرست بیش از حد مجاز. حساب برای {LOCK_DURATION_MINUTES} دقیقه قفل شد'},
-                    status=status.HTTP_429_TOO_MANY_REQUESTS
-                )
-            
-            user.save(update_fields=['auth_attempts'])
-            remaining_attempts = MAX_OTP_ATTEMPTS - user.auth_attempts
+        if result.status == OTP_INVALID:
             return Response(
-                {'error': f'کد نادرست است. {remaining_attempts} تلاش باقی مانده'},
+                {'error': f'کد نادرست است. {result.remaining_attempts} تلاش باقی مانده'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -131,31 +106,16 @@ class VerifyOTPView(APIView):
         is_first_login = user.last_login is None
         
         with transaction.atomic():
-            user.auth_code = None
-            user.auth_code_created_at = None
-            user.auth_attempts = 0
-            user.auth_locked_until = None
             user.is_active = True
             user.last_login = timezone.now()
-            user.save(update_fields=[
-                'auth_code', 'auth_code_created_at', 'auth_attempts', 
-                'auth_locked_until', 'is_active', 'last_login'
-            ])
-        
-        # Send welcome message for first login
-        if is_first_login:
-            try:
-                api = KavenegarAPI(settings.KAVEH_NEGAR_API_KEY)
-                api.verify_lookup({
-                    'receptor': phone_number,
-                    'token': '',
-                    'template': 'first-log'
-                })
-                logger.info(f'پیام خوش‌آمدگویی به شماره {phone_number} ارسال شد')
-            except Exception as e:
-                logger.exception(f'خطا در ارسال پیام خوش‌آمدگویی به شماره {phone_number}: {str(e)}')
-        
-        refresh = RefreshToken.for_user(user)
+            user.save(update_fields=['is_active', 'last_login'])
+            
+            # Queue welcome message for first login
+            if is_first_login:
+                enqueue_sms(phone_number, 'first-log', '')
+            
+            # Recorded in the same transaction as the login update
+            refresh = issue_tokens(user)
         
         return Response({
             'message': 'ورود موفق',
@@ -164,25 +124,92 @@ class VerifyOTPView(APIView):
         }, status=status.HTTP_200_OK)
 
 
-class ProfileView(APIView):
+class RefreshTokenAPIView(APIView):
+    """Base for endpoints authenticated by a refresh token in the body rather than a header."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def get_authenticate_header(self, request):
+        # Keeps token errors a 401 even without authentication classes
+        return f'{jwt_settings.AUTH_HEADER_TYPES[0]} realm="api"'
+
+
+class TokenRefreshView(RefreshTokenAPIView):
+    """Exchange a refresh token for a new refresh/access pair (the old one stops working)."""
+    
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        # Invalid, expired, reused or revoked tokens raise a 401
+        refresh = rotate_refresh_token(serializer.validated_data['refresh'])
+        
+        return Response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+        }, status=status.HTTP_200_OK)
+
+
+class LogoutView(RefreshTokenAPIView):
+    """Revoke a refresh token; access tokens expire on their own."""
+    
+    def post(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_refresh_token(serializer.validated_data['refresh'])
+        return Response({'message': 'خروج موفق'}, status=status.HTTP_200_OK)
+
+
+class ProfileView(ReplicaReadMixin, APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        serializer = ProfileSerializer(request.user)
-        return Response(serializer.data)
+        return Response(profile_reader.serialize(request.user))
     
     def put(self, request):
-        serializer = ProfileSerializer(request.user, data=request.data, partial=False)
+        serializer = ProfileSerializer(get_full_user(request.user), data=request.data, partial=False)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         serializer.save()
+        pin_to_primary(request.user.pk)
         return Response(serializer.data)
     
     def patch(self, request):
-        serializer = ProfileSerializer(request.user, data=request.data, partial=True)
+        serializer = ProfileSerializer(get_full_user(request.user), data=request.data, partial=True)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
         serializer.save()
+        pin_to_primary(request.user.pk)
         return Response(serializer.data)
+
+
+class UserImportAPIView(APIView):
+    """Bulk import of users from an uploaded CSV/NDJSON file, for staff (account/imports.py)."""
+    authentication_classes = [ClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    # Rejected rows listed in the response; the rest are only counted
+    max_reported_rejects = 1000
+    
+    def post(self, request):
+        serializer = UserImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data['file']
+        file_format = serializer.validated_data.get('file_format') or guess_format(upload.name)
+        
+        rejected = []
+        
+        def on_reject(row):
+            if len(rejected) < self.max_reported_rejects:
+                rejected.append(row.as_dict())
+        
+        # Checked up front: batches are committed as they go, so a bad byte
+        # halfway through must not leave a partial import behind a 400
+        if not is_utf8(upload.file):
+            return Response({'error': 'فایل باید با کدگذاری UTF-8 باشد'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        stats = import_users(read_rows(stream, file_format), on_reject=on_reject)
+        
+        return Response({**stats.as_dict(), 'rejected_rows': rejected}, status=status.HTTP_200_OK)
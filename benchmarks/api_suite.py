@@ -0,0 +1,213 @@
+"""
+Load test for every public API endpoint, with JSON baselines.
+
+Seeds ``--users`` users with plans, subscriptions and pending transactions,
+points BitPay and Kavenegar at ``GatewayStub``, then drives each endpoint with
+``--concurrency`` client threads. For every endpoint it reports p50/p95/p99
+latency, throughput, error count and ORM queries per request. Query counts
+come from the ``Server-Timing`` header added by
+``core.instrumentation``::
+
+    python -m benchmarks.api_suite --users 300 --concurrency 16 --save benchmarks/baselines/local.json
+    python -m benchmarks.api_suite --users 300 --concurrency 16 --compare benchmarks/baselines/local.json
+
+With ``--compare`` the process exits with status 1 when an endpoint's p95
+grows by more than ``--tolerance`` (default 25%), its throughput drops by more
+than that, or it runs more queries per request than the baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from benchmarks.common import Timer, disable_throttling, percentile, report, setup_django
+from benchmarks.stubs import GatewayStub
+
+ENDPOINTS = ('register', 'verify-otp', 'profile', 'plans', 'purchase', 'create-transaction', 'verify-payment')
+QUERIES_RE = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def drive(concurrency, calls):
+    """Run ``calls`` (zero-argument callables returning a response) and collect samples."""
+    from django.test import Client
+
+    local = threading.local()
+
+    def run(call):
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)
+        start = time.perf_counter()
+        response = call(local.client)
+        elapsed = time.perf_counter() - start
+        match = QUERIES_RE.search(response.get('Server-Timing', ''))
+        return elapsed, response.status_code, int(match.group(1)) if match else None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        with Timer() as timer:
+            samples = list(pool.map(run, calls))
+
+    latencies = [elapsed for elapsed, _, _ in samples]
+    queries = [count for _, _, count in samples if count is not None]
+    return {
+        'requests': len(samples),
+        'errors': sum(code >= 400 for _, code, _ in samples),
+        'rps': len(samples) / timer.elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries_per_request': sum(queries) / len(queries) if queries else None,
+    }
+
+
+def seed(users):
+    from django.utils import timezone
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from account.models import CustomUser
+    from payment.models import SubscriptionPlan, Subscription, Transaction
+
+    plans = SubscriptionPlan.objects.bulk_create([
+        SubscriptionPlan(name=name, duration_days=days, price=price)
+        for name, days, price in (('ماهانه', 30, 50000), ('سه‌ماهه', 90, 140000), ('سالانه', 365, 500000))
+    ])
+    accounts = CustomUser.objects.bulk_create([
+        CustomUser(phone_number='0913%07d' % i, is_active=True) for i in range(users)
+    ])
+    now = timezone.now()
+    # half of the users already have an active subscription (purchase extends it)
+    Subscription.objects.bulk_create([
+        Subscription(user=user, plan=plans[0], start_date=now, end_date=now + timedelta(days=30))
+        for user in accounts[::2]
+    ])
+    for subscription in Subscription.objects.all():
+        subscription.save()  # populate entitlements through the model signal
+    Transaction.objects.bulk_create([
+        Transaction(user=user, amount=10000, card_num=f'seed{user.id}') for user in accounts
+    ])
+    tokens = [f'Bearer {RefreshToken.for_user(user).access_token}' for user in accounts]
+    return plans, accounts, tokens
+
+
+def run_suite(args):
+    # every request is measured; throttling and real providers are out of the picture
+    disable_throttling()
+    os.environ['SMS_PROVIDER'] = 'account.sms.KavenegarHTTPSMSProvider'
+    setup_django()
+
+    from django.conf import settings
+    from account.otp_store import get_otp_store
+
+    results = {}
+    with GatewayStub(latency=args.latency) as stub:
+        stub.configure(settings)
+        plans, accounts, tokens = seed(args.users)
+        phones = ['0914%07d' % i for i in range(args.users)]
+        n = args.users
+
+        suites = {
+            'register': [
+                lambda c, p=p: c.post('/api/auth/register/', {'phone_number': p}) for p in phones
+            ],
+            'verify-otp': [
+                lambda c, p=p: c.post('/api/auth/verify/', {
+                    'phone_number': p, 'code': str(get_otp_store().get_code(p)),
+                }) for p in phones
+            ],
+            'profile': [
+                lambda c, t=t: c.get('/api/auth/profile/', HTTP_AUTHORIZATION=t) for t in tokens
+            ],
+            'plans': [lambda c: c.get('/api/payment/plans/')] * n,
+            'purchase': [
+                lambda c, t=t: c.post('/api/payment/subscription/purchase/', {'plan_id': plans[0].id},
+                                      HTTP_AUTHORIZATION=t) for t in tokens
+            ],
+            'create-transaction': [
+                lambda c, t=t: c.post('/api/payment/transaction/create/', {'amount': 10000},
+                                      HTTP_AUTHORIZATION=t) for t in tokens
+            ],
+            'verify-payment': [
+                lambda c, u=u: c.post('/api/payment/verify/', {'trans_id': f't{u.id}', 'id_get': f'seed{u.id}'})
+                for u in accounts
+            ],
+        }
+        for name in ENDPOINTS:
+            results[name] = drive(args.concurrency, suites[name])
+
+    return {
+        'meta': {
+            'users': args.users,
+            'concurrency': args.concurrency,
+            'gateway_latency_ms': args.latency * 1000,
+            'database': settings.DATABASES['default']['ENGINE'],
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """Rows for the report plus the list of regressions."""
+    rows, regressions = [], []
+    for name, result in current['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if base is None:
+            continue
+        p95 = result['p95_ms'] / base['p95_ms'] - 1 if base['p95_ms'] else 0.0
+        rps = result['rps'] / base['rps'] - 1 if base['rps'] else 0.0
+        rows.append((name, f'p95 {p95:+.0%}  rps {rps:+.0%}  queries '
+                           f"{base['queries_per_request'] or 0:.1f} -> {result['queries_per_request'] or 0:.1f}"))
+        if p95 > tolerance:
+            regressions.append(f'{name}: p95 {base["p95_ms"]:.1f} -> {result["p95_ms"]:.1f} ms')
+        if rps < -tolerance:
+            regressions.append(f'{name}: {base["rps"]:.1f} -> {result["rps"]:.1f} req/s')
+        if (result['queries_per_request'] or 0) > (base['queries_per_request'] or 0) + 0.01:
+            regressions.append(
+                f'{name}: queries {base["queries_per_request"] or 0:.1f} -> {result["queries_per_request"] or 0:.1f}'
+            )
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05, help='stub gateway latency (s)')
+    parser.add_argument('--save', metavar='PATH', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='compare against a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = run_suite(args)
+
+    report(f'{args.users} requests per endpoint, {args.concurrency} concurrent clients', [
+        (name, f"{r['rps']:8,.1f} req/s  p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  "
+               f"p99 {r['p99_ms']:7.1f} ms  queries {r['queries_per_request'] or 0:5.1f}  errors {r['errors']}")
+        for name, r in results['endpoints'].items()
+    ])
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nbaseline written to {args.save}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows, regressions = compare(results, baseline, args.tolerance)
+        report(f'change vs {args.compare}', rows)
+        if regressions:
+            print('\nregressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Sync (WSGI) vs async (ASGI) throughput on gateway-bound endpoints.
+
+Drives ``/api/payment/transaction/create/`` and ``/api/payment/verify/`` and
+their ``/api/async/...`` twins in-process against ``GatewayStub``. The sync
+side models a WSGI server with ``--wsgi-workers`` threads; the async side
+keeps up to ``--concurrency`` requests in flight on a single event loop::
+
+    python -m benchmarks.asgi_vs_wsgi --requests 400 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, report, setup_django
+from benchmarks.stubs import GatewayStub
+
+
+def run_sync(path, payloads, auth, workers):
+    from django.test import Client
+
+    local = threading.local()
+
+    def call(payload):
+        if not hasattr(local, 'client'):
+            local.client = Client()
+        return local.client.post(path, payload, HTTP_AUTHORIZATION=auth).status_code
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        with Timer() as timer:
+            codes = list(pool.map(call, payloads))
+    return timer.elapsed, codes
+
+
+def run_async(path, payloads, auth, concurrency):
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(payload):
+            async with semaphore:
+                response = await client.post(path, payload, headers={'Authorization': auth})
+                return response.status_code
+
+        return await asyncio.gather(*(call(p) for p in payloads))
+
+    with Timer() as timer:
+        codes = asyncio.run(main())
+    return timer.elapsed, codes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--latency', type=float, default=0.2, help='stub gateway latency (s)')
+    parser.add_argument('--wsgi-workers', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from account.models import CustomUser
+    from payment.models import Transaction
+
+    user = CustomUser.objects.create_user(phone_number='09120000000', is_active=True)
+    auth = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+    rows = []
+    with GatewayStub(latency=args.latency) as stub:
+        stub.configure(settings)
+        for label, sync_path, async_path in (
+            ('create', '/api/payment/transaction/create/', '/api/async/payment/transaction/create/'),
+            ('verify', '/api/payment/verify/', '/api/async/payment/verify/'),
+        ):
+            def payloads():
+                if label == 'create':
+                    return [{'amount': 10000}] * args.requests
+                ids = [f'bench{i}' for i in range(args.requests)]
+                Transaction.objects.filter(card_num__in=ids).delete()
+                Transaction.objects.bulk_create([
+                    Transaction(user=user, amount=10000, card_num=id_get) for id_get in ids
+                ])
+                return [{'trans_id': f't{id_get}', 'id_get': id_get} for id_get in ids]
+
+            sync_time, sync_codes = run_sync(sync_path, payloads(), auth, args.wsgi_workers)
+            async_time, async_codes = run_async(async_path, payloads(), auth, args.concurrency)
+            rows += [
+                (f'{label} WSGI req/sec ({args.wsgi_workers} workers)', f'{args.requests / sync_time:,.1f}'),
+                (f'{label} ASGI req/sec ({args.concurrency} in flight)', f'{args.requests / async_time:,.1f}'),
+                (f'{label} non-2xx (WSGI/ASGI)',
+                 f'{sum(c >= 300 for c in sync_codes)}/{sum(c >= 300 for c in async_codes)}'),
+            ]
+
+    report(f'{args.requests} requests per run, {args.latency * 1000:.0f} ms gateway latency', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throw-away SQLite database so they never touch the
+development database. Run them from the repository root, e.g.::
+
+    python -m benchmarks.sms_dispatch
+"""
+
+import math
+import os
+import tempfile
+import time
+
+
+def setup_django(db_name=None):
+    """Configure Django against a fresh temporary database and migrate it."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret-key-not-for-production-use')
+    os.environ.setdefault('KAVEH_NEGAR_API_KEY', 'benchmark')
+    os.environ.setdefault('BITPAY_API_KEY', 'benchmark')
+    # Query counts per request are read from Server-Timing
+    os.environ.setdefault('SERVER_TIMING', 'True')
+
+    import django
+    from django.conf import settings
+
+    if db_name is None:
+        db_name = os.path.join(tempfile.mkdtemp(prefix='helssa-bench-'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_name
+    # Host used by django.test.Client / AsyncClient
+    settings.ALLOWED_HOSTS = list(settings.ALLOWED_HOSTS) + ['testserver']
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return db_name
+
+
+def disable_throttling():
+    """Raise every API rate limit so each benchmark request is measured (call before ``setup_django``)."""
+    for name in ('OTP', 'OTP_IP', 'OTP_VERIFY', 'OTP_VERIFY_IP', 'PAYMENT', 'PAYMENT_IP', 'PAYMENT_VERIFY'):
+        os.environ[f'{name}_THROTTLE_RATE'] = '1000000/min'
+
+
+class Timer:
+    """Context manager measuring wall time in seconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def report(title, rows):
+    """Print ``(label, value)`` rows under a title."""
+    print(f'\n{title}')
+    print('-' * len(title))
+    width = max(len(label) for label, _ in rows)
+    for label, value in rows:
+        print(f'{label.ljust(width)}  {value}')
+
+
+def percentile(samples, p):
+    """``p`` (0-1) percentile of ``samples`` using the nearest-rank method."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p * len(ordered)) - 1))]
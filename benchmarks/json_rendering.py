@@ -0,0 +1,109 @@
+"""
+Serialization and JSON rendering/parsing on the API read paths.
+
+Serializes real ``Subscription`` (nested plan) and ``SubscriptionTransaction``
+(UUID primary key) rows with the API serializers, then times rendering and
+parsing the result with DRF's stdlib ``JSONRenderer`` vs ``FastJSONRenderer``.
+``Subscription`` rows are also serialized with the compiled read serializer
+(from instances and from ``.values()`` rows) against ``SubscriptionSerializer``::
+
+    python -m benchmarks.json_rendering --rows 1000 --repeat 20
+"""
+
+import argparse
+import io
+
+from benchmarks.common import Timer, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from datetime import timedelta
+
+    from django.utils import timezone
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from account.models import CustomUser
+    from core.renderers import FastJSONParser, FastJSONRenderer, orjson
+    from payment.models import Subscription, SubscriptionPlan, SubscriptionTransaction
+    from payment.serializers import (
+        SubscriptionSerializer, SubscriptionTransactionSerializer, subscription_reader,
+    )
+
+    now = timezone.now()
+    plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+    users = CustomUser.objects.bulk_create([
+        CustomUser(phone_number='0912%07d' % i) for i in range(args.rows)
+    ])
+    Subscription.objects.bulk_create([
+        Subscription(user=user, plan=plan, start_date=now, end_date=now + timedelta(days=30))
+        for user in users
+    ])
+    SubscriptionTransaction.objects.bulk_create([
+        SubscriptionTransaction(user=user, plan=plan, amount=plan.price, before_end_date=now,
+                                after_end_date=now + timedelta(days=30))
+        for user in users
+    ])
+
+    payloads = {
+        'subscriptions': SubscriptionSerializer(
+            Subscription.objects.select_related('plan'), many=True, context={'now': now}
+        ).data,
+        'subscription transactions': SubscriptionTransactionSerializer(
+            SubscriptionTransaction.objects.select_related('plan'), many=True
+        ).data,
+    }
+
+    rows = [('orjson installed', 'yes' if orjson is not None else 'no (fallback path)')]
+
+    instances = list(Subscription.objects.select_related('plan'))
+    values = list(subscription_reader.values(Subscription.objects.all()))
+    context = {'now': now}
+    with Timer() as drf:
+        for _ in range(args.repeat):
+            SubscriptionSerializer(instances, many=True, context=context).data
+    with Timer() as compiled:
+        for _ in range(args.repeat):
+            subscription_reader.serialize_many(instances, context=context)
+    with Timer() as compiled_rows:
+        for _ in range(args.repeat):
+            subscription_reader.serialize_rows(values, context=context)
+    rows += [
+        ('subscriptions: DRF serializer', f'{drf.elapsed / args.repeat * 1000:,.2f} ms'),
+        ('subscriptions: compiled (instances)', f'{compiled.elapsed / args.repeat * 1000:,.2f} ms'),
+        ('subscriptions: compiled (values rows)', f'{compiled_rows.elapsed / args.repeat * 1000:,.2f} ms'),
+        ('subscriptions: serialize speedup', f'{drf.elapsed / compiled.elapsed:,.1f}x'),
+    ]
+    for name, data in payloads.items():
+        timings = {}
+        for label, renderer, json_parser in [
+            ('stdlib', JSONRenderer(), JSONParser()),
+            ('fast', FastJSONRenderer(), FastJSONParser()),
+        ]:
+            # warm-up, not measured
+            json_parser.parse(io.BytesIO(renderer.render(data, 'application/json')))
+            with Timer() as render:
+                for _ in range(args.repeat):
+                    body = renderer.render(data, 'application/json')
+            with Timer() as parse:
+                for _ in range(args.repeat):
+                    json_parser.parse(io.BytesIO(body))
+            timings[label] = (render.elapsed / args.repeat, parse.elapsed / args.repeat)
+            rows.append((f'{name}: {label} render', f'{timings[label][0] * 1000:,.2f} ms'))
+            rows.append((f'{name}: {label} parse', f'{timings[label][1] * 1000:,.2f} ms'))
+        rows.append((f'{name}: render speedup', f'{timings["stdlib"][0] / timings["fast"][0]:,.1f}x'))
+        rows.append((f'{name}: parse speedup', f'{timings["stdlib"][1] / timings["fast"][1]:,.1f}x'))
+        rows.append((f'{name}: body size', f'{len(body) / 1024:,.1f} KiB'))
+
+    report(f'{args.rows} rows, mean of {args.repeat} runs', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+SMS dispatch throughput: inline sends vs the outbox worker pool.
+
+Uses ``FakeSMSProvider`` with a configurable per-message latency to stand in
+for Kavenegar, so it runs fully offline::
+
+    python -m benchmarks.sms_dispatch --messages 500 --latency 0.02 --workers 8
+"""
+
+import argparse
+
+from benchmarks.common import Timer, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.02, help='seconds per provider call')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from account.models import SMSOutbox
+    from account.sms import FakeSMSProvider, SMSDispatcher, deliver
+
+    def make_rows():
+        SMSOutbox.objects.all().delete()
+        return SMSOutbox.objects.bulk_create([
+            SMSOutbox(receptor='0912%07d' % i, template='users', token='123456')
+            for i in range(args.messages)
+        ])
+
+    # Baseline: one provider call per request, inline
+    rows = make_rows()
+    provider = FakeSMSProvider(latency=args.latency)
+    with Timer() as inline:
+        for row in rows:
+            deliver([row], provider)
+
+    # Queue: enqueue only, worker pool sends in batches
+    rows = make_rows()
+    provider = FakeSMSProvider(latency=args.latency)
+    dispatcher = SMSDispatcher(workers=args.workers, batch_size=args.batch_size, provider=provider)
+    with Timer() as enqueue:
+        for row in rows:
+            dispatcher.submit(row.id)
+    with Timer() as drained:
+        dispatcher.join()
+
+    sent = SMSOutbox.objects.filter(status=SMSOutbox.STATUS_SENT).count()
+    report(f'{args.messages} messages, {args.latency * 1000:.0f} ms provider latency', [
+        ('inline msgs/sec', f'{args.messages / inline.elapsed:,.1f}'),
+        ('queued msgs/sec', f'{args.messages / (enqueue.elapsed + drained.elapsed):,.1f}'),
+        ('enqueue cost per request', f'{enqueue.elapsed / args.messages * 1e6:,.1f} us'),
+        ('delivered', f'{sent}/{args.messages}'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Plain SQLite vs the tuned ``core.sqlite_backend`` profile under concurrency.
+
+Each engine runs in its own subprocess on a fresh database file. Concurrent
+clients drive the OTP login flow (``/api/auth/register/`` then
+``/api/auth/verify/``, with the database OTP store so OTP state is written to
+SQLite) and ``/api/payment/subscription/purchase/``. The report shows req/sec
+and the number of requests that failed with ``database is locked``::
+
+    python -m benchmarks.sqlite_tuning --users 200 --threads 16
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import Timer, disable_throttling, report, setup_django
+
+ENGINES = (
+    ('plain', 'django.db.backends.sqlite3'),
+    ('tuned', 'core.sqlite_backend'),
+)
+
+
+def run_engine(engine, users, threads):
+    # no throttling and no real SMS; OTP state goes to the database
+    disable_throttling()
+    os.environ['SMS_PROVIDER'] = 'account.sms.FakeSMSProvider'
+    os.environ['OTP_STORE_BACKEND'] = 'account.otp_store.DatabaseOTPStore'
+    os.environ['DB_ENGINE'] = engine
+    setup_django()
+
+    from django.db import connection
+    from django.test import Client
+    from account.otp_store import get_otp_store
+    from payment.models import SubscriptionPlan
+
+    plan = SubscriptionPlan.objects.create(name='bench', duration_days=30, price=50000)
+    phones = ['0912%07d' % i for i in range(users)]
+    local = threading.local()
+    results = {}
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = Client(raise_request_exception=False)
+        return local.client
+
+    def call(method):
+        def wrapped(item):
+            try:
+                return method(item)
+            finally:
+                connection.close()
+        return wrapped
+
+    def login(phone):
+        codes = [client().post('/api/auth/register/', {'phone_number': phone}).status_code]
+        code = get_otp_store().get_code(phone)
+        response = client().post('/api/auth/verify/', {'phone_number': phone, 'code': str(code)})
+        codes.append(response.status_code)
+        return codes, response.json().get('access') if response.status_code == 200 else None
+
+    def purchase(token):
+        if token is None:
+            return [0]
+        return [client().post(
+            '/api/payment/subscription/purchase/', {'plan_id': plan.id},
+            HTTP_AUTHORIZATION=f'Bearer {token}'
+        ).status_code]
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        with Timer() as timer:
+            logins = list(pool.map(call(login), phones))
+        results['otp'] = (2 * users, timer.elapsed, [c for codes, _ in logins for c in codes])
+
+        tokens = [token for _, token in logins] * 2  # each user buys twice (new + extension)
+        with Timer() as timer:
+            purchases = list(pool.map(call(purchase), tokens))
+        results['purchase'] = (len(tokens), timer.elapsed, [c for codes in purchases for c in codes])
+
+    print(json.dumps({
+        name: {
+            'rps': count / elapsed,
+            'errors': sum(code != 200 and code != 201 for code in codes),
+        }
+        for name, (count, elapsed, codes) in results.items()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--engine', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        run_engine(args.engine, args.users, args.threads)
+        return
+
+    rows = []
+    for label, engine in ENGINES:
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sqlite_tuning', '--engine', engine,
+             '--users', str(args.users), '--threads', str(args.threads)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        for name in ('otp', 'purchase'):
+            rows.append((f'{name} req/sec ({label})', f"{result[name]['rps']:,.1f}"))
+            rows.append((f'{name} failed requests ({label})', str(result[name]['errors'])))
+
+    report(f'{args.users} users, {args.threads} concurrent clients', rows)
+
+
+if __name__ == '__main__':
+    main()
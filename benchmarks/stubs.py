@@ -0,0 +1,81 @@
+"""
+Local stand-ins for BitPay and Kavenegar.
+
+``GatewayStub`` is a threaded HTTP/1.1 (keep-alive) server answering the
+BitPay ``gateway-send``/``gateway-result-second`` calls and the Kavenegar
+``verify/lookup`` call after an artificial latency, so benchmarks measure
+our side of the round trip without touching the real providers.
+"""
+
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        stub.hits += 1
+
+        if self.path.endswith('/gateway-send'):
+            body = {'status': 1, 'id_get': f'stub{next(stub.ids)}'}
+        elif self.path.endswith('/gateway-result-second'):
+            body = {'status': stub.verify_status, 'factorId': 'stub-factor'}
+        elif self.path.endswith('/verify/lookup.json'):
+            body = {'return': {'status': 200, 'message': 'تایید شد'}, 'entries': [{}]}
+        else:
+            self.send_error(404)
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class GatewayStub:
+    def __init__(self, latency=0.05, verify_status=1):
+        self.latency = latency
+        self.verify_status = verify_status
+        self.hits = 0
+        self.ids = itertools.count(1)
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.stub = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def configure(self, settings):
+        """Point the BitPay and Kavenegar settings at this stub."""
+        settings.BITPAY_BASE_URL = f'{self.url}/payment'
+        settings.KAVENEGAR_API_URL = f'{self.url}/v1'
@@ -0,0 +1,83 @@
+"""
+Concurrent subscription purchases: throughput and lost extensions.
+
+Several threads buy the same plan at once, either all for one user (worst-case
+row contention) or spread across ``--users`` users. After the run every user's
+``end_date`` must equal ``start + purchases * duration``; any shortfall is a
+lost extension::
+
+    python -m benchmarks.subscription_contention --threads 8 --purchases 50 --users 1
+"""
+
+import argparse
+import threading
+from datetime import timedelta
+
+from benchmarks.common import Timer, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--purchases', type=int, default=50, help='purchases per thread')
+    parser.add_argument('--users', type=int, default=1)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import OperationalError, connection
+    from django.utils import timezone
+
+    from account.models import CustomUser
+    from payment.models import Subscription, SubscriptionPlan, SubscriptionTransaction
+    from payment.subscriptions import extend_subscription
+
+    plan = SubscriptionPlan.objects.create(name='bench', duration_days=30, price=50000)
+    users = [
+        CustomUser.objects.create_user(phone_number='0912%07d' % i, password='bench')
+        for i in range(args.users)
+    ]
+    start = timezone.now()
+    for user in users:
+        # an already-active subscription, so every purchase goes through the UPDATE path
+        Subscription.objects.create(user=user, plan=plan, start_date=start, end_date=start + timedelta(days=1))
+
+    errors = []
+
+    def worker(index):
+        try:
+            for i in range(args.purchases):
+                user = users[(index + i) % len(users)]
+                try:
+                    extend_subscription(user, plan)
+                except OperationalError as e:
+                    errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    with Timer() as elapsed:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    attempted = args.threads * args.purchases
+    succeeded = SubscriptionTransaction.objects.filter(status='SUCCESS').count()
+    lost = 0
+    for user in users:
+        bought = SubscriptionTransaction.objects.filter(user=user).count()
+        expected = start + timedelta(days=1) + bought * timedelta(days=plan.duration_days)
+        end_date = Subscription.objects.filter(user=user).order_by('-end_date').values_list('end_date', flat=True)[0]
+        lost += round((expected - end_date) / timedelta(days=plan.duration_days))
+
+    report(f'{args.threads} threads x {args.purchases} purchases over {args.users} user(s) ({connection.vendor})', [
+        ('purchases/sec', f'{succeeded / elapsed.elapsed:,.1f}'),
+        ('succeeded', f'{succeeded}/{attempted}'),
+        ('lock errors', str(len(errors))),
+        ('lost extensions', str(lost)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
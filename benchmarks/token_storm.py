@@ -0,0 +1,78 @@
+"""
+Login storm: OTP verification followed by a refresh for every user.
+
+Seeds ``--users`` registered users, logs all of them in through
+``/api/auth/verify/`` with ``--concurrency`` client threads, then has every
+user rotate its refresh token through ``/api/auth/token/refresh/``. Finally the
+outstanding-token store is pruned as if every token had expired::
+
+    python -m benchmarks.token_storm --users 1000 --concurrency 32
+"""
+
+import argparse
+import json
+import os
+
+from benchmarks.api_suite import drive
+from benchmarks.common import Timer, disable_throttling, report, setup_django
+from benchmarks.stubs import GatewayStub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--batch-size', type=int, default=1000, help='prune batch size')
+    args = parser.parse_args()
+
+    # the storm is the point; keep the rate limits out of it
+    disable_throttling()
+    os.environ['SMS_PROVIDER'] = 'account.sms.KavenegarHTTPSMSProvider'
+    setup_django()
+
+    from datetime import timedelta
+    from django.conf import settings
+    from django.utils import timezone
+    from account.models import CustomUser, IssuedRefreshToken
+    from account.otp_store import get_otp_store
+    from account.tokens import prune_refresh_tokens
+
+    phones = ['0915%07d' % i for i in range(args.users)]
+    CustomUser.objects.bulk_create([CustomUser(phone_number=p, is_active=False) for p in phones])
+    store = get_otp_store()
+
+    # first logins send an SMS; answer it locally
+    refresh = {}
+
+    def login(client, phone):
+        # issued right before use: a locmem OTP cache only keeps MAX_ENTRIES codes
+        store.issue(phone, 123456)
+        response = client.post('/api/auth/verify/', {'phone_number': phone, 'code': '123456'})
+        if response.status_code == 200:
+            refresh[phone] = json.loads(response.content)['refresh']
+        return response
+
+    with GatewayStub(latency=0) as stub:
+        stub.configure(settings)
+        results = {'verify-otp': drive(args.concurrency, [lambda c, p=p: login(c, p) for p in phones])}
+        results['token-refresh'] = drive(args.concurrency, [
+            lambda c, t=t: c.post('/api/auth/token/refresh/', {'refresh': t}, content_type='application/json')
+            for t in refresh.values()
+        ])
+
+    rows = IssuedRefreshToken.objects.count()
+    with Timer() as timer:
+        pruned = prune_refresh_tokens(batch_size=args.batch_size, now=timezone.now() + timedelta(days=365))
+
+    report(f'{args.users} users, {args.concurrency} concurrent clients', [
+        (name, f"{r['rps']:8,.1f} req/s  p50 {r['p50_ms']:7.1f}  p95 {r['p95_ms']:7.1f}  "
+               f"p99 {r['p99_ms']:7.1f} ms  queries {r['queries_per_request'] or 0:5.1f}  errors {r['errors']}")
+        for name, r in results.items()
+    ] + [
+        ('prune', f'{pruned:,} of {rows:,} rows in {timer.elapsed * 1000:.1f} ms '
+                  f'({pruned / timer.elapsed:,.0f} rows/s)'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Bulk user import against one ``create_user`` call per row.
+
+Writes a CSV of ``--rows`` patients (with 1% invalid and 1% repeated numbers)
+and imports it with ``account.imports``. The baseline creates ``--baseline``
+users one by one, the way onboarding used to work::
+
+    python -m benchmarks.user_import --rows 100000
+"""
+
+import argparse
+import csv
+import os
+import tempfile
+
+from benchmarks.common import Timer, report, setup_django
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['phone_number', 'first_name', 'last_name', 'email'])
+        for i in range(rows):
+            if i % 100 == 1:
+                phone = 'not-a-phone'
+            elif i % 100 == 2:
+                phone = '0916%07d' % (i - 2)  # repeats an earlier row
+            else:
+                # mixed spellings, as clinics send them
+                phone = ('+98916%07d' if i % 3 else '0916 %07d') % i
+            writer.writerow([phone, 'نام', 'بیمار', f'patient{i}@example.com' if i % 2 else ''])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--baseline', type=int, default=2000, help='users created one by one')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from account.imports import CSV, import_users, read_rows
+    from account.models import CustomUser
+
+    path = os.path.join(tempfile.mkdtemp(prefix='helssa-import-'), 'patients.csv')
+    write_csv(path, args.rows)
+
+    with Timer() as baseline:
+        for i in range(args.baseline):
+            CustomUser.objects.create_user(phone_number='0917%07d' % i)
+
+    with open(path, encoding='utf-8', newline='') as f, Timer() as timer:
+        stats = import_users(read_rows(f, CSV), batch_size=args.batch_size)
+
+    per_row = baseline.elapsed / args.baseline
+    report(f'{args.rows:,} rows, batches of {args.batch_size}', [
+        ('create_user', f'{args.baseline / baseline.elapsed:10,.0f} rows/s  '
+                        f'(~{per_row * args.rows:.1f} s for {args.rows:,})'),
+        ('import_users', f'{stats.read / timer.elapsed:10,.0f} rows/s  {timer.elapsed:.1f} s  '
+                         f'created {stats.created:,}  rejected {dict(stats.rejected)}'),
+        ('speedup', f'{per_row * stats.read / timer.elapsed:.1f}x'),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
+
+
+class CoreConfig(AppConfig):
+    name = 'core'
+
+    def ready(self):
+        from .throttling import check_throttle_backend
+        checks.register(check_throttle_backend, checks.Tags.security, deploy=True)
+
+        # Serializer timing patches DRF once, at startup, and only when the
+        # instrumentation middleware is in use
+        if 'core.instrumentation.InstrumentationMiddleware' in settings.MIDDLEWARE:
+            from .instrumentation import install
+            install()
@@ -0,0 +1,110 @@
+"""
+Minimal async counterpart of DRF's ``APIView`` for ASGI deployments.
+
+DRF views are synchronous, so every gateway/SMS call holds a worker thread.
+``AsyncAPIView`` keeps the same request/response contract (JSON bodies,
+simplejwt bearer tokens, scoped throttling, DRF serializers for validation)
+while letting handlers ``await`` the async ORM and async HTTP clients.
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from account.authentication import check_token_version
+from core.renderers import dumps, loads
+from core.throttling import TokenBucketThrottle
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class AsyncAPIView(View):
+    authentication_required = False
+    throttle_scope = None
+    throttle_keys = ('ip',)
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authenticated API, same as DRF's APIView
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        method = request.method.lower()
+        handler = getattr(self, method, None) if method in self.http_method_names else None
+        if handler is None:
+            return HttpResponseNotAllowed(self._allowed_methods())
+
+        try:
+            request.data = self.parse_body(request)
+        except ValueError:
+            return json_response({'detail': 'JSON parse error'}, status.HTTP_400_BAD_REQUEST)
+
+        request.user = AnonymousUser()
+        try:
+            user = await self.authenticate(request)
+        except (InvalidToken, TokenError):
+            return json_response(
+                {'detail': 'Given token not valid for any token type'}, status.HTTP_401_UNAUTHORIZED
+            )
+        except AuthenticationFailed as exc:
+            return json_response({'detail': exc.detail}, status.HTTP_401_UNAUTHORIZED)
+        if user is not None:
+            request.user = user
+        elif self.authentication_required:
+            return json_response(
+                {'detail': 'Authentication credentials were not provided.'}, status.HTTP_401_UNAUTHORIZED
+            )
+
+        if self.throttle_scope:
+            wait = await self.check_throttle(request)
+            if wait is not None:
+                return json_response(
+                    {'detail': f'Request was throttled. Expected available in {int(wait)} seconds.'},
+                    status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+
+        return await handler(request, *args, **kwargs)
+
+    @staticmethod
+    def parse_body(request):
+        if request.method in ('GET', 'HEAD', 'DELETE') or not request.body:
+            return {}
+        if request.content_type == 'application/json':
+            return loads(request.body)
+        return request.POST.dict()
+
+    async def authenticate(self, request):
+        auth = JWTAuthentication()
+        header = auth.get_header(request)
+        if header is None:
+            return None
+        raw_token = auth.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = auth.get_validated_token(raw_token)
+        try:
+            user_id = token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user = await get_user_model().objects.filter(
+            **{jwt_settings.USER_ID_FIELD: user_id}, is_active=True
+        ).afirst()
+        if user is not None:
+            check_token_version(token, user.token_version)
+        return user
+
+    async def check_throttle(self, request):
+        """Return seconds to wait when throttled, otherwise ``None``."""
+        throttle = TokenBucketThrottle()
+        allowed = await sync_to_async(throttle.allow_request)(request, self)
+        if allowed:
+            return None
+        return throttle.wait() or 0
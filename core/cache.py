@@ -0,0 +1,270 @@
+"""
+Two-tier cache: an in-process L1 in front of the shared L2.
+
+``TieredCache`` is a Django cache backend (the ``default`` alias). Every call
+goes to the L2 cache named by the ``L2`` option, which is Redis when
+``CACHE_REDIS_URL`` is set and LocMem otherwise. Keys that start with one of
+the ``LOCAL_KEYS`` prefixes are also kept in a bounded in-process LRU for at
+most ``LOCAL_TIMEOUT`` seconds. Values are pickled there, as in LocMem, so
+callers cannot mutate a shared object.
+
+Deletes reach the L1 of the current process only. Other workers can serve the
+old value until their copy expires, so only data that may be a few seconds
+stale belongs in ``LOCAL_KEYS``, such as the plan catalogue version and admin
+table bounds. Mutable shared state never goes there: auth state, entitlements,
+OTP codes and throttle buckets.
+
+``namespace('payment')`` returns a ``CacheNamespace``. It has the same
+get/set API, prefixes every key with the app name and stamps it with
+``CACHE_NAMESPACE_VERSIONS[name]``. Bumping the version on deploy orphans
+every entry whose shape changed. ``CacheNamespace.get_or_compute`` adds
+stampede protection. A value is recomputed by one caller, slightly before it
+expires, while the others keep serving the cached copy (probabilistic early
+expiration, "XFetch").
+
+Hits and misses per tier are exported as ``cache_requests_total`` on
+``/metrics``.
+"""
+import math
+import pickle
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metrics import registry
+
+CACHE_REQUESTS = registry.counter(
+    'cache_requests', 'Cache lookups by tier and result.', ('cache', 'tier', 'result'),
+)
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        # LOCATION only labels the metrics
+        self.name = location or 'default'
+        self.l2_alias = options.get('L2', 'shared')
+        self.local_max_entries = options.get('LOCAL_MAX_ENTRIES', 10_000)
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.local_keys = tuple(options.get('LOCAL_KEYS', ()))
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def _timeout(self, timeout):
+        # Both tiers expire on the same clock
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _is_local(self, key):
+        return key.startswith(self.local_keys)
+
+    def _count(self, tier, result, amount=1):
+        CACHE_REQUESTS.inc(self.name, tier, result, amount=amount)
+
+    # L1
+
+    def _local_get(self, full_key):
+        with self._lock:
+            entry = self._local.get(full_key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.time():
+                del self._local[full_key]
+                return _MISSING
+            self._local.move_to_end(full_key)
+        return pickle.loads(pickled)
+
+    def _local_set(self, full_key, value, timeout):
+        expires_at = time.time() + self.local_timeout
+        if timeout is not None:
+            expires_at = min(expires_at, time.time() + (timeout if timeout > 0 else -1))
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        with self._lock:
+            self._local[full_key] = (expires_at, pickled)
+            self._local.move_to_end(full_key)
+            while len(self._local) > self.local_max_entries:
+                self._local.popitem(last=False)
+
+    def _local_delete(self, full_key):
+        with self._lock:
+            self._local.pop(full_key, None)
+
+    # Django cache API; the L2 applies its own KEY_PREFIX and VERSION
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version) if self._is_local(key) else None
+        if local_key:
+            value = self._local_get(local_key)
+            self._count('l1', 'miss' if value is _MISSING else 'hit')
+            if value is not _MISSING:
+                return value
+
+        value = self.l2.get(key, _MISSING, version=version)
+        self._count('l2', 'miss' if value is _MISSING else 'hit')
+        if value is _MISSING:
+            return default
+        if local_key:
+            self._local_set(local_key, value, self.local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        self.l2.set(key, value, timeout, version=version)
+        if self._is_local(key):
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        added = self.l2.add(key, value, timeout, version=version)
+        if added and self._is_local(key):
+            self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, self._timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def get_many(self, keys, version=None):
+        found, remote = {}, []
+        for key in keys:
+            if self._is_local(key):
+                value = self._local_get(self.make_and_validate_key(key, version=version))
+                self._count('l1', 'miss' if value is _MISSING else 'hit')
+                if value is not _MISSING:
+                    found[key] = value
+                    continue
+            remote.append(key)
+
+        if remote:
+            values = self.l2.get_many(remote, version=version)
+            self._count('l2', 'hit', len(values))
+            self._count('l2', 'miss', len(remote) - len(values))
+            for key, value in values.items():
+                if self._is_local(key):
+                    self._local_set(self.make_and_validate_key(key, version=version), value, self.local_timeout)
+            found.update(values)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self._timeout(timeout)
+        for key, value in data.items():
+            if self._is_local(key):
+                self._local_set(self.make_and_validate_key(key, version=version), value, timeout)
+        return self.l2.set_many(data, timeout, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._local_delete(self.make_and_validate_key(key, version=version))
+        self.l2.delete_many(keys, version=version)
+
+    def clear(self):
+        self.clear_local()
+        self.l2.clear()
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+class CacheNamespace:
+    """Versioned key namespace of one app on top of a cache alias."""
+
+    def __init__(self, name, alias='default'):
+        self.name = name
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def version(self):
+        return getattr(settings, 'CACHE_NAMESPACE_VERSIONS', {}).get(self.name, 1)
+
+    def key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key, default=None):
+        return self.cache.get(self.key(key), default, version=self.version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        self.cache.set(self.key(key), value, timeout, version=self.version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT):
+        return self.cache.add(self.key(key), value, timeout, version=self.version)
+
+    def delete(self, key):
+        return self.cache.delete(self.key(key), version=self.version)
+
+    def get_many(self, keys):
+        found = self.cache.get_many([self.key(key) for key in keys], version=self.version)
+        prefix = len(self.name) + 1
+        return {key[prefix:]: value for key, value in found.items()}
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT):
+        self.cache.set_many({self.key(k): v for k, v in data.items()}, timeout, version=self.version)
+
+    def delete_many(self, keys):
+        self.cache.delete_many([self.key(key) for key in keys], version=self.version)
+
+    def get_or_compute(self, key, compute, timeout, beta=1.0):
+        """
+        Cached ``compute()`` for ``key``, recomputed by a single caller shortly before it expires.
+
+        The entry stores how long ``compute`` took. A reader recomputes early
+        with a probability that grows as expiry approaches and with the cost
+        of ``compute`` (higher ``beta`` means earlier). Only the caller that
+        takes the short recompute lock does so; the others return the current
+        value. On a cold miss every caller computes, since there is nothing to
+        serve yet.
+        """
+        entry = self.get(key)
+        now = time.time()
+        if entry is not None:
+            value, delta, expires_at = entry
+            if now - delta * beta * math.log(1.0 - random.random()) < expires_at:
+                return value
+            if not self.add(f'{key}:lock', 1, max(1, math.ceil(delta * 2))):
+                return value
+
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        self.set(key, (value, delta, start + timeout), timeout)
+        if entry is not None:
+            self.delete(f'{key}:lock')
+        return value
+
+
+@lru_cache(maxsize=None)
+def namespace(name, alias='default'):
+    return CacheNamespace(name, alias)
@@ -0,0 +1,96 @@
+"""
+Primary/replica routing.
+
+Writes, migrations and ordinary reads always use ``default`` (the primary).
+Views that opt in with ``ReplicaReadMixin`` run their safe (GET/HEAD) requests
+against the ``replica`` alias when one is configured.
+
+Read-your-writes: after a user writes something that a replica-routed view
+shows back (a purchase, a verified payment, a profile edit), the write path
+calls ``pin_to_primary(user_id)`` and that user's reads stay on the primary
+for ``DB_REPLICA_STICKY_SECONDS``, longer than the expected replication lag.
+"""
+import contextvars
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Model
+from rest_framework.permissions import SAFE_METHODS
+
+from .cache import namespace
+
+cache = namespace('core')
+
+REPLICA_ALIAS = 'replica'
+
+_read_alias = contextvars.ContextVar('db_read_alias', default=None)
+
+
+def replica_alias():
+    """The replica alias, or None when no replica is configured."""
+    return REPLICA_ALIAS if REPLICA_ALIAS in settings.DATABASES else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # None falls back to the instance hint or ``default``
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def _pin_key(user_id):
+    return f'db:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Keep ``user_id``'s reads on the primary until the replica has caught up."""
+    if user_id is not None and replica_alias():
+        cache.set(_pin_key(user_id), 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return user_id is not None and cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests of a DRF view from the replica.
+
+    Authentication already runs against the replica; if the user turns out to
+    be pinned, routing is reset and ``request.user`` is reloaded from the
+    primary before the handler runs.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        alias = replica_alias() if request.method in SAFE_METHODS else None
+        self._read_alias_token = _read_alias.set(alias) if alias else None
+        super().initial(request, *args, **kwargs)
+
+        if self._read_alias_token is not None and is_pinned(request.user.pk):
+            self._reset_read_alias()
+            # A claims-based user (account.authentication) has not loaded its row
+            # yet and will do so from the primary now that routing is reset
+            if request.user.is_authenticated and isinstance(request.user, Model):
+                request.user = type(request.user)._default_manager.using(DEFAULT_DB_ALIAS).get(
+                    pk=request.user.pk
+                )
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self._reset_read_alias()
+
+    def _reset_read_alias(self):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
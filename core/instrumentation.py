@@ -0,0 +1,202 @@
+"""
+Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` opens a ``RequestProfile`` in a context variable
+for every request. Collectors add to whichever profile is current:
+
+* ORM: an execute wrapper installed on every database connection counts
+  queries and their time.
+* Outbound HTTP: gateway clients wrap their calls in ``track_external('bitpay')``
+  or ``track_external('kavenegar')``.
+* Serialization: time spent in DRF ``serializer.data`` and in compiled
+  serializers (nested serializers are counted once, as part of the outermost
+  one).
+
+Context variables follow ``sync_to_async``, so async views and the async
+ORM are covered as well. The numbers feed the per-route histograms served at
+``/metrics`` (``core/metrics.py``). With ``SERVER_TIMING`` (``DEBUG`` by
+default) each response also gets a ``Server-Timing`` header.
+
+The ORM and serializer hooks are installed once by ``CoreConfig.ready``.
+"""
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.serializers import BaseSerializer
+
+from .metrics import registry
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Wall time of HTTP requests.', ('method', 'route', 'status'),
+)
+REQUEST_DB_DURATION = registry.histogram(
+    'http_request_db_duration_seconds', 'Time spent in ORM queries per request.', ('route',),
+)
+REQUEST_DB_QUERIES = registry.histogram(
+    'http_request_db_queries', 'ORM queries per request.', ('route',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+REQUEST_SERIALIZE_DURATION = registry.histogram(
+    'http_request_serialize_duration_seconds', 'Time spent in DRF serializers per request.', ('route',),
+)
+REQUEST_EXTERNAL_DURATION = registry.histogram(
+    'http_request_external_duration_seconds', 'Time spent in outbound HTTP calls per request.', ('route', 'service'),
+)
+EXTERNAL_DURATION = registry.histogram(
+    'external_call_duration_seconds', 'Outbound HTTP calls, inside or outside requests.', ('service', 'outcome'),
+)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.external = defaultdict(float)
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"']
+        for service, seconds in sorted(self.external.items()):
+            entries.append(f'{service};dur={seconds * 1000:.1f}')
+        entries.append(f'serialize;dur={self.serialize_time * 1000:.1f}')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def current_profile():
+    return _current.get()
+
+
+@contextmanager
+def track_external(service):
+    """Time an outbound HTTP call to ``service`` (e.g. ``bitpay``)."""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        elapsed = time.perf_counter() - start
+        EXTERNAL_DURATION.observe(elapsed, service, outcome)
+        profile = _current.get()
+        if profile is not None:
+            profile.external[service] += elapsed
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.db_time += time.perf_counter() - start
+        profile.db_queries += 1
+
+
+def _install_db_wrapper(connection):
+    if _db_wrapper not in connection.execute_wrappers:
+        # first (outermost) and not last: ``connection.execute_wrapper()``
+        # blocks pop the last wrapper when they exit
+        connection.execute_wrappers.insert(0, _db_wrapper)
+
+
+@receiver(connection_created)
+def _instrument_connection(sender, connection, **kwargs):
+    _install_db_wrapper(connection)
+
+
+_serializer_data = BaseSerializer.data
+
+
+@contextmanager
+def track_serialize():
+    """Count the enclosed block as serialization time (outermost block only)."""
+    profile = _current.get()
+    if profile is None or profile.serializing:
+        yield
+        return
+    profile.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.serialize_time += time.perf_counter() - start
+        profile.serializing = False
+
+
+def _timed_data(self):
+    with track_serialize():
+        return _serializer_data.fget(self)
+
+
+def install():
+    """Hook ORM and serializer timing (idempotent)."""
+    # connections opened before this module was imported
+    for connection in connections.all(initialized_only=True):
+        _install_db_wrapper(connection)
+    if BaseSerializer.data is _serializer_data:
+        BaseSerializer.data = property(_timed_data)
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile)
+
+    def _finish(self, request, response, profile):
+        total = profile.elapsed
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match is not None else 'unmatched'
+
+        REQUEST_DURATION.observe(total, request.method, route, str(response.status_code))
+        REQUEST_DB_DURATION.observe(profile.db_time, route)
+        REQUEST_DB_QUERIES.observe(profile.db_queries, route)
+        REQUEST_SERIALIZE_DURATION.observe(profile.serialize_time, route)
+        for service, seconds in profile.external.items():
+            REQUEST_EXTERNAL_DURATION.observe(seconds, route, service)
+
+        if getattr(settings, 'SERVER_TIMING', settings.DEBUG):
+            response['Server-Timing'] = profile.server_timing(total)
+        return response
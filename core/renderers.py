@@ -0,0 +1,79 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+Drop-in replacements for DRF's ``JSONRenderer`` / ``JSONParser``: same media
+type, same ``format`` and the same compact UTF-8 output (including DRF's
+escaping of U+2028/U+2029, which orjson leaves raw). orjson encodes
+``datetime``, ``date``, ``UUID`` and dict/list subclasses (``ReturnDict``,
+``OrderedDict``) natively; anything it does not know (``Decimal``, lazy
+translation strings, querysets) goes through DRF's own encoder. Without orjson,
+or when the caller asks for an indent orjson cannot produce (the browsable
+API uses 4), rendering falls back to the stdlib path unchanged.
+"""
+import json
+
+from django.conf import settings
+from rest_framework import renderers, parsers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+else:
+    DUMPS_OPTIONS = 0
+
+
+def _orjson_dumps(data):
+    ret = orjson.dumps(data, default=_encoder.default, option=DUMPS_OPTIONS)
+    # Same as DRF: these are valid JSON but break JavaScript string literals
+    if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+        ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return ret
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes, orjson when available."""
+    if orjson is None:
+        return renderers.JSONRenderer().render(data)
+    return _orjson_dumps(data)
+
+
+def loads(body):
+    """Parse JSON ``bytes``/``str``; raises ``ValueError`` on invalid input."""
+    if orjson is None:
+        return json.loads(body)
+    return orjson.loads(body)
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return _orjson_dumps(data)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits; the stdlib encoder handles them
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastJSONParser(parsers.JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % exc)
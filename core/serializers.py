@@ -0,0 +1,185 @@
+"""
+Compiled read-only serializers.
+
+A DRF ``Serializer`` rebuilds (deep-copies) its fields on every instantiation
+and dispatches ``get_attribute`` / ``to_representation`` per field per object.
+For read paths that only ever produce output, ``CompiledSerializer`` inspects a
+serializer class once and generates a flat Python function that reads each
+source attribute (or ``.values()`` key) directly and converts it inline. The
+output is the same dict DRF would produce, so rendered bodies are identical.
+
+Supported: model fields, nested serializers over a foreign key and
+``SerializerMethodField`` (the method is called on a serializer instance
+carrying ``context``). Anything else raises ``ImproperlyConfigured`` at
+compile time rather than silently diverging from the DRF output.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from core.instrumentation import track_serialize
+
+# ``to_representation`` implementations that are a plain builtin call for
+# values coming from the database
+INLINE_CONVERTERS = {
+    serializers.IntegerField.to_representation: 'int',
+    serializers.CharField.to_representation: 'str',
+    serializers.BooleanField.to_representation: 'bool',
+}
+
+
+def iso_datetime(value, tz, fallback):
+    """``DateTimeField.to_representation`` for aware values, with the timezone resolved once per call."""
+    if tz is None or isinstance(value, str) or value.tzinfo is None:
+        return fallback(value)
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _is_plain_datetime(field):
+    return (
+        type(field).to_representation is serializers.DateTimeField.to_representation
+        and not hasattr(field, 'timezone')
+        and getattr(field, 'format', api_settings.DATETIME_FORMAT) == ISO_8601
+    )
+
+
+class Row:
+    """Attribute access over a ``.values()`` dict, for method fields."""
+    __slots__ = ('_row', '_prefix')
+
+    def __init__(self, row, prefix=''):
+        self._row = row
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        try:
+            return self._row[self._prefix + name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class CompiledSerializer:
+    """
+    Generated read-only counterpart of ``serializer_class``::
+
+        subscription_reader = CompiledSerializer(SubscriptionSerializer)
+        subscription_reader.serialize(subscription, context={'now': now})
+        subscription_reader.serialize_rows(subscription_reader.values(queryset))
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._owners = []
+        self._namespace = {'Row': Row, 'iso_datetime': iso_datetime}
+        self._counter = 0
+        values_fields = []
+        self._from_object = self._namespace[self._build(serializer_class, 'obj', '', None)]
+        self._from_row = self._namespace[self._build(serializer_class, 'row', '', values_fields)]
+        self.values_fields = tuple(values_fields)
+
+    def __repr__(self):
+        return f'<CompiledSerializer {self.serializer_class.__name__}>'
+
+    def _name(self, prefix):
+        self._counter += 1
+        return f'{prefix}{self._counter}'
+
+    def _build(self, serializer_class, mode, prefix, values_fields):
+        """Generate the conversion function for one nesting level, return its name."""
+        name = self._name(f'_{mode}_{serializer_class.__name__}_')
+        subject = 'obj' if mode == 'obj' else 'row'
+        lines = [f'def {name}({subject}, S, T):', '    ret = {}']
+        owner = None
+
+        for field_name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            key = repr(field_name)
+
+            if isinstance(field, serializers.SerializerMethodField):
+                if owner is None:
+                    if serializer_class not in self._owners:
+                        self._owners.append(serializer_class)
+                    owner = self._owners.index(serializer_class)
+                    if mode == 'row':
+                        lines.append(f'    wrapped = Row(row, {prefix!r})')
+                arg = 'obj' if mode == 'obj' else 'wrapped'
+                lines.append(f'    ret[{key}] = S[{owner}].{field.method_name}({arg})')
+                continue
+
+            if len(field.source_attrs) != 1 or not field.source.isidentifier():
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{field_name}: only direct sources can be compiled'
+                )
+            source = field.source
+            lookup = prefix + source
+
+            if isinstance(field, serializers.ListSerializer) or isinstance(
+                field, (serializers.RelatedField, serializers.ManyRelatedField)
+            ):
+                raise ImproperlyConfigured(
+                    f'{serializer_class.__name__}.{field_name}: {type(field).__name__} cannot be compiled'
+                )
+
+            if isinstance(field, serializers.BaseSerializer):
+                if mode == 'row':
+                    values_fields.append(lookup)
+                nested = self._build(type(field), mode, lookup + '__', values_fields)
+                if mode == 'obj':
+                    lines.append(f'    v = obj.{source}')
+                    lines.append(f'    ret[{key}] = None if v is None else {nested}(v, S, T)')
+                else:
+                    lines.append(f'    ret[{key}] = None if row[{lookup!r}] is None else {nested}(row, S, T)')
+                continue
+
+            if mode == 'obj':
+                lines.append(f'    v = obj.{source}')
+            else:
+                values_fields.append(lookup)
+                lines.append(f'    v = row[{lookup!r}]')
+            converter = INLINE_CONVERTERS.get(type(field).to_representation)
+            if converter is not None:
+                lines.append(f'    ret[{key}] = None if v is None else {converter}(v)')
+                continue
+            fallback = self._name('_c')
+            self._namespace[fallback] = field.to_representation
+            if _is_plain_datetime(field):
+                lines.append(f'    ret[{key}] = None if not v else iso_datetime(v, T, {fallback})')
+            else:
+                lines.append(f'    ret[{key}] = None if v is None else {fallback}(v)')
+
+        lines.append('    return ret')
+        exec('\n'.join(lines), self._namespace)
+        return name
+
+    def _state(self, context):
+        """Method-field serializer instances and timezone, resolved once per call."""
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        return [owner(context=context or {}) for owner in self._owners], tz
+
+    def values(self, queryset):
+        """``queryset.values()`` restricted to the keys the row functions read."""
+        return queryset.values(*self.values_fields)
+
+    def serialize(self, instance, context=None):
+        with track_serialize():
+            return self._from_object(instance, *self._state(context))
+
+    def serialize_many(self, instances, context=None):
+        with track_serialize():
+            convert, (owners, tz) = self._from_object, self._state(context)
+            return [convert(instance, owners, tz) for instance in instances]
+
+    def serialize_row(self, row, context=None):
+        with track_serialize():
+            return self._from_row(row, *self._state(context))
+
+    def serialize_rows(self, rows, context=None):
+        with track_serialize():
+            convert, (owners, tz) = self._from_row, self._state(context)
+            return [convert(row, owners, tz) for row in rows]
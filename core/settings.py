@@ -24,12 +24,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'core',
     'account',
     'payment',
     'telemedicine',
 ]
 
 MIDDLEWARE = [
+    'core.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,11 +61,96 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'core.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database (tuned SQLite by default; set DB_ENGINE=django.db.backends.postgresql for production)
+DB_ENGINE = config('DB_ENGINE', default='core.sqlite_backend')
+
+if DB_ENGINE == 'core.sqlite_backend':
+    # WAL + BEGIN IMMEDIATE profile for single-node deployments (see core/sqlite_backend/base.py)
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': config('DB_NAME', default=BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'busy_timeout': config('DB_SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+                'mmap_size': config('DB_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+                'cache_size': config('DB_SQLITE_CACHE_SIZE', default=-64000, cast=int),
+            },
+        }
+    }
+elif DB_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': config('DB_NAME', default=BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': DB_ENGINE,
+            'NAME': config('DB_NAME'),
+            'USER': config('DB_USER', default=''),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Persistent connections (to the server or to the pooler)
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer in transaction pooling mode cannot keep server-side cursors open
+            'DISABLE_SERVER_SIDE_CURSORS': config('DB_POOLER', default='') == 'pgbouncer',
+            'OPTIONS': {
+                'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int),
+            },
+        }
+    }
+
+# Optional read replica (see core/db_router.py); a second SQLite file works locally
+DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+DB_REPLICA_NAME = config('DB_REPLICA_NAME', default='')
+DB_REPLICA_STICKY_SECONDS = config('DB_REPLICA_STICKY_SECONDS', default=10, cast=int)
+
+if DB_REPLICA_HOST or DB_REPLICA_NAME:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DB_REPLICA_NAME or DATABASES['default']['NAME'],
+        'TEST': {'MIRROR': 'default'},
     }
+    if DB_REPLICA_HOST:
+        DATABASES['replica']['HOST'] = DB_REPLICA_HOST
+        DATABASES['replica']['PORT'] = config('DB_REPLICA_PORT', default=DATABASES['default'].get('PORT', ''))
+
+DATABASE_ROUTERS = ['core.db_router.PrimaryReplicaRouter']
+
+# Caches (see core/cache.py): in-process L1 for LOCAL_KEYS in front of the shared
+# L2 - Redis when CACHE_REDIS_URL is set (pip install redis), LocMem otherwise
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'LOCAL_MAX_ENTRIES': config('CACHE_LOCAL_MAX_ENTRIES', default=10000, cast=int),
+            'LOCAL_TIMEOUT': config('CACHE_LOCAL_TIMEOUT', default=5, cast=int),
+            # only data that may be LOCAL_TIMEOUT seconds stale on other workers
+            'LOCAL_KEYS': ('payment:plans:', 'core:admin:'),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int)},
+    },
+}
+
+# Bump an app's version when the shape of what it caches changes
+CACHE_NAMESPACE_VERSIONS = {
+    'account': 1,
+    'payment': 1,
+    'core': 1,
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -93,26 +180,86 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Adds --update-query-budgets (see core/testing.py)
+TEST_RUNNER = 'core.testing.QueryBudgetRunner'
+
 AUTH_USER_MODEL = 'account.CustomUser'
 
 KAVEH_NEGAR_API_KEY = config('KAVEH_NEGAR_API_KEY')
+KAVENEGAR_API_URL = config('KAVENEGAR_API_URL', default='https://api.kavenegar.com/v1')
+
+# Outbound SMS queue (see account/sms.py)
+SMS_PROVIDER = config('SMS_PROVIDER', default='account.sms.KavenegarSMSProvider')
+SMS_QUEUE_EAGER = config('SMS_QUEUE_EAGER', default=False, cast=bool)
+SMS_QUEUE_WORKERS = config('SMS_QUEUE_WORKERS', default=4, cast=int)
+SMS_QUEUE_BATCH_SIZE = config('SMS_QUEUE_BATCH_SIZE', default=50, cast=int)
+SMS_QUEUE_MAX_ATTEMPTS = config('SMS_QUEUE_MAX_ATTEMPTS', default=5, cast=int)
+SMS_QUEUE_RETRY_BACKOFF = config('SMS_QUEUE_RETRY_BACKOFF', default=2, cast=int)
+SMS_QUEUE_CLAIM_TIMEOUT = config('SMS_QUEUE_CLAIM_TIMEOUT', default=300, cast=int)
+
+# OTP state store (see account/otp_store.py)
+OTP_STORE_BACKEND = config('OTP_STORE_BACKEND', default='account.otp_store.CacheOTPStore')
+OTP_STORE_CACHE_ALIAS = config('OTP_STORE_CACHE_ALIAS', default='default')
 
 # BitPay settings
 BITPAY_API_KEY = config('BITPAY_API_KEY')
+BITPAY_BASE_URL = config('BITPAY_BASE_URL', default='https://bitpay.ir/payment')
+BITPAY_POOL_SIZE = config('BITPAY_POOL_SIZE', default=20, cast=int)
+BITPAY_CONNECT_TIMEOUT = config('BITPAY_CONNECT_TIMEOUT', default=3.05, cast=float)
+BITPAY_READ_TIMEOUT = config('BITPAY_READ_TIMEOUT', default=10.0, cast=float)
+BITPAY_BREAKER_THRESHOLD = config('BITPAY_BREAKER_THRESHOLD', default=5, cast=int)
+BITPAY_BREAKER_RESET_TIMEOUT = config('BITPAY_BREAKER_RESET_TIMEOUT', default=30.0, cast=float)
 SITE_URL = config('SITE_URL', default='http://localhost:8000')
 
+# Subscription expiry scheduler (see payment/expiry.py)
+SUBSCRIPTION_EXPIRY_SMS_TEMPLATE = config('SUBSCRIPTION_EXPIRY_SMS_TEMPLATE', default='subscription-expired')
+
+# Request instrumentation (see core/instrumentation.py and core/metrics.py)
+# Server-Timing exposes query counts and timings to clients: development only by default
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+# /metrics answers 403 until a scrape token is set
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.ClaimsJWTAuthentication',
+    ),
+    # orjson-backed JSON when installed, DRF's stdlib JSON otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'core.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Token buckets (core/throttling.py): '<scope>' per key, '<scope>:<key>' overrides one key
     'DEFAULT_THROTTLE_RATES': {
         'otp': config('OTP_THROTTLE_RATE', default='3/min'),
+        'otp:ip': config('OTP_IP_THROTTLE_RATE', default='30/min'),
+        'otp_verify': config('OTP_VERIFY_THROTTLE_RATE', default='5/min'),
+        'otp_verify:ip': config('OTP_VERIFY_IP_THROTTLE_RATE', default='30/min'),
+        'payment': config('PAYMENT_THROTTLE_RATE', default='20/min'),
+        'payment:ip': config('PAYMENT_IP_THROTTLE_RATE', default='120/min'),
+        'payment_verify': config('PAYMENT_VERIFY_THROTTLE_RATE', default='120/min'),
     }
 }
 
+# Shared rate-limit store (see core/throttling.py)
+THROTTLE_BACKEND = config('THROTTLE_BACKEND', default='core.throttling.CacheThrottleBackend')
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+THROTTLE_REDIS_URL = config('THROTTLE_REDIS_URL', default='redis://localhost:6379/0')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
 }
+
+# Seconds after a refresh during which the same refresh token gets the same successor back
+REFRESH_TOKEN_REUSE_GRACE = config('REFRESH_TOKEN_REUSE_GRACE', default=10, cast=int)
+
+# Seconds a user's cached auth state (is_active/is_staff/token_version) is trusted
+AUTH_STATE_CACHE_TIMEOUT = config('AUTH_STATE_CACHE_TIMEOUT', default=60, cast=int)
@@ -0,0 +1,54 @@
+"""
+SQLite backend tuned for single-node deployments.
+
+Use it with ``ENGINE: 'core.sqlite_backend'``. Every new connection runs:
+
+* ``journal_mode=WAL``: readers no longer block the writer and vice versa.
+* ``synchronous=NORMAL``: fsync at checkpoints only, which is safe in WAL mode.
+* ``busy_timeout``: wait for the write lock instead of failing immediately.
+* ``mmap_size`` and ``cache_size``: larger page cache and memory-mapped reads.
+
+``atomic()`` blocks start with ``BEGIN IMMEDIATE`` instead of a deferred
+``BEGIN``. The write lock is taken up front, so two transactions can no longer
+both read and then deadlock when upgrading to a write. Those deadlocks are
+the ``database is locked`` errors that ``busy_timeout`` cannot help with.
+
+Each value can be overridden in ``DATABASES[...]['OPTIONS']`` under the same
+name, plus ``transaction_mode`` (``DEFERRED``/``IMMEDIATE``/``EXCLUSIVE``).
+"""
+from django.db.backends.sqlite3 import base
+from django.utils.asyncio import async_unsafe
+
+PRAGMA_DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    # negative values are KiB: 64 MiB page cache per connection
+    'cache_size': -64000,
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = {name: options.get(name, default) for name, default in PRAGMA_DEFAULTS.items()}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ValueError(f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}')
+
+        params = super().get_connection_params()
+        for name in (*PRAGMA_DEFAULTS, 'transaction_mode'):
+            params.pop(name, None)
+        return params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
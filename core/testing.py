@@ -0,0 +1,151 @@
+"""
+Query budgets: fail the build when a view starts running more queries.
+
+``QueryBudgetMixin.assertQueryBudget(name)`` records every query run inside
+the block. It compares them with the SQL recorded for ``name`` in a
+``query_budgets.json`` file next to the test module. The file holds the
+normalized SQL (parameters stay as ``%s``), so a change in the budget shows up
+as a readable diff in review.
+
+* More queries than recorded: the test fails. The report lists each added
+  query with the project stack frames that ran it.
+* Fewer or equal: the test passes. Re-record to lower the budget.
+* No budget yet: the test fails until budgets are recorded.
+
+Record or refresh budgets with::
+
+    python manage.py test --update-query-budgets
+
+(``QueryBudgetRunner`` sets ``QUERY_BUDGET_UPDATE=1``, which can also be set
+directly.)
+"""
+import json
+import os
+import re
+import sys
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+UPDATE_ENV = 'QUERY_BUDGET_UPDATE'
+BUDGET_FILENAME = 'query_budgets.json'
+STACK_DEPTH = 8
+
+
+def normalize_sql(sql):
+    sql = re.sub(r'\s+', ' ', sql).strip()
+    # IN lists and multi-row VALUES vary with the data, not with the code
+    sql = re.sub(r'\(%s(?:, %s)+\)', '(%s, ...)', sql)
+    sql = re.sub(r'(\(%s(?:, %s)*\))(?:, \(%s(?:, %s)*\))+', r'\1, ...', sql)
+    # savepoint names embed the thread id and a counter
+    sql = re.sub(r'"s\d+_x\d+"', '"s?"', sql)
+    return sql
+
+
+def _project_stack():
+    base = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(base)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames[-STACK_DEPTH:]))
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((normalize_sql(sql), _project_stack()))
+        return execute(sql, params, many, context)
+
+    @property
+    def statements(self):
+        return [sql for sql, _ in self.queries]
+
+
+class BudgetFile:
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def get(self, name):
+        return self.load().get(name)
+
+    def set(self, name, statements):
+        budgets = self.load()
+        budgets[name] = statements
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(budgets, f, indent=2, ensure_ascii=False, sort_keys=True)
+            f.write('\n')
+
+
+def _over_budget_report(name, recorder, expected):
+    added = Counter(recorder.statements) - Counter(expected)
+    lines = [
+        f'{name}: {len(recorder.queries)} queries, budget is {len(expected)}.',
+        'Queries not in the budget:',
+    ]
+    for sql, stack in recorder.queries:
+        if added[sql] > 0:
+            added[sql] -= 1
+            lines.append(f'\n  {sql}\n{stack}')
+    lines.append(f'If the new queries are intended, re-record with {UPDATE_ENV}=1.')
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """``TestCase`` mixin providing ``assertQueryBudget``."""
+    query_budget_file = None
+
+    def _budget_file(self):
+        path = self.query_budget_file
+        if path is None:
+            module = sys.modules[type(self).__module__]
+            path = os.path.join(os.path.dirname(module.__file__), BUDGET_FILENAME)
+        return BudgetFile(path)
+
+    @contextmanager
+    def assertQueryBudget(self, name, using='default'):
+        recorder = QueryRecorder()
+        with connections[using].execute_wrapper(recorder):
+            yield recorder
+
+        budgets = self._budget_file()
+        if os.environ.get(UPDATE_ENV):
+            budgets.set(name, recorder.statements)
+            return
+
+        expected = budgets.get(name)
+        if expected is None:
+            self.fail(f'No query budget recorded for {name!r}; run the tests with {UPDATE_ENV}=1.')
+        if len(recorder.queries) > len(expected):
+            self.fail(_over_budget_report(name, recorder, expected))
+
+
+class QueryBudgetRunner(DiscoverRunner):
+    """Test runner adding ``--update-query-budgets``."""
+
+    def __init__(self, update_query_budgets=False, **kwargs):
+        super().__init__(**kwargs)
+        if update_query_budgets:
+            os.environ[UPDATE_ENV] = '1'
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--update-query-budgets', action='store_true',
+            help='Record the current queries as the new query budgets.',
+        )
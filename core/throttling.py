@@ -0,0 +1,341 @@
+"""
+Token-bucket rate limiting with a shared backend.
+
+``TokenBucketThrottle`` replaces DRF's ``ScopedRateThrottle``. DRF keeps a list
+of request timestamps per client in the local cache. This throttle stores a
+single number per key instead, the bucket's "theoretical arrival time" (GCRA,
+the virtual-scheduling form of a token bucket). A rate of ``3/min`` allows a
+burst of 3 and then one request every 20 seconds.
+
+A view opts in with ``throttle_scope`` and lists what to key the buckets on in
+``throttle_keys``. Supported keys:
+
+* ``ip``: the client address, honouring ``NUM_PROXIES`` like DRF
+* ``user``: the authenticated user's id
+* ``phone``: the ``phone_number`` field of the request body, normalized as
+  the OTP serializers do (``account.serializers.normalize_phone_number``)
+
+A request is charged against every bucket at once and is rejected if any of
+them is empty. The rate for a key comes from
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``: first ``'<scope>:<key>'``, then
+``'<scope>'``. A key with neither is not limited.
+
+The backend is selected with the ``THROTTLE_BACKEND`` setting:
+
+* ``core.throttling.CacheThrottleBackend``: the Django cache. This is the
+  default, and it is shared between workers only when the cache is.
+  ``manage.py check --deploy`` warns (``core.W001``) when it is not.
+* ``core.throttling.RedisThrottleBackend``: any Redis-compatible server at
+  ``THROTTLE_REDIS_URL``. A Lua script updates all buckets atomically. Needs
+  the optional ``redis`` package. ``FakeRedis`` runs the same script in
+  process for tests.
+* ``core.throttling.MemoryThrottleBackend``: a bounded in-process store
+  (single process, tests).
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'3/min'`` -> ``(interval, period)`` in seconds, e.g. ``(20.0, 60)``."""
+    num, period = rate.split('/')
+    duration = PERIODS[period[0]]
+    return duration / int(num), duration
+
+
+def gcra(tats, now, limits):
+    """
+    Charge one request against each bucket.
+
+    ``tats`` are the stored arrival times (``None`` for a fresh bucket) and
+    ``limits`` the matching ``(key, interval, period)`` triples. Returns
+    ``(wait, new_tats)``: ``new_tats`` is ``None`` when the request is
+    rejected, and ``wait`` is how long until it would be accepted.
+    """
+    new_tats, wait = [], 0.0
+    for tat, (_key, interval, period) in zip(tats, limits):
+        new_tat = max(tat or now, now) + interval
+        wait = max(wait, new_tat - now - period)
+        new_tats.append(new_tat)
+    if wait > 0:
+        return wait, None
+    return 0.0, new_tats
+
+
+class BaseThrottleBackend:
+    """Stores bucket state; ``consume`` returns the seconds to wait (``0.0`` when allowed)."""
+
+    def consume(self, limits):
+        raise NotImplementedError
+
+
+class CacheThrottleBackend(BaseThrottleBackend):
+    """
+    Buckets in a Django cache, one ``get_many`` and one ``set_many`` per request.
+
+    The read and the write are not atomic. Concurrent requests for the same
+    key can both pass, so a burst may overshoot by the number of workers.
+    """
+
+    def __init__(self, cache_alias=None):
+        self.cache_alias = cache_alias or getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def is_process_local(self):
+        cache = self.cache
+        # For core.cache.TieredCache what counts is the shared tier behind it
+        cache = getattr(cache, 'l2', cache)
+        return isinstance(cache, (LocMemCache, DummyCache))
+
+    def consume(self, limits):
+        now = time.time()
+        keys = [key for key, _, _ in limits]
+        stored = self.cache.get_many(keys)
+        wait, new_tats = gcra([stored.get(key) for key in keys], now, limits)
+        if new_tats is not None:
+            self.cache.set_many(dict(zip(keys, new_tats)), math.ceil(max(new_tats) - now))
+        return wait
+
+
+class MemoryThrottleBackend(BaseThrottleBackend):
+    """Bounded in-process buckets; only suitable for a single process and for tests."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or getattr(settings, 'THROTTLE_MAX_ENTRIES', 100_000)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, limits):
+        now = time.time()
+        with self._lock:
+            wait, new_tats = gcra([self._data.get(key) for key, _, _ in limits], now, limits)
+            if new_tats is not None:
+                for (key, _, _), tat in zip(limits, new_tats):
+                    self._data[key] = tat
+                    self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Same algorithm as ``gcra``, using the server clock so every worker agrees
+REDIS_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tats, wait = {}, 0
+for i = 1, #KEYS do
+    local tat = tonumber(redis.call('GET', KEYS[i])) or now
+    if tat < now then tat = now end
+    tats[i] = tat + tonumber(ARGV[2 * i - 1])
+    wait = math.max(wait, tats[i] - now - tonumber(ARGV[2 * i]))
+end
+if wait > 0 then return tostring(wait) end
+for i = 1, #KEYS do
+    redis.call('SET', KEYS[i], tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000))
+end
+return '0'
+"""
+
+
+class RedisThrottleBackend(BaseThrottleBackend):
+    """
+    Buckets on a Redis-compatible server, one atomic ``EVALSHA`` per request.
+
+    If the server cannot be reached, requests are allowed and a warning is
+    logged, so an outage never turns into refused logins.
+    """
+
+    def __init__(self, url=None, client=None):
+        try:
+            import redis
+        except ImportError:
+            if client is None:
+                raise ImproperlyConfigured('RedisThrottleBackend requires the "redis" package')
+            redis = None
+        # socket-level failures, and everything redis-py raises
+        self.errors = (OSError, redis.RedisError) if redis else (OSError,)
+        self.client = client or redis.Redis.from_url(url or settings.THROTTLE_REDIS_URL)
+        self.script = self.client.register_script(REDIS_SCRIPT)
+
+    def consume(self, limits):
+        args = []
+        for _key, interval, period in limits:
+            args += [interval, period]
+        try:
+            return float(self.script(keys=[key for key, _, _ in limits], args=args))
+        except self.errors:
+            logger.warning('Throttle backend unavailable, allowing request', exc_info=True)
+            return 0.0
+
+
+class FakeRedis:
+    """
+    In-process stand-in for the Redis client of ``RedisThrottleBackend``
+    (tests and benchmarks). ``register_script`` only accepts ``REDIS_SCRIPT``
+    and runs it step for step: string arguments, one clock for all keys,
+    millisecond expiry and a string result. ``clock`` plays the server's
+    ``TIME``; set ``available = False`` to simulate an outage.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.available = True
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def register_script(self, script):
+        if script != REDIS_SCRIPT:
+            raise ValueError('FakeRedis only runs REDIS_SCRIPT')
+        return self._run_script
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key, self.clock())
+
+    def pttl(self, key):
+        with self._lock:
+            now = self.clock()
+            if self._get(key, now) is None:
+                return -2
+            return math.ceil((self._data[key][1] - now) * 1000)
+
+    def _get(self, key, now):
+        entry = self._data.get(key)
+        if entry is None or entry[1] <= now:
+            self._data.pop(key, None)
+            return None
+        return entry[0]
+
+    def _run_script(self, keys=(), args=()):
+        if not self.available:
+            raise ConnectionError('FakeRedis is unavailable')
+        # redis-py sends every argument as a string
+        args = [str(arg) for arg in args]
+        with self._lock:
+            now = self.clock()
+            tats, wait = [], 0.0
+            for i, key in enumerate(keys):
+                stored = self._get(key, now)
+                tat = float(stored) if stored is not None else now
+                if tat < now:
+                    tat = now
+                tats.append(tat + float(args[2 * i]))
+                wait = max(wait, tats[i] - now - float(args[2 * i + 1]))
+            if wait > 0:
+                return str(wait).encode()
+            for key, tat in zip(keys, tats):
+                px = math.ceil((tat - now) * 1000)
+                self._data[key] = (str(tat).encode(), now + px / 1000)
+            return b'0'
+
+
+@lru_cache(maxsize=None)
+def get_throttle_backend():
+    backend = getattr(settings, 'THROTTLE_BACKEND', 'core.throttling.CacheThrottleBackend')
+    return import_string(backend)()
+
+
+@receiver(setting_changed)
+def _reset_throttle_backend(sender, setting, **kwargs):
+    if setting.startswith('THROTTLE'):
+        get_throttle_backend.cache_clear()
+
+
+def check_throttle_backend(app_configs, **kwargs):
+    """Deploy check: rate-limit counters must be shared between workers."""
+    backend_class = import_string(getattr(settings, 'THROTTLE_BACKEND', 'core.throttling.CacheThrottleBackend'))
+    if issubclass(backend_class, MemoryThrottleBackend):
+        local = True
+    elif issubclass(backend_class, CacheThrottleBackend):
+        local = backend_class().is_process_local()
+    else:
+        local = False
+    if not local:
+        return []
+    return [checks.Warning(
+        'Rate-limit buckets are kept per process; each worker allows the full rate.',
+        hint='Set THROTTLE_BACKEND=core.throttling.RedisThrottleBackend, or CACHE_REDIS_URL '
+             'so that the throttle cache is shared.',
+        id='core.W001',
+    )]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Scoped token-bucket throttle keyed on the view's ``throttle_keys`` (default ``('ip',)``)."""
+
+    key_prefix = 'throttle'
+
+    def __init__(self):
+        self._wait = None
+
+    def get_rate(self, scope, key):
+        # Read on every call so override_settings(REST_FRAMEWORK=...) applies
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+        rate = rates.get(f'{scope}:{key}', rates.get(scope))
+        return parse_rate(rate) if rate else None
+
+    def get_key_value(self, key, request):
+        if key == 'ip':
+            return self.get_ident(request)
+        if key == 'user':
+            user = getattr(request, 'user', None)
+            return user.pk if user is not None and user.is_authenticated else None
+        if key == 'phone':
+            from account.serializers import normalize_phone_number
+
+            data = request.data if hasattr(request.data, 'get') else {}
+            # bounded so arbitrary bodies cannot produce huge keys
+            phone_number = normalize_phone_number(str(data.get('phone_number') or '').strip()[:32])
+            # Every spelling of a number shares one bucket; anything the OTP
+            # serializers would reject gets none (the ip bucket still applies)
+            if phone_number and phone_number.isdigit() and len(phone_number) == 11 and phone_number.startswith('09'):
+                return phone_number
+            return None
+        raise ImproperlyConfigured(f'Unknown throttle key: {key!r}')
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+
+        limits = []
+        for key in getattr(view, 'throttle_keys', ('ip',)):
+            rate = self.get_rate(scope, key)
+            value = self.get_key_value(key, request) if rate else None
+            if value is not None:
+                limits.append((f'{self.key_prefix}:{scope}:{key}:{value}', *rate))
+        if not limits:
+            return True
+
+        self._wait = get_throttle_backend().consume(limits)
+        return not self._wait
+
+    def wait(self):
+        return self._wait
@@ -4,8 +4,15 @@ URL configuration for core project.
 from django.contrib import admin
 from django.urls import path, include
 
+from core.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('account.urls')),
     path('api/payment/', include('payment.urls')),
+    # نسخه async (ASGI) همان endpoint ها
+    path('api/async/', include('account.async_urls')),
+    path('api/async/payment/', include('payment.async_urls')),
+    # Prometheus scrape endpoint
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -1,14 +1,40 @@
 from django.contrib import admin
-from .models import Transaction, SubscriptionPlan, Subscription, SubscriptionTransaction
+
+from account.serializers import normalize_phone_number
+from core.admin import EstimatedCountPaginator, IndexedSearchMixin, month_filter
+from .models import (
+    Transaction, SubscriptionPlan, Subscription, SubscriptionTransaction, SubscriptionEntitlement,
+    DailyRevenue, DailySubscribers,
+)
+
+
+class LargeTableAdmin(IndexedSearchMixin, admin.ModelAdmin):
+    """
+    پایه changelist جدول‌های پرحجم (core/admin.py): شمارش تخمینی، جستجوی
+    دقیق/پیشوندی روی ایندکس و فیلتر ماهانه به جای date_hierarchy
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    prefix_search_fields = ['user__phone_number']
+    
+    def normalize_prefix_term(self, term):
+        # فقط شماره تلفن (یا ابتدای آن) به صورت پیشوندی جستجو می‌شود
+        phone = normalize_phone_number(term)
+        return phone if phone.isdigit() else None
+    
+    @admin.display(description='کاربر')
+    def user_phone(self, obj):
+        return obj.user.phone_number
 
 
 @admin.register(Transaction)
-class TransactionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'amount', 'status', 'trans_id', 'created_at']
-    list_filter = ['status', 'created_at']
-    search_fields = ['user__phone_number', 'trans_id', 'card_num', 'factor_id']
+class TransactionAdmin(LargeTableAdmin):
+    list_display = ['id', 'user_phone', 'amount', 'status', 'trans_id', 'created_at']
+    list_select_related = ['user']
+    list_filter = ['status', month_filter('created_at', 'ماه ایجاد'), 'created_at']
+    exact_search_fields = ['card_num', 'trans_id', 'factor_id']
+    search_help_text = 'شماره تلفن (یا ابتدای آن)، id_get، شناسه تراکنش یا شماره فاکتور'
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'created_at'
 
 
 @admin.register(SubscriptionPlan)
@@ -20,18 +46,54 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
-    list_display = ['user', 'plan', 'start_date', 'end_date', 'is_active']
-    list_filter = ['plan', 'start_date', 'end_date']
-    search_fields = ['user__phone_number', 'plan__name']
+class SubscriptionAdmin(LargeTableAdmin):
+    list_display = ['user_phone', 'plan', 'start_date', 'end_date', 'is_active']
+    list_select_related = ['user', 'plan']
+    list_filter = ['plan', month_filter('created_at', 'ماه ایجاد'), 'start_date', 'end_date']
+    search_help_text = 'شماره تلفن (یا ابتدای آن)'
     readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'start_date'
 
 
 @admin.register(SubscriptionTransaction)
-class SubscriptionTransactionAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'plan', 'amount', 'status', 'created_at']
-    list_filter = ['status', 'plan', 'created_at']
-    search_fields = ['user__phone_number', 'plan__name', 'description']
+class SubscriptionTransactionAdmin(LargeTableAdmin):
+    list_display = ['id', 'user_phone', 'plan', 'amount', 'status', 'created_at']
+    list_select_related = ['user', 'plan']
+    list_filter = ['status', 'plan', month_filter('created_at', 'ماه ایجاد'), 'created_at']
+    exact_search_fields = ['id']
+    search_help_text = 'شماره تلفن (یا ابتدای آن) یا شناسه تراکنش'
     readonly_fields = ['id', 'created_at', 'updated_at']
-    date_hierarchy = 'created_at'
+
+
+@admin.register(SubscriptionEntitlement)
+class SubscriptionEntitlementAdmin(admin.ModelAdmin):
+    list_display = ['user', 'plan', 'end_date', 'is_active', 'expired_at', 'updated_at']
+    list_select_related = ['user', 'plan']
+    search_fields = ['user__phone_number']
+    readonly_fields = ['user', 'subscription', 'plan', 'end_date', 'expired_at', 'updated_at']
+    
+    def has_add_permission(self, request):
+        # با سیگنال‌های اشتراک نگهداری می‌شود
+        return False
+
+
+class RollupAdmin(admin.ModelAdmin):
+    """جدول‌های rollup فقط با ``rollup_analytics`` نوشته می‌شوند"""
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(RollupAdmin):
+    list_display = ['date', 'source', 'plan', 'currency', 'successful_count', 'failed_count', 'pending_count', 'revenue']
+    list_select_related = ['plan']
+    list_filter = ['source', 'plan', 'currency', 'date']
+
+
+@admin.register(DailySubscribers)
+class DailySubscribersAdmin(RollupAdmin):
+    list_display = ['date', 'active_subscribers', 'new_subscriptions']
+    list_filter = ['date']
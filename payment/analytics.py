@@ -0,0 +1,159 @@
+"""
+جمع‌های روزانه (rollup) درآمد و مشترکین
+
+هر تغییر در تراکنش‌ها (سیگنال‌های ذخیره/حذف، UPDATE شرطی وریفای و
+``bulk_update`` تطبیق) پس از commit، روزِ ``created_at`` آن تراکنش را در
+``RollupDirtyDay`` علامت می‌زند؛ خارج از تراکنش نویسنده و فقط اگر روز هنوز
+علامت نخورده باشد، تا خریدها و وریفای‌های همزمان پشت یک ردیف صف نکشند. ``rollup_pending_days`` روزهای علامت‌خورده را برمی‌دارد و هر روز
+را فقط از روی ردیف‌های همان روز (بازه‌ای روی ایندکس ``created_at``) دوباره جمع
+می‌زند؛ هزینه هر روز O(ردیف‌های آن روز) است و نه O(کل جدول).
+
+تعداد مشترکین فعال برای گذشته قابل بازسازی نیست؛ هر اجرا برای امروز یک
+snapshot از ``SubscriptionEntitlement`` (ایندکس ``end_date``) ثبت می‌کند.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import (
+    Transaction, SubscriptionTransaction, SubscriptionEntitlement,
+    DailyRevenue, DailySubscribers, RollupDirtyDay,
+)
+
+# مبالغ BitPay به ریال است
+PAYMENT_CURRENCY = 'IRR'
+
+STATUS_FIELDS = {
+    'successful': 'successful_count', 'SUCCESS': 'successful_count',
+    'failed': 'failed_count', 'FAILED': 'failed_count',
+    'pending': 'pending_count', 'PENDING': 'pending_count',
+}
+SUCCESS_STATUSES = ('successful', 'SUCCESS')
+
+
+def day_bounds(day):
+    """بازه نیمه‌باز ``[start, end)`` یک روز در منطقه زمانی پروژه"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def mark_dirty(days):
+    """علامت‌گذاری روزها برای بازمحاسبه، پس از commit تراکنش جاری"""
+    days = set(days)
+    if not days:
+        return
+    transaction.on_commit(lambda: _insert_marks(days))
+
+
+def _insert_marks(days):
+    # اول بررسی، بعد درج روزهای بی‌علامت؛ روز علامت‌خورده هیچ نوشتنی ندارد
+    missing = days - set(RollupDirtyDay.objects.filter(date__in=days).values_list('date', flat=True))
+    if missing:
+        now = timezone.now()
+        RollupDirtyDay.objects.bulk_create(
+            [RollupDirtyDay(date=day, marked_at=now) for day in missing], ignore_conflicts=True,
+        )
+
+
+def mark_dirty_for(*moments):
+    mark_dirty(timezone.localdate(moment) for moment in moments)
+
+
+def _add(row, status, count, amount):
+    field = STATUS_FIELDS[status]
+    setattr(row, field, getattr(row, field) + count)
+    if status in SUCCESS_STATUSES:
+        row.revenue += amount or 0
+
+
+def aggregate_day(day):
+    """ردیف‌های ``DailyRevenue`` یک روز (ذخیره‌نشده)"""
+    start, end = day_bounds(day)
+    rows = {}
+
+    payments = Transaction.objects.filter(
+        created_at__gte=start, created_at__lt=end
+    ).order_by().values('status').annotate(count=Count('id'), amount=Sum('amount'))
+    for group in payments:
+        row = rows.setdefault((DailyRevenue.SOURCE_PAYMENT, None, PAYMENT_CURRENCY), DailyRevenue(
+            date=day, source=DailyRevenue.SOURCE_PAYMENT, currency=PAYMENT_CURRENCY,
+        ))
+        _add(row, group['status'], group['count'], group['amount'])
+
+    subscriptions = SubscriptionTransaction.objects.filter(
+        created_at__gte=start, created_at__lt=end
+    ).order_by().values('plan_id', 'currency', 'status').annotate(count=Count('id'), amount=Sum('amount'))
+    for group in subscriptions:
+        key = (DailyRevenue.SOURCE_SUBSCRIPTION, group['plan_id'], group['currency'])
+        row = rows.setdefault(key, DailyRevenue(
+            date=day, source=DailyRevenue.SOURCE_SUBSCRIPTION,
+            plan_id=group['plan_id'], currency=group['currency'],
+        ))
+        _add(row, group['status'], group['count'], group['amount'])
+
+    return list(rows.values())
+
+
+def rollup_day(day):
+    """بازمحاسبه کامل جمع‌های یک روز از روی تراکنش‌های همان روز"""
+    with transaction.atomic():
+        rows = aggregate_day(day)
+        DailyRevenue.objects.filter(date=day).delete()
+        DailyRevenue.objects.bulk_create(rows)
+        new_subscriptions = sum(
+            row.successful_count for row in rows if row.source == DailyRevenue.SOURCE_SUBSCRIPTION
+        )
+        DailySubscribers.objects.update_or_create(
+            date=day, defaults={'new_subscriptions': new_subscriptions}
+        )
+    return rows
+
+
+def snapshot_subscribers(now=None):
+    """ثبت تعداد مشترکین فعال امروز"""
+    now = now or timezone.now()
+    active = SubscriptionEntitlement.objects.filter(end_date__gte=now).count()
+    DailySubscribers.objects.update_or_create(
+        date=timezone.localdate(now), defaults={'active_subscribers': active}
+    )
+    return active
+
+
+def rollup_pending_days(limit=None):
+    """
+    بازمحاسبه روزهای علامت‌خورده. علامت هر روز پیش از جمع زدن و جدا commit
+    می‌شود: نویسنده‌ای که پس از آن commit کند علامت را نمی‌بیند و دوباره
+    علامت می‌زند، و تغییر نویسنده‌ای که علامت را دیده پیش از خواندن commit
+    شده است. اگر بازمحاسبه خطا دهد، روز دوباره علامت می‌خورد.
+    """
+    days = list(RollupDirtyDay.objects.order_by('date').values_list('date', flat=True)[:limit])
+    for day in days:
+        RollupDirtyDay.objects.filter(date=day).delete()
+        try:
+            rollup_day(day)
+        except Exception:
+            _insert_marks({day})
+            raise
+    return days
+
+
+def rebuild(date_from, date_to):
+    """بازسازی جمع‌های بازه ``[date_from, date_to]`` (backfill)"""
+    day = date_from
+    days = []
+    while day <= date_to:
+        rollup_day(day)
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def revenue_totals(queryset):
+    """جمع کل ردیف‌های ``DailyRevenue`` به ازای منبع و واحد پول"""
+    return list(queryset.order_by('source', 'currency').values('source', 'currency').annotate(
+        revenue=Sum('revenue'), successful_count=Sum('successful_count'),
+        failed_count=Sum('failed_count'), pending_count=Sum('pending_count'),
+    ))
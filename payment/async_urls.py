@@ -0,0 +1,9 @@
+from django.urls import path
+from .async_views import AsyncCreateTransactionView, AsyncVerifyPaymentView
+
+app_name = 'payment_async'
+
+urlpatterns = [
+    path('transaction/create/', AsyncCreateTransactionView.as_view(), name='create-transaction'),
+    path('verify/', AsyncVerifyPaymentView.as_view(), name='verify-payment'),
+]
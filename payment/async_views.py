@@ -0,0 +1,108 @@
+import httpx
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+
+from core.async_views import AsyncAPIView, json_response
+from . import bitpay
+from .models import Transaction
+from .serializers import CreateTransactionSerializer
+from .verification import averify_payment, VERIFIED, ALREADY_VERIFIED, NOT_FOUND
+
+
+class AsyncCreateTransactionView(AsyncAPIView):
+    """نسخه async ایجاد تراکنش پرداخت BitPay"""
+    authentication_required = True
+    throttle_scope = 'payment'
+    throttle_keys = ('user', 'ip')
+
+    async def post(self, request):
+        serializer = CreateTransactionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return json_response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        amount = serializer.validated_data['amount']
+        user = request.user
+
+        site_url = getattr(settings, 'SITE_URL', 'http://localhost:8000')
+        redirect_url = f"{site_url}/api/payment/verify/"
+
+        try:
+            result = await bitpay.asend(amount, redirect_url, f"order_{user.id}_{timezone.now().timestamp()}")
+        except (httpx.HTTPError, ValueError, bitpay.CircuitOpenError) as e:
+            return json_response(
+                {'error': f'خطا در ارتباط با درگاه: {str(e)}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if result.get('status') != 1:
+            return json_response(
+                {'error': 'خطا در ایجاد درخواست پرداخت'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        id_get = result.get('id_get')
+        if not id_get:
+            return json_response(
+                {'error': 'id_get دریافت نشد'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        trans = await Transaction.objects.acreate(
+            user=user,
+            amount=amount,
+            card_num=id_get,
+            status='pending'
+        )
+
+        return json_response({
+            'transaction_id': trans.id,
+            'payment_url': bitpay.payment_url(id_get),
+            'id_get': id_get
+        }, status=status.HTTP_201_CREATED)
+
+
+class AsyncVerifyPaymentView(AsyncAPIView):
+    """نسخه async وریفای پرداخت BitPay"""
+    throttle_scope = 'payment_verify'
+
+    async def post(self, request):
+        trans_id = request.data.get('trans_id')
+        id_get = request.data.get('id_get')
+
+        if not trans_id or not id_get:
+            return json_response(
+                {'error': 'trans_id و id_get الزامی هستند'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            outcome = await averify_payment(trans_id, id_get)
+        except (httpx.HTTPError, ValueError, bitpay.CircuitOpenError) as e:
+            return json_response(
+                {'error': f'خطا در ارتباط با درگاه: {str(e)}'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        if outcome.result == NOT_FOUND:
+            return json_response(
+                {'error': 'تراکنش یافت نشد'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if outcome.result == VERIFIED:
+            return json_response({
+                'message': 'پرداخت با موفقیت تایید شد',
+                'transaction': outcome.transaction
+            }, status=status.HTTP_200_OK)
+
+        if outcome.result == ALREADY_VERIFIED:
+            return json_response({
+                'message': 'Transaction verified in the past',
+                'transaction': outcome.transaction
+            }, status=status.HTTP_200_OK)
+
+        return json_response(
+            {'error': outcome.message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
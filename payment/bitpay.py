@@ -0,0 +1,253 @@
+"""
+کلاینت درگاه BitPay
+
+همه فراخوانی‌های درگاه از یک ``requests.Session`` با connection pool و
+keep-alive عبور می‌کنند (به جای برقراری اتصال TCP/TLS جدید برای هر پرداخت).
+timeout اتصال و خواندن جدا هستند و یک circuit breaker پس از چند خطای پشت سر
+هم، تا مدتی بدون تماس با درگاه ``CircuitOpenError`` می‌دهد تا ویوها سریعاً
+503 برگردانند. زمان هر فراخوانی در ``client.stats`` ثبت می‌شود.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from collections import deque
+from functools import lru_cache
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from core.instrumentation import track_external
+
+
+def send_url():
+    return f"{settings.BITPAY_BASE_URL}/gateway-send"
+
+
+def verify_url():
+    return f"{settings.BITPAY_BASE_URL}/gateway-result-second"
+
+
+def payment_url(id_get):
+    return f"{settings.BITPAY_BASE_URL}/gateway-{id_get}-get"
+
+
+def send_payload(amount, redirect, factor_id):
+    return {
+        'api': settings.BITPAY_API_KEY,
+        'redirect': redirect,
+        'amount': amount,
+        'factorId': factor_id,
+    }
+
+
+def verify_payload(trans_id, id_get):
+    return {
+        'api': settings.BITPAY_API_KEY,
+        'trans_id': trans_id,
+        'id_get': id_get,
+        'json': 1,
+    }
+
+
+class CircuitOpenError(requests.RequestException):
+    """درگاه در وضعیت خطا است و فراخوانی بدون تماس رد شد"""
+
+
+class CircuitBreaker:
+    """
+    Closed → open پس از ``failure_threshold`` خطای پیاپی؛ پس از
+    ``reset_timeout`` ثانیه یک فراخوانی آزمایشی (half-open) اجازه دارد.
+    اگر نتیجه فراخوانی آزمایشی تا ``reset_timeout`` ثانیه ثبت نشود (گم شده)،
+    فراخوانی بعدی آزمایش را تکرار می‌کند.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError('درگاه پرداخت موقتاً در دسترس نیست')
+                self.state = self.HALF_OPEN
+                self.probe_started_at = time.monotonic()
+            elif self.state == self.HALF_OPEN:
+                # فقط یک فراخوانی آزمایشی همزمان
+                if time.monotonic() - self.probe_started_at < self.reset_timeout:
+                    raise CircuitOpenError('درگاه پرداخت موقتاً در دسترس نیست')
+                # نتیجه آزمایش قبلی هرگز ثبت نشد؛ این فراخوانی آزمایش جدید است
+                self.probe_started_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class LatencyStats:
+    """آمار زمان فراخوانی به ازای هر عملیات (send/verify)"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._ops = {}
+        self._lock = threading.Lock()
+
+    def record(self, operation, seconds, ok):
+        with self._lock:
+            op = self._ops.get(operation)
+            if op is None:
+                op = self._ops[operation] = {
+                    'count': 0, 'errors': 0, 'total': 0.0, 'max': 0.0,
+                    'samples': deque(maxlen=self.window),
+                }
+            op['count'] += 1
+            op['errors'] += 0 if ok else 1
+            op['total'] += seconds
+            op['max'] = max(op['max'], seconds)
+            op['samples'].append(seconds)
+
+    def snapshot(self):
+        """خلاصه آمار؛ صدک‌ها روی آخرین ``window`` فراخوانی محاسبه می‌شوند"""
+        with self._lock:
+            result = {}
+            for operation, op in self._ops.items():
+                samples = sorted(op['samples'])
+
+                def pct(p):
+                    return samples[min(len(samples) - 1, int(p * len(samples)))] if samples else 0.0
+
+                result[operation] = {
+                    'count': op['count'],
+                    'errors': op['errors'],
+                    'avg_ms': op['total'] / op['count'] * 1000,
+                    'p50_ms': pct(0.50) * 1000,
+                    'p95_ms': pct(0.95) * 1000,
+                    'p99_ms': pct(0.99) * 1000,
+                    'max_ms': op['max'] * 1000,
+                }
+            return result
+
+
+class BitPayClient:
+    """کلاینت همگام BitPay با connection pool مشترک"""
+
+    def __init__(self, pool_size=20, connect_timeout=3.05, read_timeout=10.0,
+                 failure_threshold=5, reset_timeout=30.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.stats = LatencyStats()
+
+    def send(self, amount, redirect, factor_id):
+        """فراخوانی gateway-send؛ در صورت خطا requests.RequestException"""
+        return self._post('send', send_url(), send_payload(amount, redirect, factor_id))
+
+    def verify(self, trans_id, id_get):
+        """فراخوانی gateway-result-second؛ در صورت خطا requests.RequestException"""
+        return self._post('verify', verify_url(), verify_payload(trans_id, id_get))
+
+    def _post(self, operation, url, data):
+        self.breaker.before_call()
+        start = time.perf_counter()
+        try:
+            with track_external('bitpay'):
+                response = self.session.post(url, data=data, timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
+        except BaseException:
+            # شامل CancelledError/KeyboardInterrupt: فراخوانی آزمایشی half-open باید نتیجه‌اش را ثبت کند
+            self.stats.record(operation, time.perf_counter() - start, ok=False)
+            self.breaker.record_failure()
+            raise
+        self.stats.record(operation, time.perf_counter() - start, ok=True)
+        self.breaker.record_success()
+        return result
+
+
+@lru_cache(maxsize=None)
+def get_client():
+    return BitPayClient(
+        pool_size=settings.BITPAY_POOL_SIZE,
+        connect_timeout=settings.BITPAY_CONNECT_TIMEOUT,
+        read_timeout=settings.BITPAY_READ_TIMEOUT,
+        failure_threshold=settings.BITPAY_BREAKER_THRESHOLD,
+        reset_timeout=settings.BITPAY_BREAKER_RESET_TIMEOUT,
+    )
+
+
+@receiver(setting_changed)
+def _reset_client(sender, setting, **kwargs):
+    if setting.startswith('BITPAY_'):
+        get_client.cache_clear()
+
+
+# کلاینت async به ازای هر event loop (اتصال‌ها بین درخواست‌ها باز می‌مانند)
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.BITPAY_READ_TIMEOUT, connect=settings.BITPAY_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=50),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def _apost(operation, url, data):
+    # breaker و آمار با کلاینت همگام مشترک هستند
+    client = get_client()
+    client.breaker.before_call()
+    start = time.perf_counter()
+    try:
+        with track_external('bitpay'):
+            response = await get_async_client().post(url, data=data)
+            response.raise_for_status()
+            result = response.json()
+    except BaseException:
+        # قطع اتصال کلاینت ASGI وسط فراخوانی (CancelledError) هم خطا حساب می‌شود
+        client.stats.record(operation, time.perf_counter() - start, ok=False)
+        client.breaker.record_failure()
+        raise
+    client.stats.record(operation, time.perf_counter() - start, ok=True)
+    client.breaker.record_success()
+    return result
+
+
+async def asend(amount, redirect, factor_id):
+    """فراخوانی async متد gateway-send؛ در صورت خطا httpx.HTTPError"""
+    return await _apost('send', send_url(), send_payload(amount, redirect, factor_id))
+
+
+async def averify(trans_id, id_get):
+    """فراخوانی async متد gateway-result-second؛ در صورت خطا httpx.HTTPError"""
+    return await _apost('verify', verify_url(), verify_payload(trans_id, id_get))
@@ -0,0 +1,109 @@
+"""
+کاتالوگ کش‌شده پلن‌های اشتراک
+
+پلن‌ها به ندرت تغییر می‌کنند، پس لیست پلن‌های فعال یک بار سریالایز شده و با
+یک نسخه (version) در کش مشترک نگه داشته می‌شود. هر پروسه یک snapshot محلی از
+آخرین نسخه دارد و فقط نسخه را از کش مشترک می‌خواند. ``post_save`` و
+``post_delete`` روی ``SubscriptionPlan`` نسخه را عوض می‌کنند (``signals.py``).
+
+هر snapshot بدنه JSON رندرشده هر صفحه را به همراه یک ETag قوی نگه می‌دارد تا
+لیست پلن‌ها بدون کوئری و بدون رندر مجدد (یا با ``304 Not Modified``) سرو شود.
+"""
+import hashlib
+import threading
+import uuid
+
+from django.db import router
+
+from core.cache import namespace
+
+from .models import SubscriptionPlan
+from .serializers import plan_reader
+
+cache = namespace('payment')
+
+VERSION_KEY = 'plans:catalogue:version'
+DATA_TIMEOUT = 24 * 60 * 60
+MAX_RENDERED_PAGES = 64
+
+
+class CatalogueSnapshot:
+    """نمای تغییرناپذیر یک نسخه از کاتالوگ"""
+
+    def __init__(self, version, plans):
+        self.version = version
+        self.plans = tuple(plans)
+        self._by_id = {plan['id']: plan for plan in self.plans}
+        self._rendered = {}
+        self._lock = threading.Lock()
+
+    def get(self, plan_id):
+        """دیکشنری سریالایزشده پلن فعال یا None"""
+        return self._by_id.get(plan_id)
+
+    def get_plan(self, plan_id):
+        """نمونه ``SubscriptionPlan`` (بدون کوئری) برای پلن فعال یا None"""
+        data = self.get(plan_id)
+        if data is None:
+            return None
+        return SubscriptionPlan(**data)
+
+    def rendered(self, key):
+        """``(data, body, etag)`` ذخیره‌شده برای ``key`` یا None"""
+        return self._rendered.get(key)
+
+    def store_rendered(self, key, data, body):
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        entry = (data, body, etag)
+        with self._lock:
+            if len(self._rendered) >= MAX_RENDERED_PAGES:
+                self._rendered.clear()
+            self._rendered[key] = entry
+        return entry
+
+
+class PlanCatalogue:
+    def __init__(self):
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(VERSION_KEY, version, None):
+                version = cache.get(VERSION_KEY, version)
+
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        with self._lock:
+            if self._snapshot is not None and self._snapshot.version == version:
+                return self._snapshot
+            data_key = f'plans:catalogue:data:{version}'
+            plans = cache.get(data_key)
+            if plans is None:
+                # همیشه از primary؛ نسخه تازه نباید با داده عقب‌مانده replica پر شود
+                queryset = SubscriptionPlan.objects.using(
+                    router.db_for_write(SubscriptionPlan)
+                ).filter(is_active=True)
+                plans = plan_reader.serialize_rows(plan_reader.values(queryset))
+                cache.set(data_key, plans, DATA_TIMEOUT)
+            self._snapshot = CatalogueSnapshot(version, plans)
+            return self._snapshot
+
+    def invalidate(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        self._snapshot = None
+
+
+catalogue = PlanCatalogue()
+
+
+def get_catalogue():
+    return catalogue.snapshot()
+
+
+def invalidate_catalogue():
+    catalogue.invalidate()
@@ -0,0 +1,122 @@
+"""
+وضعیت اشتراک هر کاربر (entitlement)
+
+برای هر کاربر یک ردیف ``SubscriptionEntitlement`` نگه داشته می‌شود که به
+اشتراکی که دیرتر از همه تمام می‌شود اشاره دارد. این ردیف با سیگنال‌های
+``Subscription`` به‌روز می‌شود و در کش (کلید ``entitlement:{user_id}`` در
+فضای نام ``payment``) آینه می‌شود؛ پس پاسخ «کاربر تا کی اشتراک دارد» در حالت
+عادی بدون کوئری و در بدترین حالت با یک lookup روی کلید اصلی به دست می‌آید.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import router, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from core.cache import namespace
+
+from .models import Subscription, SubscriptionEntitlement
+
+cache = namespace('payment')
+
+ENTITLEMENT_CACHE_TIMEOUT = 60 * 60
+# کش منفی برای کاربرانی که هرگز اشتراک نداشته‌اند
+_NO_ENTITLEMENT = 'none'
+
+
+@dataclass(frozen=True)
+class Entitlement:
+    subscription_id: int
+    plan_id: int
+    end_date: datetime
+
+    def is_active(self, now=None):
+        return self.end_date >= (now or timezone.now())
+
+
+def _cache_key(user_id):
+    return f'entitlement:{user_id}'
+
+
+def get_entitlement(user_id, use_cache=True):
+    """``Entitlement`` کاربر یا None (کاربری که هیچ اشتراکی نداشته)"""
+    key = _cache_key(user_id)
+    if use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return None if cached == _NO_ENTITLEMENT else Entitlement(*cached)
+
+    # کش همیشه از primary پر می‌شود، حتی در ویوهایی که از replica می‌خوانند
+    row = SubscriptionEntitlement.objects.using(
+        router.db_for_write(SubscriptionEntitlement)
+    ).filter(user_id=user_id).values_list(
+        'subscription_id', 'plan_id', 'end_date'
+    ).first()
+    cache.set(key, row if row is not None else _NO_ENTITLEMENT, ENTITLEMENT_CACHE_TIMEOUT)
+    return Entitlement(*row) if row is not None else None
+
+
+def active_until(user_id, now=None):
+    """تاریخ پایان اشتراک فعال کاربر یا None"""
+    entitlement = get_entitlement(user_id)
+    if entitlement is None or not entitlement.is_active(now):
+        return None
+    return entitlement.end_date
+
+
+def _invalidate(user_id):
+    key = _cache_key(user_id)
+    cache.delete(key)
+    # پس از commit دوباره، تا مقداری که پیش از commit خوانده شده باقی نماند
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def _store(subscription):
+    now = timezone.now()
+    SubscriptionEntitlement.objects.update_or_create(
+        user_id=subscription.user_id,
+        defaults={
+            'subscription_id': subscription.pk,
+            'plan_id': subscription.plan_id,
+            'end_date': subscription.end_date,
+            'expired_at': None if subscription.end_date >= now else now,
+        }
+    )
+
+
+def record_subscription(subscription):
+    """به‌روزرسانی entitlement پس از ذخیره یک اشتراک"""
+    current = SubscriptionEntitlement.objects.filter(user_id=subscription.user_id).first()
+    if current is None or subscription.end_date >= current.end_date:
+        _store(subscription)
+    elif current.subscription_id == subscription.pk:
+        # اشتراک فعلی کوتاه شده؛ ممکن است اشتراک دیگری دیرتر تمام شود
+        rebuild_entitlement(subscription.user_id)
+        return
+    else:
+        return
+    _invalidate(subscription.user_id)
+
+
+def rebuild_entitlement(user_id):
+    """محاسبه دوباره entitlement از جدول اشتراک‌ها (پس از حذف یا کوتاه شدن اشتراک)"""
+    latest = Subscription.objects.filter(user_id=user_id).order_by('-end_date').first()
+    if latest is None:
+        SubscriptionEntitlement.objects.filter(user_id=user_id).delete()
+    else:
+        _store(latest)
+    _invalidate(user_id)
+
+
+def extend_entitlement(subscription):
+    """ثبت تمدید اشتراکی که entitlement فعلی کاربر است (بدون کوئری بازه‌ای)"""
+    SubscriptionEntitlement.objects.filter(
+        user_id=subscription.user_id, subscription_id=subscription.pk
+    ).update(
+        end_date=Greatest(F('end_date'), Value(subscription.end_date)),
+        expired_at=None,
+        updated_at=timezone.now(),
+    )
+    _invalidate(subscription.user_id)
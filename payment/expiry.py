@@ -0,0 +1,142 @@
+"""
+زمان‌بند انقضای اشتراک‌ها
+
+انقضا در خواندن ضمنی است (``end_date >= now``)؛ این ماژول لحظه عبور از
+``end_date`` را به یک رویداد تبدیل می‌کند. ردیف‌های ``SubscriptionEntitlement``
+(یک ردیف به ازای هر کاربر، با دیرترین ``end_date``) به ترتیب
+``(end_date, user_id)`` و با صفحه‌بندی keyset روی ایندکس ``end_date`` خوانده
+می‌شوند، پس تمدید یک کاربر هرگز انقضا محسوب نمی‌شود. برای هر batch:
+
+1. ``expired_at`` با یک UPDATE شرطی ثبت می‌شود (ردیف‌هایی که در این فاصله
+   تمدید شده‌اند دست نمی‌خورند)
+2. پیامک یادآوری تمدید برای همان کاربران با یک ``enqueue_many`` صف می‌شود
+3. موقعیت در ``JobCheckpoint`` ذخیره می‌شود و پس از commit سیگنال
+   ``subscriptions_expired`` ارسال می‌شود
+
+اجرای بعدی از ``end_date`` آخرین ردیف ادامه می‌دهد؛ اشتراکی که تمدید و دوباره
+منقضی شود ``end_date`` جدیدی دارد و دوباره پردازش می‌شود.
+"""
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from account.sms import enqueue_many
+
+from .models import SubscriptionEntitlement, JobCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'expire_subscriptions'
+
+# پس از commit هر batch با آرگومان‌های ``user_ids`` و ``now`` ارسال می‌شود
+subscriptions_expired = Signal()
+
+
+@dataclass
+class ExpiryStats:
+    scanned: int = 0
+    expired: int = 0
+    skipped: int = 0
+    reminders: int = 0
+    batches: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'scanned': self.scanned, 'expired': self.expired, 'skipped': self.skipped,
+            'reminders': self.reminders, 'batches': self.batches,
+            'elapsed': round(self.elapsed, 2), 'rows_per_sec': round(self.rate, 1),
+        }
+
+
+def load_checkpoint():
+    checkpoint = JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('cursor', flat=True).first()
+    if not checkpoint:
+        return None
+    return parse_datetime(checkpoint['end_date']), checkpoint['user_id']
+
+
+def save_checkpoint(cursor):
+    value = None if cursor is None else {'end_date': cursor[0].isoformat(), 'user_id': cursor[1]}
+    JobCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'cursor': value})
+
+
+def iter_expired_batches(now, batch_size, after):
+    """batch های ``(user_id, end_date)`` با ``after < (end_date, user_id)`` و ``end_date < now``"""
+    base = SubscriptionEntitlement.objects.filter(end_date__lt=now).order_by(
+        'end_date', 'user_id'
+    ).values_list('user_id', 'end_date')
+    while True:
+        if after[1] is None:
+            queryset = base.filter(end_date__gt=after[0])
+        else:
+            queryset = base.filter(
+                Q(end_date__gt=after[0]) | Q(end_date=after[0], user_id__gt=after[1])
+            )
+        batch = list(queryset[:batch_size])
+        if not batch:
+            return
+        yield batch
+        after = (batch[-1][1], batch[-1][0])
+
+
+def expire_batch(batch, now, stats, send_sms=True):
+    user_ids = [user_id for user_id, _ in batch]
+    with transaction.atomic():
+        SubscriptionEntitlement.objects.filter(
+            user_id__in=user_ids, end_date__lt=now, expired_at__isnull=True
+        ).update(expired_at=now, updated_at=now)
+        expired = list(SubscriptionEntitlement.objects.filter(
+            user_id__in=user_ids, expired_at=now
+        ).values_list('user_id', 'user__phone_number'))
+        if send_sms and expired:
+            template = settings.SUBSCRIPTION_EXPIRY_SMS_TEMPLATE
+            stats.reminders += enqueue_many([(phone, template, '') for _, phone in expired])
+        save_checkpoint((batch[-1][1], batch[-1][0]))
+
+    stats.scanned += len(batch)
+    stats.expired += len(expired)
+    # تمدیدشده در این فاصله یا انقضای از قبل ثبت‌شده
+    stats.skipped += len(batch) - len(expired)
+    stats.batches += 1
+    if expired:
+        expired_ids = [user_id for user_id, _ in expired]
+        transaction.on_commit(lambda: subscriptions_expired.send(
+            sender=SubscriptionEntitlement, user_ids=expired_ids, now=now
+        ))
+
+
+def expire_subscriptions(batch_size=1000, limit=None, send_sms=True,
+                         initial_lookback=timedelta(days=1), now=None, progress=None):
+    """
+    یک دور زمان‌بند. بدون checkpoint فقط انقضاهای ``initial_lookback`` اخیر
+    پردازش می‌شوند تا اولین اجرا برای انقضاهای قدیمی پیامک نفرستد.
+    """
+    stats = ExpiryStats()
+    now = now or timezone.now()
+    after = load_checkpoint() or (now - initial_lookback, None)
+
+    for batch in iter_expired_batches(now, batch_size, after):
+        expire_batch(batch, now, stats, send_sms)
+        logger.info('انقضای اشتراک‌ها: %s', stats.as_dict())
+        if progress:
+            progress(stats)
+        if limit is not None and stats.scanned >= limit:
+            break
+    return stats
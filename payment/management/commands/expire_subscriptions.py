@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payment.expiry import expire_subscriptions
+
+
+class Command(BaseCommand):
+    help = 'ثبت انقضای اشتراک‌ها و صف کردن پیامک یادآوری تمدید (قابل ادامه از آخرین checkpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=None, help='حداکثر تعداد ردیف در این اجرا')
+        parser.add_argument('--no-sms', action='store_true', help='بدون پیامک یادآوری')
+        parser.add_argument('--lookback', type=int, default=24,
+                            help='بازه انقضاهای قابل پردازش در اولین اجرا (ساعت)')
+        parser.add_argument('--loop', action='store_true', help='اجرای دوره‌ای (زمان‌بند)')
+        parser.add_argument('--interval', type=int, default=60, help='فاصله اجراها در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = expire_subscriptions(
+                batch_size=options['batch_size'],
+                limit=options['limit'],
+                send_sms=not options['no_sms'],
+                initial_lookback=timedelta(hours=options['lookback']),
+                progress=self.report_progress,
+            )
+            self.stdout.write(self.style.SUCCESS(f'پایان دور انقضا: {stats.as_dict()}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f'batch {stats.batches}: {stats.scanned} ردیف، {stats.rate:,.0f} ردیف/ثانیه '
+            f'(منقضی {stats.expired}، رد شده {stats.skipped}، پیامک {stats.reminders})'
+        )
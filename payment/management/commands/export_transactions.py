@@ -0,0 +1,69 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payment.exports import DATASETS, filter_kwargs, iter_rows, stream_export, export_filename
+from payment.serializers import ExportSerializer
+
+
+class Command(BaseCommand):
+    help = 'خروجی جریانی CSV/NDJSON تراکنش‌ها یا دفتر تراکنش‌های اشتراک (حافظه ثابت)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ndjson'], default='csv')
+        parser.add_argument('--gzip', action='store_true', help='فشرده‌سازی gzip')
+        parser.add_argument('--status')
+        parser.add_argument('--from', dest='date_from', help='از تاریخ (شامل)، مثلاً 2026-01-01')
+        parser.add_argument('--to', dest='date_to', help='تا تاریخ (غیرشامل)')
+        parser.add_argument('--plan', type=int, help='شناسه پلن (فقط subscription-transactions)')
+        parser.add_argument('--output', '-o', help='مسیر فایل؛ پیش‌فرض نام خودکار، - برای stdout')
+        parser.add_argument('--page-size', type=int, default=5000, help='ردیف در هر کوئری keyset')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='chunk_size برای iterator')
+
+    def handle(self, *args, **options):
+        name = options['dataset']
+        spec = DATASETS[name]
+        serializer = ExportSerializer(data={
+            key: options[key]
+            for key in ('file_format', 'gzip', 'status', 'date_from', 'date_to', 'plan')
+            if options[key] is not None
+        }, context={'dataset': spec})
+        if not serializer.is_valid():
+            raise CommandError(serializer.errors)
+        params = serializer.validated_data
+
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for row in rows:
+                exported += 1
+                yield row
+
+        rows = counted(iter_rows(
+            spec,
+            filter_kwargs(
+                status=params.get('status'),
+                date_from=params.get('date_from'),
+                date_to=params.get('date_to'),
+                plan=params.get('plan'),
+            ),
+            page_size=options['page_size'],
+            chunk_size=options['chunk_size'],
+        ))
+        chunks = stream_export(spec, rows, params['file_format'], params['gzip'])
+
+        output = options['output'] or export_filename(
+            name, params['file_format'], params['gzip'], timezone.localtime()
+        )
+        if output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            with open(output, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'{exported} ردیف در {output} نوشته شد'))
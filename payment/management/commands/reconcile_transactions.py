@@ -0,0 +1,40 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payment.reconciliation import reconcile_pending
+
+
+class Command(BaseCommand):
+    help = 'تطبیق تراکنش‌های pending قدیمی با BitPay (قابل ادامه از آخرین checkpoint)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=16, help='حداکثر فراخوانی همزمان درگاه')
+        parser.add_argument('--older-than', type=int, default=30, help='حداقل عمر تراکنش (دقیقه)')
+        parser.add_argument('--limit', type=int, default=None, help='حداکثر تعداد ردیف در این اجرا')
+        parser.add_argument('--no-resume', action='store_true', help='شروع از ابتدا بدون checkpoint')
+        parser.add_argument('--loop', action='store_true', help='اجرای دوره‌ای (زمان‌بند)')
+        parser.add_argument('--interval', type=int, default=300, help='فاصله اجراها در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        while True:
+            stats = reconcile_pending(
+                older_than=timedelta(minutes=options['older_than']),
+                chunk_size=options['chunk_size'],
+                concurrency=options['concurrency'],
+                resume=not options['no_resume'],
+                limit=options['limit'],
+                progress=self.report_progress,
+            )
+            self.stdout.write(self.style.SUCCESS(f'پایان دور تطبیق: {stats.as_dict()}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def report_progress(self, stats):
+        self.stdout.write(
+            f'chunk {stats.chunks}: {stats.scanned} ردیف، {stats.rate:,.0f} ردیف/ثانیه '
+            f'(موفق {stats.verified}، ردشده {stats.rejected}، خطا {stats.errors})'
+        )
@@ -0,0 +1,38 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.analytics import rollup_pending_days, snapshot_subscribers, rebuild
+
+
+class Command(BaseCommand):
+    help = 'به‌روزرسانی جمع‌های روزانه درآمد و مشترکین (روزهای تغییرکرده یا بازه backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat,
+                            help='بازسازی کامل از این روز (مثلاً 2026-01-01)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat,
+                            help='تا این روز (شامل)؛ پیش‌فرض همان --from')
+        parser.add_argument('--limit', type=int, default=None, help='حداکثر روز در هر دور')
+        parser.add_argument('--loop', action='store_true', help='اجرای دوره‌ای (زمان‌بند)')
+        parser.add_argument('--interval', type=int, default=60, help='فاصله اجراها در حالت --loop (ثانیه)')
+
+    def handle(self, *args, **options):
+        if options['date_to'] and not options['date_from']:
+            raise CommandError('--to بدون --from معنا ندارد')
+        if options['date_from']:
+            days = rebuild(options['date_from'], options['date_to'] or options['date_from'])
+            self.stdout.write(self.style.SUCCESS(f'{len(days)} روز بازسازی شد'))
+
+        while True:
+            started = time.monotonic()
+            days = rollup_pending_days(limit=options['limit'])
+            active = snapshot_subscribers()
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(days)} روز بازمحاسبه شد، {active} مشترک فعال '
+                f'({time.monotonic() - started:.2f} ثانیه)'
+            ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
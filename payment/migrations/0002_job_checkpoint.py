@@ -0,0 +1,26 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='نام کار')),
+                ('cursor', models.JSONField(blank=True, null=True, verbose_name='موقعیت')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'نقطه ادامه کار',
+                'verbose_name_plural': 'نقاط ادامه کارها',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_entitlements(apps, schema_editor):
+    Subscription = apps.get_model('payment', 'Subscription')
+    SubscriptionEntitlement = apps.get_model('payment', 'SubscriptionEntitlement')
+    latest = {}
+    for sub in Subscription.objects.order_by('user_id', 'end_date').iterator(chunk_size=2000):
+        latest[sub.user_id] = sub
+    SubscriptionEntitlement.objects.bulk_create([
+        SubscriptionEntitlement(user_id=user_id, subscription_id=sub.id, plan_id=sub.plan_id, end_date=sub.end_date)
+        for user_id, sub in latest.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payment', '0002_job_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionEntitlement',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='subscription_entitlement', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='کاربر')),
+                ('end_date', models.DateTimeField(verbose_name='تاریخ پایان')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+                ('plan', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='payment.subscriptionplan', verbose_name='پلن')),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='payment.subscription', verbose_name='اشتراک')),
+            ],
+            options={
+                'verbose_name': 'وضعیت اشتراک کاربر',
+                'verbose_name_plural': 'وضعیت اشتراک کاربران',
+            },
+        ),
+        migrations.RunPython(backfill_entitlements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0003_subscription_entitlement'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='transaction',
+            name='factor_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='شماره فاکتور'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='trans_id',
+            field=models.CharField(blank=True, db_index=True, max_length=100, null=True, verbose_name='شناسه تراکنش'),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['created_at'], name='payment_sub_created_70a789_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriptiontransaction',
+            index=models.Index(fields=['created_at'], name='payment_sub_created_f8fa28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['created_at'], name='payment_tra_created_0d0f1d_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='روز')),
+                ('source', models.CharField(choices=[('payment', 'پرداخت درگاه'), ('subscription', 'اشتراک')], max_length=20, verbose_name='منبع')),
+                ('currency', models.CharField(max_length=10, verbose_name='واحد پول')),
+                ('successful_count', models.PositiveIntegerField(default=0, verbose_name='تعداد موفق')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='تعداد ناموفق')),
+                ('pending_count', models.PositiveIntegerField(default=0, verbose_name='تعداد در انتظار')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='درآمد (تراکنش\u200cهای موفق)')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'درآمد روزانه',
+                'verbose_name_plural': 'درآمد روزانه',
+                'ordering': ['date', 'source', 'plan_id', 'currency'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySubscribers',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='روز')),
+                ('active_subscribers', models.PositiveIntegerField(default=0, verbose_name='مشترکین فعال')),
+                ('new_subscriptions', models.PositiveIntegerField(default=0, verbose_name='خرید/تمدید موفق')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')),
+            ],
+            options={
+                'verbose_name': 'مشترکین روزانه',
+                'verbose_name_plural': 'مشترکین روزانه',
+                'ordering': ['date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupDirtyDay',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False, verbose_name='روز')),
+                ('marked_at', models.DateTimeField(auto_now=True, verbose_name='زمان علامت\u200cگذاری')),
+            ],
+            options={
+                'verbose_name': 'روز نیازمند بازمحاسبه',
+                'verbose_name_plural': 'روزهای نیازمند بازمحاسبه',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='subscriptionentitlement',
+            index=models.Index(fields=['end_date'], name='payment_sub_end_dat_a03d13_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailyrevenue',
+            name='plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='payment.subscriptionplan', verbose_name='پلن'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrevenue',
+            index=models.Index(fields=['date', 'source'], name='payment_dai_date_73fb70_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0005_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscriptionentitlement',
+            name='expired_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='تاریخ ثبت انقضا'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_unconfirmed_trans_ids(apps, schema_editor):
+    # trans_id تراکنش‌های pending از callback آمده و تایید نشده است
+    Transaction = apps.get_model('payment', 'Transaction')
+    PaymentCallback = apps.get_model('payment', 'PaymentCallback')
+    pending = Transaction.objects.filter(status='pending', trans_id__isnull=False)
+    PaymentCallback.objects.bulk_create([
+        PaymentCallback(transaction_id=pk, trans_id=trans_id)
+        for pk, trans_id in pending.values_list('pk', 'trans_id').iterator()
+    ], batch_size=1000)
+    pending.update(trans_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0006_entitlement_expired_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentCallback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trans_id', models.CharField(max_length=100, verbose_name='شناسه تراکنش')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ دریافت')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='callbacks', to='payment.transaction', verbose_name='تراکنش')),
+            ],
+            options={
+                'verbose_name': 'callback تاییدنشده',
+                'verbose_name_plural': 'callback های تاییدنشده',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentcallback',
+            constraint=models.UniqueConstraint(fields=('transaction', 'trans_id'), name='unique_payment_callback'),
+        ),
+        migrations.RunPython(move_unconfirmed_trans_ids, migrations.RunPython.noop),
+    ]
@@ -22,6 +22,7 @@ class Transaction(models.Model):
         max_length=100,
         null=True,
         blank=True,
+        db_index=True,
         verbose_name='شناسه تراکنش'
     )
     amount = models.IntegerField(verbose_name='مبلغ')
@@ -36,6 +37,7 @@ class Transaction(models.Model):
         max_length=100,
         null=True,
         blank=True,
+        db_index=True,
         verbose_name='شماره فاکتور'
     )
     status = models.CharField(
@@ -54,6 +56,7 @@ class Transaction(models.Model):
         indexes = [
             models.Index(fields=['status', 'created_at']),
             models.Index(fields=['user']),
+            models.Index(fields=['created_at']),
         ]
         ordering = ['-created_at']
     
@@ -61,6 +64,32 @@ class Transaction(models.Model):
         return f"{self.user} - {self.amount} - {self.status}"
 
 
+class PaymentCallback(models.Model):
+    """
+    ``trans_id`` های دریافتی از callback که درگاه تاییدشان نکرده است.
+    endpoint عمومی است، پس این شناسه‌ها فقط نامزد وریفای در تطبیق هستند و
+    تا تایید درگاه روی ``Transaction.trans_id`` نوشته نمی‌شوند.
+    """
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='callbacks',
+        verbose_name='تراکنش'
+    )
+    trans_id = models.CharField(max_length=100, verbose_name='شناسه تراکنش')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ دریافت')
+    
+    class Meta:
+        verbose_name = 'callback تاییدنشده'
+        verbose_name_plural = 'callback های تاییدنشده'
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'trans_id'], name='unique_payment_callback'),
+        ]
+    
+    def __str__(self):
+        return f"{self.transaction_id} - {self.trans_id}"
+
+
 class SubscriptionPlan(models.Model):
     """پلن‌های اشتراک"""
     name = models.CharField(max_length=100, verbose_name='نام پلن')
@@ -105,6 +134,7 @@ class Subscription(models.Model):
         verbose_name_plural = 'اشتراک‌ها'
         indexes = [
             models.Index(fields=['user', 'end_date']),
+            models.Index(fields=['created_at']),
         ]
         ordering = ['-created_at']
     
@@ -117,6 +147,55 @@ class Subscription(models.Model):
         return f"{self.user} - {self.plan.name}"
 
 
+class SubscriptionEntitlement(models.Model):
+    """
+    خلاصه اشتراک هر کاربر: اشتراکی که دیرتر از همه تمام می‌شود.
+
+    با سیگنال‌های ``Subscription`` به‌روز نگه داشته می‌شود (``entitlements.py``)
+    تا پاسخ «کاربر تا کی اشتراک دارد» با یک lookup روی کلید اصلی (یا از کش)
+    به دست آید، بدون کوئری بازه‌ای روی جدول اشتراک‌ها.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='subscription_entitlement',
+        verbose_name='کاربر'
+    )
+    subscription = models.ForeignKey(
+        Subscription,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='اشتراک'
+    )
+    plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.PROTECT,
+        related_name='+',
+        verbose_name='پلن'
+    )
+    end_date = models.DateTimeField(verbose_name='تاریخ پایان')
+    # توسط زمان‌بند انقضا (``expiry.py``) ثبت و با خرید/تمدید پاک می‌شود
+    expired_at = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ ثبت انقضا')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+    
+    class Meta:
+        verbose_name = 'وضعیت اشتراک کاربر'
+        verbose_name_plural = 'وضعیت اشتراک کاربران'
+        indexes = [
+            models.Index(fields=['end_date']),
+        ]
+    
+    @property
+    def is_active(self):
+        return self.end_date >= timezone.now()
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.end_date}"
+
+
 class SubscriptionTransaction(models.Model):
     """تراکنش‌های اشتراک"""
     STATUS_CHOICES = [
@@ -158,8 +237,95 @@ class SubscriptionTransaction(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['created_at']),
         ]
         ordering = ['-created_at']
     
     def __str__(self):
         return f"{self.user} - {self.plan.name} - {self.status}"
+
+
+class JobCheckpoint(models.Model):
+    """نقطه ادامه کارهای دسته‌ای (برای ادامه پس از توقف)"""
+    name = models.CharField(max_length=100, unique=True, verbose_name='نام کار')
+    cursor = models.JSONField(null=True, blank=True, verbose_name='موقعیت')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+    
+    class Meta:
+        verbose_name = 'نقطه ادامه کار'
+        verbose_name_plural = 'نقاط ادامه کارها'
+    
+    def __str__(self):
+        return self.name
+
+
+class DailyRevenue(models.Model):
+    """
+    جمع روزانه تراکنش‌ها به ازای منبع، پلن و واحد پول (``analytics.py``)
+
+    ردیف‌های هر روز با هر تغییر تراکنش‌های آن روز دوباره از روی همان روز
+    محاسبه می‌شوند؛ داشبوردها به جای جدول تراکنش‌ها از این جدول می‌خوانند.
+    """
+    SOURCE_PAYMENT = 'payment'
+    SOURCE_SUBSCRIPTION = 'subscription'
+    SOURCE_CHOICES = [
+        (SOURCE_PAYMENT, 'پرداخت درگاه'),
+        (SOURCE_SUBSCRIPTION, 'اشتراک'),
+    ]
+    
+    date = models.DateField(verbose_name='روز')
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES, verbose_name='منبع')
+    plan = models.ForeignKey(
+        SubscriptionPlan,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='پلن'
+    )
+    currency = models.CharField(max_length=10, verbose_name='واحد پول')
+    successful_count = models.PositiveIntegerField(default=0, verbose_name='تعداد موفق')
+    failed_count = models.PositiveIntegerField(default=0, verbose_name='تعداد ناموفق')
+    pending_count = models.PositiveIntegerField(default=0, verbose_name='تعداد در انتظار')
+    revenue = models.BigIntegerField(default=0, verbose_name='درآمد (تراکنش‌های موفق)')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+    
+    class Meta:
+        verbose_name = 'درآمد روزانه'
+        verbose_name_plural = 'درآمد روزانه'
+        indexes = [
+            models.Index(fields=['date', 'source']),
+        ]
+        ordering = ['date', 'source', 'plan_id', 'currency']
+    
+    def __str__(self):
+        return f"{self.date} - {self.source} - {self.revenue} {self.currency}"
+
+
+class DailySubscribers(models.Model):
+    """تعداد مشترکین فعال در پایان هر روز (snapshot آخرین اجرای همان روز)"""
+    date = models.DateField(primary_key=True, verbose_name='روز')
+    active_subscribers = models.PositiveIntegerField(default=0, verbose_name='مشترکین فعال')
+    new_subscriptions = models.PositiveIntegerField(default=0, verbose_name='خرید/تمدید موفق')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروزرسانی')
+    
+    class Meta:
+        verbose_name = 'مشترکین روزانه'
+        verbose_name_plural = 'مشترکین روزانه'
+        ordering = ['date']
+    
+    def __str__(self):
+        return f"{self.date} - {self.active_subscribers}"
+
+
+class RollupDirtyDay(models.Model):
+    """روزهایی که تراکنش‌هایشان تغییر کرده و باید دوباره جمع زده شوند"""
+    date = models.DateField(primary_key=True, verbose_name='روز')
+    marked_at = models.DateTimeField(auto_now=True, verbose_name='زمان علامت‌گذاری')
+    
+    class Meta:
+        verbose_name = 'روز نیازمند بازمحاسبه'
+        verbose_name_plural = 'روزهای نیازمند بازمحاسبه'
+    
+    def __str__(self):
+        return str(self.date)
@@ -0,0 +1,12 @@
+from rest_framework.permissions import BasePermission
+
+from .entitlements import active_until
+
+
+class HasActiveSubscription(BasePermission):
+    """دسترسی فقط برای کاربران دارای اشتراک فعال (بدون کوئری بازه‌ای)"""
+    message = 'برای استفاده از این سرویس اشتراک فعال لازم است'
+    
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and active_until(user.pk) is not None)
@@ -0,0 +1,172 @@
+"""
+تطبیق دسته‌ای تراکنش‌های pending با BitPay
+
+تراکنش‌هایی که کاربر هرگز به callback برنگشته برای همیشه pending می‌مانند.
+این ماژول آن‌ها را به ترتیب ``(created_at, id)`` و با صفحه‌بندی keyset روی
+ایندکس ``(status, created_at)`` می‌خواند و ``trans_id`` های تاییدنشده هر
+chunk را با همزمانی محدود در درگاه وریفای می‌کند. پس از هر chunk موقعیت در
+``JobCheckpoint`` ذخیره می‌شود تا اجرای بعدی از همان‌جا ادامه دهد.
+
+وریفای BitPay به ``trans_id`` نیاز دارد که فقط در callback دریافت می‌شود.
+``verification.py`` هر ``trans_id`` ای را که درگاه تاییدش نکرده یا به آن پاسخ
+نداده (خطای درگاه، circuit breaker باز) در ``PaymentCallback`` نگه می‌دارد؛
+تراکنش‌های بدون آن خوانده نمی‌شوند. endpoint callback عمومی است و این
+شناسه‌ها ممکن است جعلی باشند، پس:
+
+* پاسخ موفق درگاه با یک UPDATE شرطی (``status='pending'``) برای هر ردیف ثبت
+  می‌شود و موفقیتی را که همزمان از callback ثبت شده بازنویسی نمی‌کند؛
+* پاسخ ناموفق فقط همان نامزد را حذف می‌کند و تراکنش را ناموفق نمی‌کند.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+import requests
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bitpay
+from .analytics import mark_dirty_for
+from .models import Transaction, PaymentCallback, JobCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'reconcile_pending_transactions'
+
+
+@dataclass
+class ReconcileStats:
+    scanned: int = 0
+    verified: int = 0
+    rejected: int = 0
+    skipped: int = 0
+    errors: int = 0
+    chunks: int = 0
+    started: float = field(default_factory=time.monotonic)
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rate(self):
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            'scanned': self.scanned, 'verified': self.verified, 'rejected': self.rejected,
+            'skipped': self.skipped, 'errors': self.errors,
+            'chunks': self.chunks, 'elapsed': round(self.elapsed, 2), 'rows_per_sec': round(self.rate, 1),
+        }
+
+
+def load_checkpoint():
+    checkpoint = JobCheckpoint.objects.filter(name=CHECKPOINT_NAME).values_list('cursor', flat=True).first()
+    if not checkpoint:
+        return None
+    return parse_datetime(checkpoint['created_at']), checkpoint['id']
+
+
+def save_checkpoint(cursor):
+    value = None if cursor is None else {'created_at': cursor[0].isoformat(), 'id': cursor[1]}
+    JobCheckpoint.objects.update_or_create(name=CHECKPOINT_NAME, defaults={'cursor': value})
+
+
+def iter_pending_chunks(cutoff, chunk_size, after=None):
+    """chunk های تراکنش‌های pending دارای callback تاییدنشده، قدیمی‌تر از ``cutoff`` به ترتیب keyset"""
+    base = Transaction.objects.filter(
+        Exists(PaymentCallback.objects.filter(transaction=OuterRef('pk'))),
+        status='pending', created_at__lt=cutoff,
+    ).only(
+        'id', 'card_num', 'created_at'
+    ).order_by('created_at', 'id')
+    while True:
+        queryset = base
+        if after is not None:
+            queryset = queryset.filter(
+                Q(created_at__gt=after[0]) | Q(created_at=after[0], id__gt=after[1])
+            )
+        chunk = list(queryset[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        after = (chunk[-1].created_at, chunk[-1].id)
+
+
+def _verify(item):
+    trans, callback = item
+    try:
+        return trans, callback, bitpay.get_client().verify(callback.trans_id, trans.card_num), None
+    except requests.RequestException as e:
+        return trans, callback, None, e
+
+
+def reconcile_chunk(chunk, pool, stats):
+    now = timezone.now()
+    by_id = {trans.id: trans for trans in chunk}
+    callbacks = PaymentCallback.objects.filter(transaction_id__in=list(by_id)).order_by('id')
+    items = [(by_id[callback.transaction_id], callback) for callback in callbacks]
+
+    confirmed, rejected = {}, []
+    for trans, callback, result, error in pool.map(_verify, items):
+        if error is not None:
+            stats.errors += 1
+        elif result.get('status') in (1, 11):
+            confirmed.setdefault(trans.id, (trans, callback.trans_id, result))
+        else:
+            # فقط همین نامزد رد شده است؛ شاید callback جعلی بوده باشد
+            rejected.append(callback.id)
+            stats.rejected += 1
+
+    if confirmed or rejected:
+        with transaction.atomic():
+            changed = []
+            for trans, trans_id, result in confirmed.values():
+                # ردیفی که در این فاصله از طریق callback نهایی شده دست نمی‌خورد
+                updated = Transaction.objects.filter(pk=trans.pk, status='pending').update(
+                    status='successful', trans_id=trans_id,
+                    factor_id=result.get('factorId', trans_id), updated_at=now,
+                )
+                if updated:
+                    changed.append(trans)
+                    stats.verified += 1
+                else:
+                    stats.skipped += 1
+            PaymentCallback.objects.filter(
+                Q(id__in=rejected) | Q(transaction_id__in=list(confirmed))
+            ).delete()
+            mark_dirty_for(*(trans.created_at for trans in changed))
+    stats.scanned += len(chunk)
+    stats.chunks += 1
+
+
+def reconcile_pending(older_than=timedelta(minutes=30), chunk_size=1000, concurrency=16,
+                      resume=True, limit=None, progress=None):
+    """
+    یک دور کامل تطبیق. با ``resume`` از آخرین checkpoint ادامه می‌دهد و در
+    پایان دور checkpoint را پاک می‌کند. ``progress(stats)`` پس از هر chunk
+    فراخوانی می‌شود.
+    """
+    stats = ReconcileStats()
+    cutoff = timezone.now() - older_than
+    after = load_checkpoint() if resume else None
+    finished = True
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for chunk in iter_pending_chunks(cutoff, chunk_size, after):
+            reconcile_chunk(chunk, pool, stats)
+            save_checkpoint((chunk[-1].created_at, chunk[-1].id))
+            logger.info('تطبیق تراکنش‌ها: %s', stats.as_dict())
+            if progress:
+                progress(stats)
+            if limit is not None and stats.scanned >= limit:
+                finished = False
+                break
+
+    if finished:
+        save_checkpoint(None)
+    return stats
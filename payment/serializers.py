@@ -1,5 +1,10 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Transaction, SubscriptionPlan, Subscription, SubscriptionTransaction
+
+from core.serializers import CompiledSerializer
+from .models import Transaction, SubscriptionPlan, Subscription, SubscriptionTransaction, DailyRevenue, DailySubscribers
 
 
 class TransactionSerializer(serializers.ModelSerializer):
@@ -25,11 +30,16 @@ class SubscriptionPlanSerializer(serializers.ModelSerializer):
 class SubscriptionSerializer(serializers.ModelSerializer):
     """سریالایزر اشتراک"""
     plan = SubscriptionPlanSerializer(read_only=True)
-    is_active = serializers.BooleanField(read_only=True)
+    is_active = serializers.SerializerMethodField()
     
     class Meta:
         model = Subscription
         fields = ['id', 'plan', 'start_date', 'end_date', 'is_active', 'created_at']
+    
+    def get_is_active(self, obj) -> bool:
+        # زمان جاری یک بار در context (``now``) داده می‌شود، نه به ازای هر شیء
+        now = self.context.get('now') or timezone.now()
+        return obj.end_date >= now
 
 
 class SubscriptionTransactionSerializer(serializers.ModelSerializer):
@@ -45,6 +55,69 @@ class SubscriptionTransactionSerializer(serializers.ModelSerializer):
         ]
 
 
+class ExportSerializer(serializers.Serializer):
+    """سریالایزر پارامترهای خروجی تراکنش‌ها (``dataset`` در context)"""
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+    gzip = serializers.BooleanField(default=False)
+    status = serializers.CharField(required=False)
+    date_from = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+    date_to = serializers.DateTimeField(required=False, input_formats=['iso-8601', '%Y-%m-%d'])
+    plan = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        dataset = self.context['dataset']
+        if attrs.get('status') and attrs['status'] not in dataset.statuses:
+            raise serializers.ValidationError({'status': f'وضعیت باید یکی از {dataset.statuses} باشد'})
+        if attrs.get('plan') and not dataset.has_plan:
+            raise serializers.ValidationError({'plan': 'فیلتر پلن برای این خروجی پشتیبانی نمی‌شود'})
+        if attrs.get('date_from') and attrs.get('date_to') and attrs['date_from'] >= attrs['date_to']:
+            raise serializers.ValidationError({'date_to': 'date_to باید بعد از date_from باشد'})
+        return attrs
+
+
+class DailyRevenueSerializer(serializers.ModelSerializer):
+    """سریالایزر درآمد روزانه"""
+    class Meta:
+        model = DailyRevenue
+        fields = [
+            'date', 'source', 'plan_id', 'currency',
+            'successful_count', 'failed_count', 'pending_count', 'revenue'
+        ]
+
+
+class DailySubscribersSerializer(serializers.ModelSerializer):
+    """سریالایزر مشترکین روزانه"""
+    class Meta:
+        model = DailySubscribers
+        fields = ['date', 'active_subscribers', 'new_subscriptions']
+
+
+class AnalyticsQuerySerializer(serializers.Serializer):
+    """سریالایزر بازه و فیلترهای گزارش‌های روزانه"""
+    MAX_DAYS = 366
+    
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    source = serializers.ChoiceField(choices=DailyRevenue.SOURCE_CHOICES, required=False)
+    plan = serializers.IntegerField(required=False)
+    currency = serializers.CharField(max_length=10, required=False)
+    
+    def validate(self, attrs):
+        date_to = attrs.setdefault('date_to', timezone.localdate())
+        date_from = attrs.setdefault('date_from', date_to - timedelta(days=29))
+        if date_from > date_to:
+            raise serializers.ValidationError({'date_from': 'date_from نباید بعد از date_to باشد'})
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'date_from': f'بازه حداکثر {self.MAX_DAYS} روز است'})
+        return attrs
+
+
 class PurchaseSubscriptionSerializer(serializers.Serializer):
     """سریالایزر خرید اشتراک"""
     plan_id = serializers.IntegerField()
+
+
+# نسخه‌های کامپایل‌شده فقط‌خواندنی برای مسیرهای پرتکرار؛ خروجی یکسان با سریالایزرهای بالا
+transaction_reader = CompiledSerializer(TransactionSerializer)
+plan_reader = CompiledSerializer(SubscriptionPlanSerializer)
+subscription_reader = CompiledSerializer(SubscriptionSerializer)
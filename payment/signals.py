@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .analytics import mark_dirty_for
+from .catalogue import invalidate_catalogue
+from .entitlements import record_subscription, rebuild_entitlement
+from .models import SubscriptionPlan, Subscription, Transaction, SubscriptionTransaction
+
+
+@receiver([post_save, post_delete], sender=SubscriptionPlan)
+def invalidate_plan_catalogue(sender, **kwargs):
+    invalidate_catalogue()
+    # پس از commit دوباره، تا نسخه‌ای که پیش از commit از دیتابیس خوانده شده باقی نماند
+    transaction.on_commit(invalidate_catalogue)
+
+
+@receiver(post_save, sender=Subscription)
+def sync_entitlement_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    record_subscription(instance)
+
+
+@receiver(post_delete, sender=Subscription)
+def sync_entitlement_on_delete(sender, instance, origin=None, **kwargs):
+    if origin is not None and getattr(origin, 'model', type(origin)) is not Subscription:
+        # حذف آبشاری (مثلاً حذف کاربر)؛ entitlement هم همراه آن حذف می‌شود
+        return
+    rebuild_entitlement(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+@receiver([post_save, post_delete], sender=SubscriptionTransaction)
+def mark_rollup_day(sender, instance, raw=False, **kwargs):
+    # UPDATE های شرطی وریفای و bulk_update تطبیق خودشان روز را علامت می‌زنند؛ علامت پس از commit زده می‌شود
+    if raw:
+        return
+    mark_dirty_for(instance.created_at)
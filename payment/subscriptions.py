@@ -0,0 +1,85 @@
+"""
+تمدید اتمیک اشتراک
+
+تمدید اشتراک فعال با یک UPDATE انجام می‌شود:
+
+    UPDATE ... SET end_date = GREATEST(end_date, now) + interval
+
+که روی PostgreSQL قفل ردیف را می‌گیرد؛ خرید همزمان دوم منتظر می‌ماند و روی
+مقدار جدید اعمال می‌شود، پس هیچ تمدیدی گم نمی‌شود. روی SQLite اولین دستور
+تراکنش یک نوشتن است و قفل نوشتن دیتابیس همین نقش را دارد.
+
+اگر کاربر اشتراک فعالی نداشته باشد، ردیف کاربر قفل (``select_for_update``) و
+دوباره تلاش می‌شود؛ فقط در صورت نبود اشتراک فعال اشتراک جدید ساخته می‌شود.
+ردیف ``SubscriptionTransaction`` یک بار و در وضعیت نهایی نوشته می‌شود.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import DateTimeField, ExpressionWrapper, F, Subquery, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .entitlements import extend_entitlement
+from .models import Subscription, SubscriptionEntitlement, SubscriptionTransaction
+
+
+def _extend_active(user_id, interval, now):
+    """تمدید اشتراک فعال کاربر؛ اشتراک تمدیدشده یا None"""
+    current = SubscriptionEntitlement.objects.filter(user_id=user_id).values('subscription_id')
+    updated = Subscription.objects.filter(
+        pk__in=Subquery(current), end_date__gte=now
+    ).update(
+        end_date=ExpressionWrapper(
+            Greatest(F('end_date'), Value(now)) + interval, output_field=DateTimeField()
+        ),
+        updated_at=now,
+    )
+    if not updated:
+        return None
+    subscription = Subscription.objects.select_related('plan').get(pk__in=Subquery(current))
+    extend_entitlement(subscription)
+    return subscription
+
+
+def extend_subscription(user, plan, now=None):
+    """
+    خرید/تمدید اشتراک ``plan`` برای ``user``.
+
+    خروجی ``(subscription, sub_trans)``؛ اشتراک فعال با مدت پلن تمدید و در غیر
+    این صورت اشتراک جدیدی از ``now`` ساخته می‌شود.
+    """
+    now = now or timezone.now()
+    interval = timedelta(days=plan.duration_days)
+
+    with transaction.atomic():
+        subscription = _extend_active(user.pk, interval, now)
+        if subscription is None:
+            # خریدهای همزمان کاربری که اشتراک فعال ندارد پشت قفل ردیف کاربر سریال می‌شوند
+            list(get_user_model().objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+            subscription = _extend_active(user.pk, interval, now)
+
+        if subscription is None:
+            before_end_date = None
+            subscription = Subscription.objects.create(
+                user_id=user.pk,
+                plan=plan,
+                start_date=now,
+                end_date=now + interval
+            )
+        else:
+            # WHERE end_date >= now تضمین می‌کند GREATEST همان end_date قبلی بوده است
+            before_end_date = subscription.end_date - interval
+
+        sub_trans = SubscriptionTransaction.objects.create(
+            user_id=user.pk,
+            plan=plan,
+            amount=plan.price,
+            currency=plan.currency,
+            status='SUCCESS',
+            description=f'خرید اشتراک {plan.name}',
+            before_end_date=before_end_date,
+            after_end_date=subscription.end_date
+        )
+    return subscription, sub_trans
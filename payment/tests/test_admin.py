@@ -0,0 +1,115 @@
+from datetime import datetime
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from account.models import CustomUser
+from core.admin import EstimatedCountPaginator
+from payment.models import Transaction, SubscriptionPlan, SubscriptionTransaction
+
+
+class LargeTableAdminTestCase(TestCase):
+    """تست‌های changelist ادمین برای جدول‌های پرحجم"""
+
+    def setUp(self):
+        cache.clear()
+        admin = CustomUser.objects.create_superuser(phone_number='09120000000', password='admin-pass-123')
+        self.client.force_login(admin)
+        self.url = reverse('admin:payment_transaction_changelist')
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.other = CustomUser.objects.create_user(phone_number='09351112233', password='testpass123')
+        self.trans = Transaction.objects.create(
+            user=self.user, amount=10000, card_num='abc-123', trans_id='T-1', factor_id='F-1'
+        )
+        self.other_trans = Transaction.objects.create(user=self.other, amount=20000, card_num='xyz-789')
+
+    def _results(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return list(response.context['cl'].result_list)
+
+    def test_phone_prefix_search(self):
+        self.assertEqual(self._results(q='0912'), [self.trans])
+        self.assertEqual(self._results(q='۰۹۳۵'), [self.other_trans])
+        self.assertEqual(self._results(q='+98912345'), [self.trans])
+        # بخش میانی شماره با پیشوند جستجو نمی‌شود
+        self.assertEqual(self._results(q='3456789'), [])
+
+    def test_exact_search(self):
+        self.assertEqual(self._results(q='abc-123'), [self.trans])
+        self.assertEqual(self._results(q='F-1'), [self.trans])
+        self.assertEqual(self._results(q='abc'), [])
+
+    def test_uuid_search_ignores_invalid_terms(self):
+        plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        sub_trans = SubscriptionTransaction.objects.create(user=self.user, plan=plan, amount=50000)
+        url = reverse('admin:payment_subscriptiontransaction_changelist')
+
+        response = self.client.get(url, {'q': str(sub_trans.id)})
+        self.assertEqual(list(response.context['cl'].result_list), [sub_trans])
+        response = self.client.get(url, {'q': 'not-a-uuid'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_month_filter(self):
+        old = timezone.make_aware(datetime(2024, 1, 15))
+        Transaction.objects.filter(pk=self.other_trans.pk).update(created_at=old)
+
+        response = self.client.get(self.url)
+        choices = [choice['display'] for choice in response.context['cl'].filter_specs[1].choices(response.context['cl'])]
+        self.assertIn('2024-01', choices)
+        self.assertIn(timezone.localtime().strftime('%Y-%m'), choices)
+
+        self.assertEqual(self._results(created_at_month='2024-01'), [self.other_trans])
+        self.assertEqual(self._results(created_at_month='2024-02'), [])
+
+    def test_no_date_scans_and_cached_bounds(self):
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(self.url)
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(self.url)
+        sql = ' '.join(query['sql'] for query in cold.captured_queries)
+        for fragment in ('MIN(', 'MAX(', 'DISTINCT', 'django_datetime_trunc'):
+            self.assertNotIn(fragment, sql)
+        # حد پایین ماه‌ها فقط یک بار خوانده و کش می‌شود
+        self.assertEqual(len(warm.captured_queries), len(cold.captured_queries) - 1)
+
+
+class EstimatedCountPaginatorTestCase(TestCase):
+    def setUp(self):
+        user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        Transaction.objects.bulk_create([Transaction(user=user, amount=i) for i in range(5)])
+
+    def test_uses_estimate_for_unfiltered_lists(self):
+        with patch('core.admin.estimated_row_count', return_value=5_000_000):
+            paginator = EstimatedCountPaginator(Transaction.objects.all(), 100)
+            with self.assertNumQueries(0):
+                self.assertEqual(paginator.count, 5_000_000)
+
+            # فیلترشده: شمارش واقعی
+            paginator = EstimatedCountPaginator(Transaction.objects.filter(amount__lt=3), 100)
+            self.assertEqual(paginator.count, 3)
+
+    def test_small_or_unknown_tables_counted(self):
+        with patch('core.admin.estimated_row_count', return_value=50):
+            self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 100).count, 5)
+        self.assertEqual(EstimatedCountPaginator(Transaction.objects.all(), 100).count, 5)
+
+    def test_filtered_count_on_large_table_is_capped(self):
+        with patch('core.admin.estimated_row_count', return_value=5_000_000):
+            paginator = EstimatedCountPaginator(Transaction.objects.filter(amount__gte=0), 2)
+            paginator.count_cap = 3
+            self.assertEqual(paginator.count, 3)
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_exact_count_without_estimate(self):
+        # SQLite: بدون تخمین planner همه صفحه‌ها قابل دسترسی می‌مانند
+        paginator = EstimatedCountPaginator(Transaction.objects.all(), 2)
+        paginator.count_cap = 3
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 3)
@@ -0,0 +1,194 @@
+import io
+from datetime import date, datetime, timedelta
+from unittest.mock import patch, Mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser
+from payment.analytics import mark_dirty, rollup_day, rollup_pending_days, snapshot_subscribers
+from payment.models import (
+    Transaction, SubscriptionPlan, SubscriptionTransaction, Subscription,
+    DailyRevenue, DailySubscribers, RollupDirtyDay,
+)
+from payment.verification import verify_payment
+
+DAY = date(2026, 1, 10)
+
+
+def _at(day, hour=12):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()).replace(hour=hour))
+
+
+class AnalyticsRollupTestCase(TestCase):
+    """تست‌های جمع‌های روزانه درآمد و مشترکین"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.monthly = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        self.yearly = SubscriptionPlan.objects.create(name='سالانه', duration_days=365, price=500000)
+
+    def _transaction(self, day, amount, trans_status, **kwargs):
+        trans = Transaction.objects.create(user=self.user, amount=amount, status=trans_status, **kwargs)
+        Transaction.objects.filter(pk=trans.pk).update(created_at=_at(day))
+        return trans
+
+    def _sub_transaction(self, day, plan, sub_status='SUCCESS'):
+        sub_trans = SubscriptionTransaction.objects.create(
+            user=self.user, plan=plan, amount=plan.price, status=sub_status
+        )
+        SubscriptionTransaction.objects.filter(pk=sub_trans.pk).update(created_at=_at(day))
+        return sub_trans
+
+    def test_rollup_day(self):
+        self._transaction(DAY, 10000, 'successful')
+        self._transaction(DAY, 20000, 'successful')
+        self._transaction(DAY, 5000, 'failed')
+        self._transaction(DAY, 7000, 'pending')
+        self._transaction(DAY + timedelta(days=1), 99000, 'successful')
+        self._sub_transaction(DAY, self.monthly)
+        self._sub_transaction(DAY, self.monthly)
+        self._sub_transaction(DAY, self.yearly)
+        self._sub_transaction(DAY, self.yearly, 'FAILED')
+
+        rollup_day(DAY)
+
+        payment = DailyRevenue.objects.get(date=DAY, source=DailyRevenue.SOURCE_PAYMENT)
+        self.assertEqual(
+            (payment.successful_count, payment.failed_count, payment.pending_count, payment.revenue),
+            (2, 1, 1, 30000)
+        )
+        self.assertEqual(payment.currency, 'IRR')
+        monthly = DailyRevenue.objects.get(date=DAY, plan=self.monthly)
+        self.assertEqual((monthly.successful_count, monthly.revenue), (2, 100000))
+        yearly = DailyRevenue.objects.get(date=DAY, plan=self.yearly)
+        self.assertEqual((yearly.successful_count, yearly.failed_count, yearly.revenue), (1, 1, 500000))
+        self.assertEqual(DailySubscribers.objects.get(date=DAY).new_subscriptions, 3)
+
+        # بازمحاسبه جایگزین می‌کند، نه اضافه
+        rollup_day(DAY)
+        self.assertEqual(DailyRevenue.objects.filter(date=DAY).count(), 3)
+
+    def test_rollup_reads_only_that_day(self):
+        with CaptureQueriesContext(connection) as ctx:
+            rollup_day(DAY)
+        selects = [q['sql'] for q in ctx.captured_queries if 'SUM(' in q['sql']]
+        self.assertEqual(len(selects), 2)
+        for sql in selects:
+            self.assertIn('"created_at" >=', sql)
+            self.assertIn('"created_at" <', sql)
+
+    def test_writes_mark_day_dirty(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            trans = Transaction.objects.create(user=self.user, amount=10000)
+            today = timezone.localdate(trans.created_at)
+            # علامت پس از commit زده می‌شود، نه در تراکنش نویسنده
+            self.assertFalse(RollupDirtyDay.objects.filter(date=today).exists())
+        self.assertTrue(RollupDirtyDay.objects.filter(date=today).exists())
+
+        # روز علامت‌خورده فقط خوانده می‌شود
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            mark_dirty([today])
+
+        self.assertEqual(rollup_pending_days(), [today])
+        self.assertFalse(RollupDirtyDay.objects.exists())
+        self.assertEqual(DailyRevenue.objects.get(date=today).pending_count, 1)
+
+    def test_failed_rollup_keeps_day_dirty(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_dirty([DAY])
+
+        with patch('payment.analytics.rollup_day', side_effect=RuntimeError), self.assertRaises(RuntimeError):
+            rollup_pending_days()
+        self.assertTrue(RollupDirtyDay.objects.filter(date=DAY).exists())
+
+    @patch('payment.bitpay.requests.Session.post')
+    def test_verification_marks_day_dirty(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=Mock(return_value={'status': 1, 'factorId': 'F1'}))
+        trans = self._transaction(DAY, 10000, 'pending', card_num='id-1')
+        rollup_day(DAY)
+        RollupDirtyDay.objects.all().delete()
+        self.assertEqual(DailyRevenue.objects.get(date=DAY).pending_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            verify_payment('t1', 'id-1')
+
+        self.assertEqual(rollup_pending_days(), [DAY])
+        row = DailyRevenue.objects.get(date=DAY)
+        self.assertEqual((row.pending_count, row.successful_count, row.revenue), (0, 1, trans.amount))
+
+    def test_snapshot_subscribers(self):
+        now = timezone.now()
+        other = CustomUser.objects.create_user(phone_number='09351112233', password='testpass123')
+        Subscription.objects.create(user=self.user, plan=self.monthly, start_date=now, end_date=now + timedelta(days=30))
+        Subscription.objects.create(user=other, plan=self.monthly, start_date=now - timedelta(days=60),
+                                    end_date=now - timedelta(days=30))
+
+        self.assertEqual(snapshot_subscribers(now), 1)
+        self.assertEqual(DailySubscribers.objects.get(date=timezone.localdate(now)).active_subscribers, 1)
+
+    def test_command_backfill(self):
+        self._transaction(DAY, 10000, 'successful')
+        self._transaction(DAY + timedelta(days=2), 20000, 'successful')
+        RollupDirtyDay.objects.all().delete()
+        out = io.StringIO()
+
+        call_command('rollup_analytics', '--from', '2026-01-10', '--to', '2026-01-12', stdout=out)
+
+        self.assertIn('3 روز بازسازی شد', out.getvalue())
+        self.assertEqual(
+            list(DailyRevenue.objects.values_list('date', 'revenue')),
+            [(DAY, 10000), (DAY + timedelta(days=2), 20000)]
+        )
+
+
+class AnalyticsAPITestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        staff = CustomUser.objects.create_user(phone_number='09120000000', password='testpass123')
+        staff.is_active = staff.is_staff = True
+        staff.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(staff).access_token}')
+        self.url = reverse('payment:analytics')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        DailyRevenue.objects.create(date=DAY, source='payment', currency='IRR', successful_count=2, revenue=30000)
+        DailyRevenue.objects.create(date=DAY + timedelta(days=1), source='payment', currency='IRR',
+                                    successful_count=1, failed_count=1, revenue=10000)
+        DailyRevenue.objects.create(date=DAY, source='subscription', plan=self.plan, currency='IRR',
+                                    successful_count=1, revenue=50000)
+        DailySubscribers.objects.create(date=DAY, active_subscribers=7, new_subscriptions=1)
+
+    def test_report(self):
+        response = self.client.get(self.url, {'date_from': '2026-01-01', 'date_to': '2026-01-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['revenue']), 3)
+        self.assertEqual(response.data['subscribers'][0]['active_subscribers'], 7)
+        totals = {row['source']: row for row in response.data['totals']}
+        self.assertEqual(totals['payment']['revenue'], 40000)
+        self.assertEqual(totals['payment']['failed_count'], 1)
+        self.assertEqual(totals['subscription']['revenue'], 50000)
+
+    def test_filters(self):
+        response = self.client.get(self.url, {'date_from': '2026-01-01', 'date_to': '2026-01-31', 'plan': self.plan.id})
+        self.assertEqual([row['source'] for row in response.data['revenue']], ['subscription'])
+        response = self.client.get(self.url, {'date_from': '2026-01-11', 'date_to': '2026-01-31', 'source': 'payment'})
+        self.assertEqual(response.data['totals'][0]['revenue'], 10000)
+
+    def test_invalid_range(self):
+        response = self.client.get(self.url, {'date_from': '2026-02-01', 'date_to': '2026-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'date_from': '2024-01-01', 'date_to': '2026-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_staff_only(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,70 @@
+from unittest.mock import patch, AsyncMock
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from account.models import CustomUser
+from payment.models import Transaction
+
+
+class AsyncBitPayTestCase(TestCase):
+    """تست‌های endpoint های async پرداخت"""
+    
+    def setUp(self):
+        self.client = AsyncClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', is_active=True)
+        self.auth = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+    
+    @patch('payment.bitpay.asend', new_callable=AsyncMock)
+    async def test_create_transaction_success(self, mock_send):
+        mock_send.return_value = {'status': 1, 'id_get': 'async_id_get'}
+        
+        response = await self.client.post(
+            reverse('payment_async:create-transaction'), {'amount': 10000},
+            content_type='application/json', headers={'Authorization': self.auth}
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['id_get'], 'async_id_get')
+        trans = await Transaction.objects.aget(card_num='async_id_get')
+        self.assertEqual(trans.status, 'pending')
+        self.assertEqual(trans.user_id, self.user.id)
+    
+    async def test_create_transaction_requires_authentication(self):
+        response = await self.client.post(
+            reverse('payment_async:create-transaction'), {'amount': 10000}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    @patch('payment.bitpay.averify', new_callable=AsyncMock)
+    async def test_verify_payment_success(self, mock_verify):
+        await Transaction.objects.acreate(
+            user=self.user, amount=10000, card_num='async_verify', status='pending'
+        )
+        mock_verify.return_value = {'status': 1, 'factorId': 'factor_1'}
+        
+        response = await self.client.post(
+            reverse('payment_async:verify-payment'), {'trans_id': 't1', 'id_get': 'async_verify'},
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trans = await Transaction.objects.aget(card_num='async_verify')
+        self.assertEqual(trans.status, 'successful')
+        self.assertEqual(trans.factor_id, 'factor_1')
+    
+    @patch('payment.bitpay.averify', new_callable=AsyncMock)
+    async def test_verify_payment_failed(self, mock_verify):
+        await Transaction.objects.acreate(
+            user=self.user, amount=10000, card_num='async_fail', status='pending'
+        )
+        mock_verify.return_value = {'status': 0, 'message': 'Payment failed'}
+        
+        response = await self.client.post(
+            reverse('payment_async:verify-payment'), {'trans_id': 't2', 'id_get': 'async_fail'},
+            content_type='application/json'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        trans = await Transaction.objects.aget(card_num='async_fail')
+        self.assertEqual(trans.status, 'pending')
@@ -1,4 +1,5 @@
 from unittest.mock import patch, Mock
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
@@ -11,6 +12,7 @@ class BitPayIntegrationTestCase(TestCase):
     """تست‌های یکپارچگی BitPay"""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = CustomUser.objects.create_user(
             phone_number='09123456789',
@@ -20,7 +22,7 @@ class BitPayIntegrationTestCase(TestCase):
         self.user.save()
         self.client.force_authenticate(user=self.user)
     
-    @patch('payment.views.requests.post')
+    @patch('payment.bitpay.requests.Session.post')
     def test_create_transaction_success(self, mock_post):
         """تست ایجاد تراکنش موفق"""
         # Mock BitPay send response
@@ -48,7 +50,7 @@ class BitPayIntegrationTestCase(TestCase):
         self.assertEqual(transaction.amount, 10000)
         self.assertEqual(transaction.status, 'pending')
     
-    @patch('payment.views.requests.post')
+    @patch('payment.bitpay.requests.Session.post')
     def test_create_transaction_failed(self, mock_post):
         """تست ایجاد تراکنش ناموفق"""
         # Mock BitPay send response with error
@@ -68,7 +70,7 @@ class BitPayIntegrationTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('error', response.data)
     
-    @patch('payment.views.requests.post')
+    @patch('payment.bitpay.requests.Session.post')
     def test_verify_payment_success(self, mock_post):
         """تست وریفای موفق پرداخت"""
         # ایجاد تراکنش pending
@@ -107,7 +109,7 @@ class BitPayIntegrationTestCase(TestCase):
         self.assertEqual(transaction.trans_id, 'trans_789')
         self.assertEqual(transaction.factor_id, 'factor_123')
     
-    @patch('payment.views.requests.post')
+    @patch('payment.bitpay.requests.Session.post')
     def test_verify_payment_already_verified(self, mock_post):
         """تست وریفای تراکنش قبلاً تایید شده"""
         transaction = Transaction.objects.create(
@@ -138,7 +140,7 @@ class BitPayIntegrationTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('Transaction verified in the past', response.data['message'])
     
-    @patch('payment.views.requests.post')
+    @patch('payment.bitpay.requests.Session.post')
     def test_verify_payment_failed(self, mock_post):
         """تست وریفای ناموفق پرداخت"""
         transaction = Transaction.objects.create(
@@ -168,9 +170,9 @@ class BitPayIntegrationTestCase(TestCase):
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         
-        # بررسی بروزرسانی وضعیت
+        # پاسخ ناموفق تراکنش را نهایی نمی‌کند (verification.py)
         transaction.refresh_from_db()
-        self.assertEqual(transaction.status, 'failed')
+        self.assertEqual(transaction.status, 'pending')
     
     def test_verify_payment_missing_params(self):
         """تست وریفای با پارامترهای ناقص"""
@@ -192,7 +194,7 @@ class BitPayIntegrationTestCase(TestCase):
         
         self.client.force_authenticate(user=None)
         
-        with patch('payment.views.requests.post') as mock_post:
+        with patch('payment.bitpay.requests.Session.post') as mock_post:
             mock_response = Mock()
             mock_response.status_code = 200
             mock_response.json.return_value = {'status': 1}
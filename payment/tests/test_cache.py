@@ -0,0 +1,96 @@
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+
+from core.cache import CACHE_REQUESTS, CacheNamespace, TieredCache
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    """تست‌های کش دو لایه (L1 درون‌پردازه‌ای + L2 مشترک)"""
+
+    def setUp(self):
+        cache.clear()
+        self.shared = caches['shared']
+
+    def test_local_keys_served_from_l1(self):
+        cache.set('payment:plans:x', [1, 2])
+        self.shared.clear()  # another worker's view of L2 no longer matters
+
+        hits = CACHE_REQUESTS.value('default', 'l1', 'hit')
+        self.assertEqual(cache.get('payment:plans:x'), [1, 2])
+        self.assertEqual(CACHE_REQUESTS.value('default', 'l1', 'hit'), hits + 1)
+
+        # L1 copies live at most LOCAL_TIMEOUT seconds
+        with patch('core.cache.time.time', return_value=time.time() + 60):
+            self.assertIsNone(cache.get('payment:plans:x'))
+
+    def test_other_keys_always_read_l2(self):
+        cache.set('otp:09123456789', {'code': 1})
+        self.shared.clear()
+        self.assertIsNone(cache.get('otp:09123456789'))
+
+    def test_l1_is_filled_from_l2(self):
+        self.shared.set('payment:plans:y', 'value')
+        self.assertEqual(cache.get('payment:plans:y'), 'value')
+        self.shared.delete('payment:plans:y')
+        self.assertEqual(cache.get('payment:plans:y'), 'value')
+
+    def test_l1_values_are_copies(self):
+        cache.set('payment:plans:z', {'a': 1})
+        cache.get('payment:plans:z')['a'] = 2
+        self.assertEqual(cache.get('payment:plans:z'), {'a': 1})
+
+    def test_delete_and_many(self):
+        cache.set_many({'payment:plans:a': 1, 'payment:entitlement:1': 2})
+        self.assertEqual(cache.get_many(['payment:plans:a', 'payment:entitlement:1', 'missing']), {
+            'payment:plans:a': 1, 'payment:entitlement:1': 2,
+        })
+        cache.delete('payment:plans:a')
+        self.assertIsNone(cache.get('payment:plans:a'))
+        self.assertFalse(cache.add('payment:entitlement:1', 3))
+        self.assertEqual(cache.incr('payment:entitlement:1'), 3)
+
+    def test_l1_is_bounded(self):
+        tiered = TieredCache('', {'OPTIONS': {'LOCAL_MAX_ENTRIES': 2, 'LOCAL_KEYS': ('k',)}})
+        for key in ('k1', 'k2', 'k3'):
+            tiered.set(key, key)
+        self.assertEqual(len(tiered._local), 2)
+        self.assertEqual(tiered.get('k1'), 'k1')  # still in L2
+
+
+class CacheNamespaceTestCase(SimpleTestCase):
+    """تست‌های فضای نام نسخه‌دار و محافظت در برابر stampede"""
+
+    def setUp(self):
+        cache.clear()
+        self.ns = CacheNamespace('payment')
+
+    def test_keys_are_prefixed_and_versioned(self):
+        self.ns.set('entitlement:1', 'old')
+        self.assertEqual(cache.get('payment:entitlement:1', version=1), 'old')
+        self.assertEqual(self.ns.get_many(['entitlement:1']), {'entitlement:1': 'old'})
+
+        with override_settings(CACHE_NAMESPACE_VERSIONS={'payment': 2}):
+            self.assertIsNone(self.ns.get('entitlement:1'))
+
+    def test_get_or_compute_caches(self):
+        calls = []
+        compute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(self.ns.get_or_compute('report', compute, 60), 1)
+        self.assertEqual(self.ns.get_or_compute('report', compute, 60), 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_early_recompute_by_a_single_caller(self):
+        # took 10s to compute and expires in 1s: inside the early window
+        self.ns.set('report', ('v1', 10.0, time.time() + 1), 60)
+
+        with patch('core.cache.random.random', return_value=0.5):
+            self.ns.add('report:lock', 1, 10)
+            # somebody else holds the recompute lock: serve the current value
+            self.assertEqual(self.ns.get_or_compute('report', lambda: 'v2', 60), 'v1')
+
+            self.ns.delete('report:lock')
+            self.assertEqual(self.ns.get_or_compute('report', lambda: 'v2', 60), 'v2')
+        self.assertIsNone(self.ns.get('report:lock'))
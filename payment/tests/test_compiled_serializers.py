@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from account.models import CustomUser
+from account.serializers import ProfileSerializer, profile_reader
+from core.serializers import CompiledSerializer
+from payment.models import Transaction, Subscription, SubscriptionPlan
+from payment.serializers import (
+    TransactionSerializer, SubscriptionPlanSerializer, SubscriptionSerializer,
+    transaction_reader, plan_reader, subscription_reader,
+)
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class CompiledSerializerTestCase(TestCase):
+    """خروجی سریالایزرهای کامپایل‌شده باید بایت به بایت با DRF یکسان باشد"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000,
+                                                    description='توضیح')
+        self.inactive_plan = SubscriptionPlan.objects.create(name='قدیمی', duration_days=7, price=1000,
+                                                             is_active=False)
+        Subscription.objects.create(user=self.user, plan=self.plan, start_date=self.now,
+                                    end_date=self.now + timedelta(days=30))
+        Subscription.objects.create(user=self.user, plan=self.inactive_plan,
+                                    start_date=self.now - timedelta(days=60),
+                                    end_date=self.now - timedelta(days=30))
+        Transaction.objects.create(user=self.user, amount=10000)
+        Transaction.objects.create(user=self.user, amount=20000, card_num='id-1', factor_id='F1',
+                                   status='successful')
+
+    def assertSameOutput(self, reader, serializer_class, queryset, context=None):
+        context = context or {}
+        expected = render(serializer_class(queryset, many=True, context=context).data)
+        self.assertEqual(render(reader.serialize_many(queryset, context=context)), expected)
+        self.assertEqual(render(reader.serialize_rows(reader.values(queryset), context=context)), expected)
+        instance = queryset.first()
+        self.assertEqual(render(reader.serialize(instance, context=context)),
+                         render(serializer_class(instance, context=context).data))
+
+    def test_matches_drf_output(self):
+        self.assertSameOutput(transaction_reader, TransactionSerializer, Transaction.objects.order_by('id'))
+        self.assertSameOutput(plan_reader, SubscriptionPlanSerializer, SubscriptionPlan.objects.all())
+        self.assertSameOutput(subscription_reader, SubscriptionSerializer,
+                              Subscription.objects.select_related('plan').order_by('id'), {'now': self.now})
+        self.user.email = 'user@example.com'
+        self.user.save()
+        self.assertSameOutput(profile_reader, ProfileSerializer, CustomUser.objects.all())
+
+    def test_current_timezone(self):
+        queryset = Subscription.objects.select_related('plan').order_by('id')
+        self.assertIn('+03:30', subscription_reader.serialize(queryset.first())['start_date'])
+        with timezone.override('UTC'):
+            self.assertSameOutput(subscription_reader, SubscriptionSerializer, queryset, {'now': self.now})
+            self.assertTrue(subscription_reader.serialize(queryset.first())['start_date'].endswith('Z'))
+
+    def test_values_fields(self):
+        self.assertEqual(subscription_reader.values_fields, (
+            'id', 'plan', 'plan__id', 'plan__name', 'plan__duration_days', 'plan__price',
+            'plan__currency', 'plan__description', 'plan__is_active', 'start_date', 'end_date',
+            'created_at',
+        ))
+        # یک کوئری، بدون ساخت نمونه مدل
+        with self.assertNumQueries(1):
+            rows = subscription_reader.serialize_rows(subscription_reader.values(Subscription.objects.all()),
+                                                      context={'now': self.now})
+        self.assertEqual(sorted(row['is_active'] for row in rows), [False, True])
+
+    def test_unsupported_fields(self):
+        class PlanIdSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = Subscription
+                fields = ['id', 'plan']
+
+        class DottedSerializer(serializers.Serializer):
+            plan_name = serializers.CharField(source='plan.name')
+
+        for serializer_class in (PlanIdSerializer, DottedSerializer):
+            with self.assertRaises(ImproperlyConfigured):
+                CompiledSerializer(serializer_class)
+
+    def test_views(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        subscription = Subscription.objects.select_related('plan').get(plan=self.plan)
+
+        response = client.get(reverse('payment:user-subscription'))
+        self.assertEqual(response.content, render(SubscriptionSerializer(
+            subscription, context={'now': timezone.now()}
+        ).data))
+        response = client.get(reverse('profile'))
+        self.assertEqual(response.content, render(ProfileSerializer(self.user).data))
+        response = client.get(reverse('payment:subscription-plans'))
+        self.assertEqual(response.json()['results'], [SubscriptionPlanSerializer(self.plan).data])
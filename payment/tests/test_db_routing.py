@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import router
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser
+from core import db_router
+from payment.models import SubscriptionPlan
+
+
+class DatabaseRoutingTestCase(TestCase):
+    """
+    تست‌های مسیردهی primary/replica
+
+    replica واقعی در تست‌ها وجود ندارد؛ ``replica_alias`` به ``default``
+    اشاره داده می‌شود و alias صریحی که router برمی‌گرداند ثبت می‌شود.
+    """
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.user.is_active = True
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        
+        patcher = mock.patch('core.db_router.replica_alias', return_value='default')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        
+        self.routed = []
+        original = db_router.PrimaryReplicaRouter.db_for_read
+        
+        def record(router_self, model, **hints):
+            alias = original(router_self, model, **hints)
+            self.routed.append(alias)
+            return alias
+        
+        patcher = mock.patch.object(db_router.PrimaryReplicaRouter, 'db_for_read', autospec=True, side_effect=record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def test_read_only_endpoints_use_replica(self):
+        self.client.post(reverse('payment:purchase-subscription'), {'plan_id': self.plan.id})
+        cache.clear()
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        
+        for name in ('payment:user-subscription', 'profile'):
+            self.routed.clear()
+            self.client.get(reverse(name))
+            self.assertIn('default', self.routed, name)
+        # بدون نشت مسیردهی به بیرون از درخواست
+        self.assertIsNone(db_router.PrimaryReplicaRouter().db_for_read(SubscriptionPlan))
+    
+    def test_writes_are_not_routed(self):
+        response = self.client.post(reverse('payment:purchase-subscription'), {'plan_id': self.plan.id})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('default', self.routed)
+    
+    def test_sticky_after_purchase(self):
+        self.client.post(reverse('payment:purchase-subscription'), {'plan_id': self.plan.id})
+        self.assertTrue(db_router.is_pinned(self.user.pk))
+        
+        self.routed.clear()
+        response = self.client.get(reverse('payment:user-subscription'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('default', self.routed)
+    
+    def test_sticky_after_profile_update(self):
+        # احراز هویت با JWT تا خواندن کاربر هم از مسیر router عبور کند
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.client.patch(reverse('profile'), {'first_name': 'علی'})
+        
+        self.routed.clear()
+        response = self.client.get(reverse('profile'))
+        self.assertEqual(response.data['first_name'], 'علی')
+        # وضعیت احراز هویت همیشه از primary خوانده می‌شود و ردیف کاربر پس از
+        # بازنشانی مسیردهی، پس هیچ خواندنی به replica نمی‌رود
+        self.assertNotIn('default', self.routed)
+    
+    def test_pin_is_noop_without_replica(self):
+        with mock.patch('core.db_router.replica_alias', return_value=None):
+            db_router.pin_to_primary(self.user.pk)
+        self.assertFalse(db_router.is_pinned(self.user.pk))
+    
+    def test_routing_reset_on_error(self):
+        with mock.patch('payment.views.get_entitlement', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(reverse('payment:user-subscription'))
+        self.assertIsNone(db_router.PrimaryReplicaRouter().db_for_read(SubscriptionPlan))
+    
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(router.allow_migrate('default', 'payment'))
+        self.assertFalse(router.allow_migrate('replica', 'payment'))
@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from account.models import CustomUser
+from payment.entitlements import get_entitlement, active_until
+from payment.models import SubscriptionPlan, Subscription, SubscriptionEntitlement
+
+
+class EntitlementTestCase(TestCase):
+    """تست‌های وضعیت اشتراک کاربر (entitlement)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+    
+    def _subscribe(self, days):
+        now = timezone.now()
+        return Subscription.objects.create(
+            user=self.user, plan=self.plan, start_date=now, end_date=now + timedelta(days=days)
+        )
+    
+    def test_no_subscription(self):
+        self.assertIsNone(get_entitlement(self.user.id))
+        # کش منفی
+        with self.assertNumQueries(0):
+            self.assertIsNone(active_until(self.user.id))
+    
+    def test_tracks_latest_end_date(self):
+        short = self._subscribe(10)
+        long = self._subscribe(40)
+        middle = self._subscribe(20)
+        
+        entitlement = get_entitlement(self.user.id)
+        self.assertEqual(entitlement.subscription_id, long.id)
+        self.assertEqual(entitlement.end_date, long.end_date)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(active_until(self.user.id), long.end_date)
+        
+        # کوتاه شدن اشتراک فعلی
+        long.end_date = timezone.now() + timedelta(days=5)
+        long.save()
+        entitlement = get_entitlement(self.user.id)
+        self.assertEqual(entitlement.subscription_id, middle.id)
+        self.assertGreater(entitlement.end_date, short.end_date)
+    
+    def test_delete_rebuilds(self):
+        short = self._subscribe(10)
+        long = self._subscribe(40)
+        long.delete()
+        self.assertEqual(get_entitlement(self.user.id).subscription_id, short.id)
+        
+        Subscription.objects.filter(user=self.user).delete()
+        self.assertIsNone(get_entitlement(self.user.id))
+        self.assertFalse(SubscriptionEntitlement.objects.filter(user=self.user).exists())
+    
+    def test_expired_is_inactive(self):
+        now = timezone.now()
+        Subscription.objects.create(
+            user=self.user, plan=self.plan,
+            start_date=now - timedelta(days=40), end_date=now - timedelta(days=10)
+        )
+        self.assertIsNone(active_until(self.user.id))
+        response = self.client.get(reverse('payment:user-subscription'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_user_subscription_uses_entitlement(self):
+        subscription = self._subscribe(30)
+        url = reverse('payment:user-subscription')
+        self.client.get(url)
+        
+        # فقط خواندن اشتراک با کلید اصلی
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], subscription.id)
+        self.assertTrue(response.data['is_active'])
+    
+    def test_purchase_updates_entitlement(self):
+        url = reverse('payment:purchase-subscription')
+        self.client.post(url, {'plan_id': self.plan.id}, format='json')
+        first_end = active_until(self.user.id)
+        self.assertIsNotNone(first_end)
+        
+        self.client.post(url, {'plan_id': self.plan.id}, format='json')
+        self.assertEqual(active_until(self.user.id), first_end + timedelta(days=30))
+    
+    def test_user_delete_cascades(self):
+        self._subscribe(30)
+        user_id = self.user.id
+        self.user.delete()
+        self.assertFalse(SubscriptionEntitlement.objects.filter(user_id=user_id).exists())
@@ -0,0 +1,113 @@
+import io
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from account.models import CustomUser, SMSOutbox
+from payment.expiry import (
+    ExpiryStats, expire_batch, expire_subscriptions, load_checkpoint, subscriptions_expired,
+)
+from payment.models import Subscription, SubscriptionPlan, SubscriptionEntitlement
+from payment.subscriptions import extend_subscription
+
+
+@override_settings(
+    SUBSCRIPTION_EXPIRY_SMS_TEMPLATE='subscription-expired',
+    SMS_QUEUE_EAGER=True, SMS_PROVIDER='account.sms.FakeSMSProvider',
+)
+class SubscriptionExpiryTestCase(TestCase):
+    """تست‌های زمان‌بند انقضای اشتراک‌ها"""
+
+    def setUp(self):
+        self.now = timezone.now()
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        self.users = {}
+        for name, phone, ends_in in [
+            ('recent', '09120000001', timedelta(hours=-1)),
+            ('earlier', '09120000002', timedelta(hours=-2)),
+            ('active', '09120000003', timedelta(days=5)),
+            ('old', '09120000004', timedelta(days=-3)),
+        ]:
+            user = CustomUser.objects.create_user(phone_number=phone, password='testpass123')
+            Subscription.objects.create(
+                user=user, plan=self.plan,
+                start_date=self.now + ends_in - timedelta(days=30), end_date=self.now + ends_in
+            )
+            self.users[name] = user
+        # ردیف‌های ساخته‌شده با end_date گذشته از قبل منقضی ثبت شده‌اند
+        SubscriptionEntitlement.objects.update(expired_at=None)
+        self.received = []
+        subscriptions_expired.connect(self._receive)
+        self.addCleanup(subscriptions_expired.disconnect, self._receive)
+
+    def _receive(self, sender, user_ids, now, **kwargs):
+        self.received.append(user_ids)
+
+    def _expired(self):
+        return set(SubscriptionEntitlement.objects.filter(
+            expired_at__isnull=False
+        ).values_list('user__phone_number', flat=True))
+
+    def test_expires_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            stats = expire_subscriptions(batch_size=1, now=self.now)
+
+        self.assertEqual((stats.scanned, stats.expired, stats.batches), (2, 2, 2))
+        self.assertEqual(self._expired(), {'09120000001', '09120000002'})
+        # به ترتیب end_date
+        self.assertEqual(self.received, [[self.users['earlier'].id], [self.users['recent'].id]])
+        reminders = SMSOutbox.objects.filter(template='subscription-expired')
+        self.assertEqual(set(reminders.values_list('receptor', flat=True)), {'09120000001', '09120000002'})
+        self.assertEqual(load_checkpoint()[1], self.users['recent'].id)
+
+        # اجرای بعدی از checkpoint ادامه می‌دهد
+        stats = expire_subscriptions(now=self.now + timedelta(minutes=1))
+        self.assertEqual(stats.scanned, 0)
+
+    def test_renewal_clears_and_reexpires(self):
+        expire_subscriptions(now=self.now)
+        user = self.users['recent']
+
+        extend_subscription(user, self.plan, self.now)
+        entitlement = SubscriptionEntitlement.objects.get(user=user)
+        self.assertIsNone(entitlement.expired_at)
+
+        later = entitlement.end_date + timedelta(minutes=1)
+        stats = expire_subscriptions(now=later)
+        self.assertEqual(stats.expired, 2)
+        self.assertEqual(SubscriptionEntitlement.objects.get(user=user).expired_at, later)
+
+    def test_renewed_during_batch_is_skipped(self):
+        # batch قدیمی که کاربرش در این فاصله تمدید کرده
+        stats = ExpiryStats()
+        batch = [(self.users['active'].id, self.now - timedelta(minutes=5))]
+        expire_batch(batch, self.now, stats)
+
+        self.assertEqual((stats.expired, stats.skipped), (0, 1))
+        self.assertFalse(SMSOutbox.objects.exists())
+
+    def test_batch_query_count_is_constant(self):
+        for i in range(20):
+            user = CustomUser.objects.create_user(phone_number=f'0935000{i:04d}', password='testpass123')
+            Subscription.objects.create(user=user, plan=self.plan, start_date=self.now - timedelta(days=31),
+                                        end_date=self.now - timedelta(minutes=i + 1))
+        SubscriptionEntitlement.objects.update(expired_at=None)
+        # مستقل از تعداد ردیف‌های batch: checkpoint، SELECT batch، UPDATE، SELECT منقضی‌ها،
+        # یک INSERT پیامک‌ها (و یک UPDATE ارسال فوری آن‌ها با SMS_QUEUE_EAGER)، ذخیره checkpoint
+        # و SELECT خالی پایانی (به همراه savepoint ها)
+        with self.assertNumQueries(15):
+            stats = expire_subscriptions(batch_size=100, now=self.now)
+        self.assertEqual(stats.expired, 22)
+
+    def test_no_sms_and_lookback(self):
+        stats = expire_subscriptions(send_sms=False, initial_lookback=timedelta(days=7), now=self.now)
+        self.assertEqual(stats.expired, 3)
+        self.assertFalse(SMSOutbox.objects.exists())
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('expire_subscriptions', '--batch-size', '1', stdout=out)
+        self.assertIn('پایان دور انقضا', out.getvalue())
+        self.assertEqual(self._expired(), {'09120000001', '09120000002'})
@@ -0,0 +1,118 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser
+from payment.exports import DATASETS, iter_rows
+from payment.models import Transaction, SubscriptionPlan, SubscriptionTransaction
+
+
+def _at(day):
+    return timezone.make_aware(datetime(2026, 1, day, 12, 0))
+
+
+class ExportTestCase(TestCase):
+    """تست‌های خروجی جریانی تراکنش‌ها"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.staff = CustomUser.objects.create_user(phone_number='09120000000', password='testpass123')
+        self.staff.is_active = self.staff.is_staff = True
+        self.staff.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.staff).access_token}')
+
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        for day, trans_status in [(1, 'successful'), (2, 'failed'), (3, 'successful'), (4, 'pending')]:
+            trans = Transaction.objects.create(user=self.user, amount=day * 1000, card_num=f'id-{day}', status=trans_status)
+            Transaction.objects.filter(pk=trans.pk).update(created_at=_at(day))
+
+        self.monthly = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        self.yearly = SubscriptionPlan.objects.create(name='سالانه', duration_days=365, price=500000)
+        for plan in (self.monthly, self.yearly, self.monthly):
+            SubscriptionTransaction.objects.create(user=self.user, plan=plan, amount=plan.price, status='SUCCESS')
+
+    def _url(self, dataset='transactions'):
+        return reverse('payment:export', kwargs={'dataset': dataset})
+
+    def _body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="transactions-', response['Content-Disposition'])
+
+        rows = list(csv.reader(io.StringIO(self._body(response).decode('utf-8-sig'))))
+        self.assertEqual(rows[0], DATASETS['transactions'].headers)
+        self.assertEqual([row[5] for row in rows[1:]], ['id-1', 'id-2', 'id-3', 'id-4'])
+        self.assertEqual(rows[1][1], '09123456789')
+
+    def test_filters(self):
+        response = self.client.get(self._url(), {
+            'status': 'successful', 'date_from': '2026-01-02', 'date_to': '2026-01-04',
+        })
+        rows = list(csv.reader(io.StringIO(self._body(response).decode('utf-8-sig'))))
+        self.assertEqual([row[5] for row in rows[1:]], ['id-3'])
+
+    def test_ndjson_gzip_with_plan_filter(self):
+        response = self.client.get(self._url('subscription-transactions'), {
+            'file_format': 'ndjson', 'gzip': 'true', 'plan': self.monthly.id,
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertTrue(response['Content-Disposition'].endswith('.ndjson.gz"'))
+
+        lines = gzip.decompress(self._body(response)).decode().splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(len(records), 2)
+        self.assertEqual({record['plan'] for record in records}, {'ماهانه'})
+
+    def test_invalid_parameters(self):
+        response = self.client.get(self._url(), {'plan': self.monthly.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self._url(), {'status': 'SUCCESS'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self._url('users'))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_staff_only(self):
+        self.user.is_active = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        response = self.client.get(self._url())
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_keyset_pages(self):
+        # ردیف‌های هم‌زمان (created_at یکسان) نباید تکرار یا جا بیفتند
+        Transaction.objects.filter(card_num__in=['id-2', 'id-3']).update(created_at=_at(2))
+        rows = iter_rows(DATASETS['transactions'], page_size=2, chunk_size=2)
+
+        with self.assertNumQueries(1):
+            first = next(rows)
+        self.assertEqual(first[5], 'id-1')
+        with self.assertNumQueries(2):
+            rest = list(rows)
+        self.assertEqual([row[5] for row in rest], ['id-2', 'id-3', 'id-4'])
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'out.csv.gz')
+        err = io.StringIO()
+        call_command('export_transactions', 'transactions', '--gzip', '--status', 'successful',
+                     '-o', path, '--page-size', '1', stderr=err)
+        with gzip.open(path, 'rt', encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual([row[5] for row in rows[1:]], ['id-1', 'id-3'])
+        self.assertIn('2 ردیف', err.getvalue())
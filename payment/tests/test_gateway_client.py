@@ -0,0 +1,114 @@
+import asyncio
+import time
+from unittest.mock import patch, AsyncMock, Mock
+import requests
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from account.models import CustomUser
+from payment import bitpay
+from payment.bitpay import BitPayClient, CircuitBreaker, CircuitOpenError
+
+
+class CircuitBreakerTestCase(TestCase):
+    """تست‌های circuit breaker درگاه"""
+    
+    def test_opens_after_threshold_and_recovers(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+        breaker.before_call()
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        
+        # پس از reset_timeout یک فراخوانی آزمایشی مجاز است
+        with patch('payment.bitpay.time.monotonic', return_value=breaker.opened_at + 31):
+            breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.before_call()
+    
+    def test_lost_probe_is_retried(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+        breaker.record_failure()
+        with patch('payment.bitpay.time.monotonic', return_value=breaker.opened_at + 31):
+            breaker.before_call()
+        probe_started_at = breaker.probe_started_at
+        
+        # نتیجه فراخوانی آزمایشی هرگز ثبت نشد
+        with patch('payment.bitpay.time.monotonic', return_value=probe_started_at + 10):
+            with self.assertRaises(CircuitOpenError):
+                breaker.before_call()
+        with patch('payment.bitpay.time.monotonic', return_value=probe_started_at + 31):
+            breaker.before_call()
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+    
+    @override_settings(BITPAY_BREAKER_RESET_TIMEOUT=30)  # کلاینت جدا از بقیه تست‌ها
+    async def test_cancelled_probe_reopens(self):
+        client = bitpay.get_client()
+        client.breaker.state = CircuitBreaker.HALF_OPEN
+        client.breaker.probe_started_at = time.monotonic() - 31
+        
+        with patch.object(bitpay, 'get_async_client') as mock_get:
+            mock_get.return_value.post = AsyncMock(side_effect=asyncio.CancelledError)
+            with self.assertRaises(asyncio.CancelledError):
+                await bitpay._apost('verify', bitpay.verify_url(), {})
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+
+class BitPayClientTestCase(TestCase):
+    """تست‌های کلاینت BitPay"""
+    
+    def test_uses_split_timeouts_and_records_latency(self):
+        client = BitPayClient(connect_timeout=2, read_timeout=7)
+        response = Mock()
+        response.json.return_value = {'status': 1, 'id_get': 'abc'}
+        
+        with patch.object(client.session, 'post', return_value=response) as mock_post:
+            result = client.send(10000, 'http://localhost/verify/', 'order_1')
+        
+        self.assertEqual(result['id_get'], 'abc')
+        self.assertEqual(mock_post.call_args[1]['timeout'], (2, 7))
+        stats = client.stats.snapshot()
+        self.assertEqual(stats['send']['count'], 1)
+        self.assertEqual(stats['send']['errors'], 0)
+    
+    def test_connection_pool_is_shared(self):
+        client = BitPayClient(pool_size=7)
+        adapter = client.session.get_adapter('https://bitpay.ir/payment/gateway-send')
+        self.assertEqual(adapter._pool_maxsize, 7)
+        self.assertIs(bitpay.get_client(), bitpay.get_client())
+
+
+@override_settings(BITPAY_BREAKER_THRESHOLD=2, BITPAY_BREAKER_RESET_TIMEOUT=60)
+class CircuitBreakerViewTestCase(TestCase):
+    """ویوها در زمان باز بودن breaker سریعاً 503 برمی‌گردانند"""
+    
+    def setUp(self):
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', is_active=True)
+        self.client.force_authenticate(user=self.user)
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_fail_fast_when_gateway_degraded(self, mock_post):
+        mock_post.side_effect = requests.ConnectTimeout('connect timeout')
+        url = reverse('payment:create-transaction')
+        
+        for _ in range(2):
+            response = self.client.post(url, {'amount': 10000})
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(mock_post.call_count, 2)
+        
+        response = self.client.post(url, {'amount': 10000})
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('موقتاً', response.data['error'])
+        # درگاه دیگر فراخوانی نشد
+        self.assertEqual(mock_post.call_count, 2)
@@ -0,0 +1,105 @@
+import re
+from unittest.mock import patch, Mock
+
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser
+from core.instrumentation import install
+from core.metrics import Histogram
+from payment.models import Transaction, SubscriptionPlan
+
+
+def server_timing(response):
+    """``{'db': (ms, desc), ...}`` از هدر Server-Timing"""
+    entries = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        entries[name] = (float(values['dur']), values.get('desc', '').strip('"'))
+    return entries
+
+
+@override_settings(SERVER_TIMING=True, METRICS_TOKEN='s3cret')
+class InstrumentationTestCase(TestCase):
+    """تست‌های Server-Timing و /metrics"""
+    
+    def setUp(self):
+        # اتصال تست پیش از بارگذاری middleware باز شده است
+        install()
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.user.is_active = True
+        self.user.save()
+        SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+    
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('payment:subscription-plans'))
+        timing = server_timing(response)
+        
+        self.assertEqual(set(timing), {'db', 'serialize', 'total'})
+        self.assertEqual(timing['db'][1], '1 queries')  # ساخت کاتالوگ
+        self.assertGreater(timing['serialize'][0], 0)
+        self.assertGreaterEqual(timing['total'][0], timing['db'][0])
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_gateway_time_on_verify(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=Mock(return_value={'status': 1, 'factorId': 'F1'}))
+        Transaction.objects.create(user=self.user, amount=10000, card_num='id-1')
+        
+        response = self.client.post(reverse('payment:verify-payment'), {'trans_id': 't1', 'id_get': 'id-1'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('bitpay', server_timing(response))
+        
+        metrics = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret').content.decode()
+        self.assertRegex(
+            metrics,
+            r'http_request_duration_seconds_count\{method="POST",route="api/payment/verify/",status="200"\} \d+'
+        )
+        self.assertRegex(metrics, r'http_request_external_duration_seconds_count\{route="api/payment/verify/",service="bitpay"\} \d+')
+        self.assertRegex(metrics, r'external_call_duration_seconds_count\{service="bitpay",outcome="ok"\} \d+')
+        self.assertIn('# TYPE http_request_db_queries histogram', metrics)
+    
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get(reverse('payment:subscription-plans'))
+        self.assertNotIn('Server-Timing', response)
+    
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+    
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_closed_without_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    async def test_async_views_are_profiled(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        response = await AsyncClient().get(reverse('async-profile'), headers={'Authorization': f'Bearer {access}'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # خواندن کاربر از طریق sync_to_async هم شمرده می‌شود
+        self.assertEqual(server_timing(response)['db'][1], '1 queries')
+
+
+class HistogramTestCase(TestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram('t_seconds', 'test', ('route',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, 'a')
+        samples = list(histogram.samples())
+        self.assertEqual(samples, [
+            't_seconds_bucket{route="a",le="0.1"} 1',
+            't_seconds_bucket{route="a",le="1.0"} 2',
+            't_seconds_bucket{route="a",le="+Inf"} 3',
+            't_seconds_sum{route="a"} 5.55',
+            't_seconds_count{route="a"} 3',
+        ])
@@ -0,0 +1,59 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from payment.models import SubscriptionPlan
+
+
+class PlanCatalogueTestCase(TestCase):
+    """تست‌های کاتالوگ کش‌شده پلن‌ها"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('payment:subscription-plans')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        SubscriptionPlan.objects.create(name='سالانه', duration_days=365, price=500000)
+    
+    def test_served_without_queries_after_first_hit(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.json()['count'], 2)
+        self.assertEqual(second['Content-Type'], 'application/json')
+    
+    def test_etag_and_not_modified(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+    
+    def test_plan_change_invalidates(self):
+        etag = self.client.get(self.url)['ETag']
+        
+        self.plan.price = 60000
+        self.plan.save()
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        prices = [plan['price'] for plan in response.json()['results']]
+        self.assertIn(60000, prices)
+    
+    def test_plan_delete_invalidates(self):
+        self.client.get(self.url)
+        SubscriptionPlan.objects.filter(name='سالانه').get().delete()
+        
+        self.assertEqual(self.client.get(self.url).json()['count'], 1)
+    
+    def test_browsable_api_still_renders(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('text/html', response['Content-Type'])
@@ -0,0 +1,120 @@
+import os
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch, Mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import CustomUser
+from core.testing import QueryBudgetMixin, UPDATE_ENV
+from payment.models import SubscriptionPlan, Subscription, SubscriptionTransaction, Transaction
+
+
+class PaymentQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """بودجه کوئری endpoint ها و changelist های ادمین پرداخت (query_budgets.json)"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.user.is_active = True
+        self.user.save()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        SubscriptionPlan.objects.create(name='سالانه', duration_days=365, price=500000)
+    
+    def _subscribe(self, user):
+        now = timezone.now()
+        return Subscription.objects.create(user=user, plan=self.plan, start_date=now, end_date=now + timedelta(days=30))
+    
+    def test_plans(self):
+        with self.assertQueryBudget('GET plans (cold)'):
+            self.client.get(reverse('payment:subscription-plans'))
+        with self.assertQueryBudget('GET plans (warm)'):
+            self.client.get(reverse('payment:subscription-plans'))
+    
+    def test_user_subscription(self):
+        self._subscribe(self.user)
+        cache.clear()
+        with self.assertQueryBudget('GET subscription'):
+            self.client.get(reverse('payment:user-subscription'))
+    
+    def test_purchase(self):
+        url = reverse('payment:purchase-subscription')
+        self.client.get(reverse('payment:subscription-plans'))
+        with self.assertQueryBudget('POST purchase (new)'):
+            self.client.post(url, {'plan_id': self.plan.id})
+        with self.assertQueryBudget('POST purchase (extend)'):
+            self.client.post(url, {'plan_id': self.plan.id})
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_create_transaction(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=Mock(return_value={'status': 1, 'id_get': 'id-1'}))
+        with self.assertQueryBudget('POST create transaction'):
+            self.client.post(reverse('payment:create-transaction'), {'amount': 10000})
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_verify_payment(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=Mock(return_value={'status': 1, 'factorId': 'F1'}))
+        Transaction.objects.create(user=self.user, amount=10000, card_num='id-1')
+        with self.assertQueryBudget('POST verify payment'):
+            self.client.post(reverse('payment:verify-payment'), {'trans_id': 't1', 'id_get': 'id-1'})
+    
+    def test_admin_changelists(self):
+        admin = CustomUser.objects.create_superuser(phone_number='09120000000', password='admin-pass-123')
+        for i in range(3):
+            user = CustomUser.objects.create_user(phone_number=f'0912111111{i}', password='testpass123')
+            self._subscribe(user)
+            Transaction.objects.create(user=user, amount=10000, card_num=f'id-{i}')
+            SubscriptionTransaction.objects.create(user=user, plan=self.plan, amount=50000, status='SUCCESS')
+        self.client.force_login(admin)
+        
+        for model in ('transaction', 'subscriptionplan', 'subscription',
+                      'subscriptiontransaction', 'subscriptionentitlement'):
+            with self.assertQueryBudget(f'admin {model} changelist'):
+                response = self.client.get(reverse(f'admin:payment_{model}_changelist'))
+            self.assertEqual(response.status_code, 200)
+
+
+class QueryBudgetUtilityTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.query_budget_file = os.path.join(directory, 'budgets.json')
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        patcher = patch.dict(os.environ, {UPDATE_ENV: ''})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def _record(self, name, fn):
+        with patch.dict(os.environ, {UPDATE_ENV: '1'}):
+            with self.assertQueryBudget(name):
+                fn()
+    
+    def test_missing_budget_fails(self):
+        with self.assertRaisesMessage(AssertionError, 'No query budget recorded'):
+            with self.assertQueryBudget('unknown'):
+                CustomUser.objects.count()
+    
+    def test_added_query_reported_with_stack(self):
+        self._record('users', lambda: list(CustomUser.objects.filter(pk__in=[1, 2, 3])))
+        
+        with self.assertRaises(AssertionError) as ctx:
+            with self.assertQueryBudget('users'):
+                list(CustomUser.objects.filter(pk__in=[4, 5]))
+                SubscriptionPlan.objects.count()
+        message = str(ctx.exception)
+        self.assertIn('2 queries, budget is 1', message)
+        self.assertIn('payment_subscriptionplan', message)
+        self.assertIn('test_query_budgets.py', message)
+        # کوئری موجود در بودجه (با IN list متفاوت) گزارش نمی‌شود
+        self.assertNotIn('account_customuser', message.split('Queries not in the budget:')[1])
+    
+    def test_fewer_queries_pass(self):
+        self._record('two', lambda: (CustomUser.objects.count(), SubscriptionPlan.objects.count()))
+        with self.assertQueryBudget('two'):
+            CustomUser.objects.count()
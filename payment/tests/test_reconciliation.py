@@ -0,0 +1,137 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+import requests
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from account.models import CustomUser
+from payment.models import Transaction, PaymentCallback, JobCheckpoint
+from payment.reconciliation import (
+    ReconcileStats, iter_pending_chunks, load_checkpoint, reconcile_chunk, reconcile_pending,
+)
+from payment.verification import verify_payment
+
+
+class ReconciliationTestCase(TestCase):
+    """تست‌های تطبیق دسته‌ای تراکنش‌های pending"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', is_active=True)
+        old = timezone.now() - timedelta(hours=2)
+        self.rows = []
+        for i in range(6):
+            trans = Transaction.objects.create(user=self.user, amount=10000, card_num=f'id{i}')
+            if i % 2 == 0:
+                PaymentCallback.objects.create(transaction=trans, trans_id=f't{i}')
+            self.rows.append(trans)
+        # created_at با auto_now_add پر می‌شود؛ قدیمی کردن با update
+        Transaction.objects.update(created_at=old)
+        self.recent = Transaction.objects.create(user=self.user, amount=10000, card_num='recent')
+        PaymentCallback.objects.create(transaction=self.recent, trans_id='tr')
+    
+    def gateway(self, trans_id, id_get):
+        return {'status': 1 if id_get in ('id0', 'id2') else 0, 'factorId': f'f-{id_get}'}
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_reconciles_old_pending_rows(self, mock_verify):
+        mock_verify.side_effect = self.gateway
+        
+        stats = reconcile_pending(chunk_size=2, concurrency=2)
+        
+        self.assertEqual(stats.scanned, 3)
+        self.assertEqual(stats.chunks, 2)
+        self.assertEqual((stats.verified, stats.rejected), (2, 1))
+        statuses = dict(Transaction.objects.values_list('card_num', 'status'))
+        self.assertEqual(statuses['id0'], 'successful')
+        self.assertEqual(Transaction.objects.get(card_num='id0').trans_id, 't0')
+        # trans_id ردشده ممکن است جعلی باشد: فقط خودش حذف می‌شود
+        self.assertEqual(statuses['id4'], 'pending')
+        self.assertFalse(PaymentCallback.objects.filter(transaction__card_num='id4').exists())
+        # بدون trans_id درگاه قابل پرسش نیست؛ ناموفق نمی‌شود
+        self.assertEqual(statuses['id1'], 'pending')
+        # تراکنش جدید دست نمی‌خورد
+        self.assertEqual(statuses['recent'], 'pending')
+        self.assertEqual(mock_verify.call_count, 3)
+        self.assertIsNone(load_checkpoint())
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_resume_from_checkpoint(self, mock_verify):
+        mock_verify.side_effect = self.gateway
+        
+        first = reconcile_pending(chunk_size=2, limit=2)
+        self.assertEqual(first.scanned, 2)
+        self.assertEqual(load_checkpoint()[1], self.rows[2].id)
+        
+        second = reconcile_pending(chunk_size=2)
+        self.assertEqual(second.scanned, 1)
+        self.assertEqual(list(PaymentCallback.objects.values_list('trans_id', flat=True)), ['tr'])
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_gateway_errors_leave_rows_pending(self, mock_verify):
+        mock_verify.side_effect = requests.ConnectionError('down')
+        
+        stats = reconcile_pending(chunk_size=10)
+        
+        self.assertEqual(stats.errors, 3)
+        self.assertEqual(Transaction.objects.filter(status='pending').count(), 7)
+        self.assertEqual(PaymentCallback.objects.count(), 4)
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_command_reports_progress(self, mock_verify):
+        mock_verify.side_effect = self.gateway
+        out = StringIO()
+        
+        call_command('reconcile_transactions', '--chunk-size=2', stdout=out)
+        
+        self.assertIn('chunk 2', out.getvalue())
+        self.assertTrue(JobCheckpoint.objects.filter(cursor__isnull=True).exists())
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_callback_during_outage_is_reconciled(self, mock_verify):
+        trans = Transaction.objects.create(user=self.user, amount=10000, card_num='outage')
+        mock_verify.side_effect = requests.ConnectionError('down')
+        with self.assertRaises(requests.ConnectionError):
+            verify_payment('t-real', 'outage')
+        
+        # trans_id تاییدنشده جدا از تراکنش نگه داشته شده است
+        trans.refresh_from_db()
+        self.assertEqual((trans.status, trans.trans_id), ('pending', None))
+        self.assertEqual(list(trans.callbacks.values_list('trans_id', flat=True)), ['t-real'])
+        
+        Transaction.objects.filter(pk=trans.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        mock_verify.side_effect = lambda trans_id, id_get: {'status': 1 if trans_id == 't-real' else 0}
+        reconcile_pending()
+        trans.refresh_from_db()
+        self.assertEqual(trans.status, 'successful')
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_forged_callback_cannot_fail_payment(self, mock_verify):
+        trans = Transaction.objects.create(user=self.user, amount=10000, card_num='victim')
+        mock_verify.side_effect = lambda trans_id, id_get: {'status': 1 if trans_id == 'REAL' else 0}
+        
+        self.assertEqual(verify_payment('FORGED', 'victim').result, 'failed')
+        Transaction.objects.filter(pk=trans.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        reconcile_pending()
+        trans.refresh_from_db()
+        self.assertEqual((trans.status, trans.trans_id), ('pending', None))
+        
+        self.assertEqual(verify_payment('REAL', 'victim').result, 'verified')
+        trans.refresh_from_db()
+        self.assertEqual((trans.status, trans.trans_id), ('successful', 'REAL'))
+    
+    @patch('payment.bitpay.BitPayClient.verify')
+    def test_concurrent_callback_result_is_kept(self, mock_verify):
+        mock_verify.return_value = {'status': 1, 'factorId': 'from-reconcile'}
+        chunk = next(iter_pending_chunks(timezone.now() - timedelta(minutes=30), 10))
+        # callback همزمان، پس از خواندن chunk و پیش از ثبت نتیجه تطبیق
+        Transaction.objects.filter(card_num='id0').update(status='successful', factor_id='from-callback')
+        stats = ReconcileStats()
+        
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            reconcile_chunk(chunk, pool, stats)
+        
+        self.assertEqual((stats.verified, stats.skipped), (2, 1))
+        self.assertEqual(Transaction.objects.get(card_num='id0').factor_id, 'from-callback')
+        self.assertEqual(Transaction.objects.get(card_num='id2').factor_id, 'from-reconcile')
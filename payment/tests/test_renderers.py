@@ -0,0 +1,87 @@
+import json
+import uuid
+from io import BytesIO
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from account.models import CustomUser
+from core.renderers import FastJSONRenderer, FastJSONParser
+from payment.models import Subscription, SubscriptionPlan, SubscriptionTransaction
+from payment.serializers import SubscriptionSerializer, SubscriptionTransactionSerializer
+
+
+class FastJSONRendererTestCase(TestCase):
+    """تست‌های رندر و parse سریع JSON"""
+
+    def setUp(self):
+        self.renderer = FastJSONRenderer()
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        now = timezone.now()
+        self.subscription = Subscription.objects.create(
+            user=self.user, plan=self.plan, start_date=now, end_date=now + timedelta(days=30)
+        )
+        self.sub_transaction = SubscriptionTransaction.objects.create(
+            user=self.user, plan=self.plan, amount=50000, before_end_date=now,
+            after_end_date=now + timedelta(days=30)
+        )
+
+    def test_matches_stdlib_output(self):
+        for data in [
+            SubscriptionSerializer(self.subscription).data,
+            SubscriptionSerializer([self.subscription] * 3, many=True).data,
+            SubscriptionTransactionSerializer(self.sub_transaction).data,
+            {'a': 'x\u2028y\u2029z'},
+        ]:
+            fast = self.renderer.render(data, 'application/json')
+            self.assertEqual(fast, JSONRenderer().render(data, 'application/json'))
+
+    def test_native_types(self):
+        moment = timezone.now().replace(microsecond=0)
+        key = uuid.uuid4()
+        body = self.renderer.render({
+            'at': moment, 'id': key, 'amount': Decimal('1.5'), 'label': gettext_lazy('ماهانه'), 1: 'x',
+        })
+        self.assertEqual(json.loads(body), {
+            'at': moment.isoformat().replace('+00:00', 'Z'), 'id': str(key),
+            'amount': 1.5, 'label': 'ماهانه', '1': 'x',
+        })
+        # بدون escape یونیکد، مثل JSONRenderer
+        self.assertIn('ماهانه'.encode(), body)
+
+    def test_fallbacks(self):
+        data = {'big': 2 ** 70, 'name': 'ماهانه'}
+        self.assertEqual(self.renderer.render(data), JSONRenderer().render(data))
+        indented = self.renderer.render(data, 'application/json; indent=4')
+        self.assertIn(b'\n    "big"', indented)
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(self.renderer.render(data), JSONRenderer().render(data))
+        self.assertEqual(self.renderer.render(None), b'')
+
+    def test_parser(self):
+        parser = FastJSONParser()
+        stream = json.dumps({'plan_id': 1, 'name': 'ماهانه'}, ensure_ascii=False).encode()
+        self.assertEqual(parser.parse(BytesIO(stream)), {'plan_id': 1, 'name': 'ماهانه'})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"plan_id": '))
+
+    def test_api_uses_fast_renderer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get(reverse('payment:user-subscription'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.accepted_renderer, FastJSONRenderer)
+        self.assertEqual(response.json()['plan']['name'], 'ماهانه')
+
+        response = client.post(reverse('payment:create-transaction'), b'{"amount": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
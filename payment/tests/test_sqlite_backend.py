@@ -0,0 +1,59 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core.sqlite_backend.base import DatabaseWrapper
+
+
+class TunedSQLiteBackendTestCase(SimpleTestCase):
+    """تست‌های backend تنظیم‌شده SQLite (WAL و BEGIN IMMEDIATE)"""
+    
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'tuned.sqlite3')
+    
+    def _wrapper(self, **options):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'core.sqlite_backend',
+            'NAME': self.path,
+            'OPTIONS': options,
+        }, alias='tuned')
+        self.addCleanup(wrapper.close)
+        return wrapper
+    
+    def test_pragmas_applied_on_connect(self):
+        wrapper = self._wrapper(cache_size=-2000)
+        with wrapper.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -2000)
+    
+    def test_transactions_take_write_lock_up_front(self):
+        wrapper = self._wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id INTEGER PRIMARY KEY)')
+        
+        wrapper.set_autocommit(True)
+        wrapper._start_transaction_under_autocommit()
+        try:
+            other = sqlite3.connect(self.path, timeout=0.05)
+            self.addCleanup(other.close)
+            with self.assertRaises(sqlite3.OperationalError):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            wrapper.connection.rollback()
+    
+    def test_invalid_transaction_mode(self):
+        with self.assertRaises(ValueError):
+            self._wrapper(transaction_mode='LAZY').get_connection_params()
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from account.models import CustomUser
+from payment.entitlements import active_until
+from payment.models import SubscriptionPlan, Subscription, SubscriptionTransaction
+from payment.subscriptions import extend_subscription
+
+
+class ExtendSubscriptionTestCase(TestCase):
+    """تست‌های تمدید اتمیک اشتراک"""
+    
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', password='testpass123')
+        self.plan = SubscriptionPlan.objects.create(name='ماهانه', duration_days=30, price=50000)
+        self.now = timezone.now()
+    
+    def test_new_subscription(self):
+        subscription, sub_trans = extend_subscription(self.user, self.plan, self.now)
+        
+        self.assertEqual(subscription.start_date, self.now)
+        self.assertEqual(subscription.end_date, self.now + timedelta(days=30))
+        self.assertIsNone(sub_trans.before_end_date)
+        self.assertEqual(sub_trans.after_end_date, subscription.end_date)
+        self.assertEqual(active_until(self.user.id, self.now), subscription.end_date)
+    
+    def test_extends_exactly(self):
+        current_end = self.now + timedelta(days=10)
+        current = Subscription.objects.create(
+            user=self.user, plan=self.plan, start_date=self.now - timedelta(days=20), end_date=current_end
+        )
+        
+        subscription, sub_trans = extend_subscription(self.user, self.plan, self.now)
+        
+        self.assertEqual(subscription.pk, current.pk)
+        self.assertEqual(subscription.end_date, current_end + timedelta(days=30))
+        self.assertEqual(sub_trans.before_end_date, current_end)
+        self.assertEqual(sub_trans.after_end_date, subscription.end_date)
+        self.assertEqual(active_until(self.user.id, self.now), subscription.end_date)
+    
+    def test_expired_subscription_starts_new(self):
+        expired = Subscription.objects.create(
+            user=self.user, plan=self.plan,
+            start_date=self.now - timedelta(days=40), end_date=self.now - timedelta(days=10)
+        )
+        
+        subscription, sub_trans = extend_subscription(self.user, self.plan, self.now)
+        
+        self.assertNotEqual(subscription.pk, expired.pk)
+        self.assertEqual(subscription.end_date, self.now + timedelta(days=30))
+        self.assertIsNone(sub_trans.before_end_date)
+    
+    def test_repeated_purchases_accumulate(self):
+        for _ in range(5):
+            extend_subscription(self.user, self.plan, self.now)
+        
+        self.assertEqual(Subscription.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(active_until(self.user.id, self.now), self.now + timedelta(days=150))
+        ledger = list(SubscriptionTransaction.objects.filter(user=self.user).order_by('after_end_date'))
+        self.assertEqual(len(ledger), 5)
+        for previous, entry in zip(ledger, ledger[1:]):
+            self.assertEqual(entry.before_end_date, previous.after_end_date)
+    
+    def test_ledger_written_once(self):
+        extend_subscription(self.user, self.plan, self.now)
+        
+        with CaptureQueriesContext(connection) as queries:
+            extend_subscription(self.user, self.plan, self.now)
+        
+        table = SubscriptionTransaction._meta.db_table
+        statements = [q['sql'] for q in queries.captured_queries if table in q['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertTrue(statements[0].startswith('INSERT'))
+        self.assertFalse(SubscriptionTransaction.objects.exclude(status='SUCCESS').exists())
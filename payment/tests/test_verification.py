@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch, Mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework import status
+from account.models import CustomUser
+from payment.models import Transaction
+from payment.verification import AsyncSingleFlight, SingleFlight, verify_payment, ALREADY_VERIFIED
+
+
+def gateway_response(body):
+    response = Mock()
+    response.json.return_value = body
+    return response
+
+
+class VerifyPipelineTestCase(TestCase):
+    """تست‌های مسیر idempotent وریفای"""
+    
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.url = reverse('payment:verify-payment')
+        self.user = CustomUser.objects.create_user(phone_number='09123456789', is_active=True)
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_missing_transaction_skips_gateway(self, mock_post):
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'missing'})
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        mock_post.assert_not_called()
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_terminal_transaction_skips_gateway(self, mock_post):
+        Transaction.objects.create(
+            user=self.user, amount=10000, card_num='done', status='successful', trans_id='t1'
+        )
+        
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'done'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'Transaction verified in the past')
+        mock_post.assert_not_called()
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_repeat_verify_served_from_cache(self, mock_post):
+        Transaction.objects.create(user=self.user, amount=10000, card_num='storm')
+        mock_post.return_value = gateway_response({'status': 1, 'factorId': 'f1'})
+        
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'storm'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transaction']['status'], 'successful')
+        
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'storm'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transaction']['factor_id'], 'f1')
+        self.assertEqual(mock_post.call_count, 1)
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_failed_verify_leaves_row_pending(self, mock_post):
+        trans = Transaction.objects.create(user=self.user, amount=10000, card_num='bad')
+        mock_post.return_value = gateway_response({'status': 0, 'message': 'Payment failed'})
+        
+        for _ in range(2):
+            response = self.client.post(self.url, {'trans_id': 'forged', 'id_get': 'bad'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['error'], 'Payment failed')
+        # نتیجه‌ای که روی ردیف ثبت نشده کش نمی‌شود؛ تلاش دوباره از درگاه پرسیده می‌شود
+        self.assertEqual(mock_post.call_count, 2)
+        trans.refresh_from_db()
+        self.assertEqual(trans.status, 'pending')
+        
+        # callback جعلی جلوی وریفای واقعی را نمی‌گیرد
+        mock_post.return_value = gateway_response({'status': 1, 'factorId': 'f1'})
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'bad'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trans.refresh_from_db()
+        self.assertEqual((trans.status, trans.trans_id), ('successful', 't1'))
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_temporary_gateway_error_is_retried(self, mock_post):
+        trans = Transaction.objects.create(user=self.user, amount=10000, card_num='retry')
+        mock_post.return_value = gateway_response({'status': -4, 'message': 'Temporary error'})
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'retry'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        mock_post.return_value = gateway_response({'status': 1, 'factorId': 'f1'})
+        response = self.client.post(self.url, {'trans_id': 't1', 'id_get': 'retry'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        trans.refresh_from_db()
+        self.assertEqual(trans.status, 'successful')
+    
+    @patch('payment.bitpay.requests.Session.post')
+    def test_conditional_update_keeps_concurrent_winner(self, mock_post):
+        trans = Transaction.objects.create(user=self.user, amount=10000, card_num='race')
+        
+        def finalize_elsewhere(*args, **kwargs):
+            # پروسه دیگری در حین فراخوانی درگاه تراکنش را نهایی کرده است
+            Transaction.objects.filter(pk=trans.pk).update(status='successful', trans_id='t0')
+            return gateway_response({'status': 1, 'factorId': 'f1'})
+        mock_post.side_effect = finalize_elsewhere
+        
+        outcome = verify_payment('t1', 'race')
+        
+        self.assertEqual(outcome.result, ALREADY_VERIFIED)
+        trans.refresh_from_db()
+        self.assertEqual(trans.status, 'successful')
+        self.assertEqual(trans.trans_id, 't0')
+
+
+class SingleFlightTestCase(TestCase):
+    def test_concurrent_calls_collapse(self):
+        flight = SingleFlight()
+        calls = []
+        
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'status': 1}
+        
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do('id', slow)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'status': 1}] * 5)
+
+
+class AsyncSingleFlightTestCase(TestCase):
+    async def test_cancelled_leader_does_not_strand_followers(self):
+        flight = AsyncSingleFlight()
+        calls = []
+        
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'status': 1}
+        
+        leader = asyncio.create_task(flight.do('id', slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do('id', slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        
+        # منتظر خودش فراخوانی را دوباره انجام می‌دهد
+        self.assertEqual(await asyncio.wait_for(follower, 1), {'status': 1})
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(leader.cancelled())
@@ -5,6 +5,8 @@ from .views import (
     SubscriptionPlanListAPIView,
     UserSubscriptionAPIView,
     PurchaseSubscriptionAPIView,
+    ExportAPIView,
+    AnalyticsAPIView,
 )
 
 app_name = 'payment'
@@ -18,4 +20,8 @@ urlpatterns = [
     path('plans/', SubscriptionPlanListAPIView.as_view(), name='subscription-plans'),
     path('subscription/', UserSubscriptionAPIView.as_view(), name='user-subscription'),
     path('subscription/purchase/', PurchaseSubscriptionAPIView.as_view(), name='purchase-subscription'),
+    
+    # خروجی مالی (فقط کارکنان)
+    path('export/<slug:dataset>/', ExportAPIView.as_view(), name='export'),
+    path('analytics/', AnalyticsAPIView.as_view(), name='analytics'),
 ]
@@ -0,0 +1,252 @@
+"""
+مسیر وریفای پرداخت BitPay
+
+ترتیب کار برای هر callback:
+
+1. نتیجه نهایی قبلی همین ``(id_get, trans_id)`` از کش وریفای (بدون کوئری و بدون
+   تماس با درگاه)؛ فقط نتیجه‌ای کش می‌شود که روی ردیف نهایی شده است
+2. یافتن تراکنش با ``card_num``؛ اگر وضعیت نهایی دارد درگاه فراخوانی نمی‌شود
+3. وریفای‌های همزمان یک ``(id_get, trans_id)`` در این پروسه در یک فراخوانی درگاه ادغام می‌شوند
+4. پاسخ موفق با یک UPDATE شرطی (``status='pending'`` → ``successful``) ثبت
+   می‌شود؛ اگر پروسه دیگری زودتر ثبت کرده باشد، همان نتیجه برگردانده می‌شود
+5. روز تراکنش برای بازمحاسبه جمع‌های روزانه علامت می‌خورد (``analytics.py``)
+
+پاسخ ناموفق درگاه تراکنش را نهایی نمی‌کند: endpoint عمومی است و ``trans_id``
+دلخواه می‌پذیرد، پس یک callback جعلی نباید پرداخت واقعی را برای همیشه ناموفق
+کند. تراکنش ``pending`` می‌ماند تا وریفای واقعی یا ``reconciliation.py``.
+``Transaction.trans_id`` فقط پس از تایید درگاه نوشته می‌شود؛ ``trans_id`` ای
+که درگاه تاییدش نکرده (یا به آن پاسخ نداده) در ``PaymentCallback`` نگه داشته
+می‌شود تا تطبیق بعداً آن را وریفای کند.
+"""
+import asyncio
+import threading
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.utils import timezone
+
+from core.db_router import pin_to_primary
+
+from . import bitpay
+from .analytics import mark_dirty_for
+from .models import Transaction, PaymentCallback
+from .serializers import transaction_reader
+
+VERIFY_CACHE_TIMEOUT = 300
+# سقف trans_id های تاییدنشده هر تراکنش؛ تطبیق رد‌شده‌ها را پاک می‌کند
+MAX_CALLBACKS_PER_TRANSACTION = 5
+
+# نتیجه‌ها
+VERIFIED = 'verified'
+ALREADY_VERIFIED = 'already_verified'
+FAILED = 'failed'
+NOT_FOUND = 'not_found'
+
+
+@dataclass
+class VerifyOutcome:
+    result: str
+    transaction: dict = None
+    message: str = ''
+
+
+def _cache_key(id_get, trans_id):
+    return f'bitpay:verify:{id_get}:{trans_id}'
+
+
+def _terminal_outcome(trans_data, message=''):
+    if trans_data['status'] == 'successful':
+        return VerifyOutcome(ALREADY_VERIFIED, trans_data)
+    return VerifyOutcome(FAILED, trans_data, message or 'پرداخت ناموفق')
+
+
+def _remember(trans_id, trans_data, message=''):
+    cache.set(_cache_key(trans_data['card_num'], trans_id), {
+        'transaction': trans_data, 'message': message
+    }, VERIFY_CACHE_TIMEOUT)
+
+
+def _cached_outcome(trans_id, id_get):
+    cached = cache.get(_cache_key(id_get, trans_id))
+    if cached is None:
+        return None
+    return _terminal_outcome(cached['transaction'], cached['message'])
+
+
+def _transition(trans_id, result):
+    """فیلدهای UPDATE شرطی برای پاسخ موفق درگاه؛ None یعنی بدون تغییر وضعیت"""
+    if result.get('status') != 1:
+        # 11: قبلاً در درگاه تایید شده است؛ بقیه: تراکنش pending می‌ماند
+        return None
+    return {
+        'status': 'successful',
+        'trans_id': trans_id,
+        'factor_id': result.get('factorId', trans_id),
+        'updated_at': timezone.now(),
+    }
+
+
+def _unchanged_outcome(trans, trans_id, result):
+    data = transaction_reader.serialize(trans)
+    if result.get('status') == 11:
+        return VerifyOutcome(ALREADY_VERIFIED, data)
+    # کش نمی‌شود: ردیف تغییری نکرده و خطای موقت درگاه باید با تلاش بعدی دوباره پرسیده شود؛
+    # وریفای‌های همزمان همین پاسخ را از single-flight می‌گیرند
+    return VerifyOutcome(FAILED, data, result.get('message', 'پرداخت ناموفق'))
+
+
+def _record_callback(trans, trans_id):
+    """نگه‌داشتن trans_id تاییدنشده برای ``reconciliation.py``"""
+    if PaymentCallback.objects.filter(transaction=trans).count() < MAX_CALLBACKS_PER_TRANSACTION:
+        PaymentCallback.objects.bulk_create(
+            [PaymentCallback(transaction=trans, trans_id=trans_id)], ignore_conflicts=True
+        )
+
+
+def _outcome_for(trans, changes):
+    for field, value in changes.items():
+        setattr(trans, field, value)
+    pin_to_primary(trans.user_id)
+    data = transaction_reader.serialize(trans)
+    _remember(changes['trans_id'], data)
+    return VerifyOutcome(VERIFIED, data)
+
+
+class SingleFlight:
+    """ادغام فراخوانی‌های همزمان با کلید یکسان در یک اجرا (بین thread ها)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'event': threading.Event(), 'result': None, 'error': None}
+
+        if not leader:
+            call['event'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn()
+        except BaseException as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['event'].set()
+        return call['result']
+
+
+class AsyncSingleFlight:
+    """نسخه asyncio ``SingleFlight`` برای ویوهای async"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        future = self._calls.get(key)
+        while future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    # خود این درخواست لغو شده است
+                    raise
+                # leader لغو شد؛ یکی از منتظرها فراخوانی را دوباره انجام می‌دهد
+                future = self._calls.get(key)
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_exception(e)
+            # جلوگیری از هشدار exception بازیابی‌نشده وقتی منتظری وجود ندارد
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            del self._calls[key]
+            if not future.done():
+                # leader لغو شد (CancelledError)؛ منتظرها نباید تا ابد بمانند
+                future.cancel()
+        return result
+
+
+_flight = SingleFlight()
+_async_flight = AsyncSingleFlight()
+
+
+def verify_payment(trans_id, id_get):
+    outcome = _cached_outcome(trans_id, id_get)
+    if outcome is not None:
+        return outcome
+
+    trans = Transaction.objects.filter(card_num=id_get).first()
+    if trans is None:
+        return VerifyOutcome(NOT_FOUND)
+    if trans.status != 'pending':
+        data = transaction_reader.serialize(trans)
+        _remember(trans_id, data)
+        return _terminal_outcome(data)
+
+    try:
+        result = _flight.do((id_get, trans_id), lambda: bitpay.get_client().verify(trans_id, id_get))
+    except Exception:
+        # درگاه پاسخ نداد؛ تطبیق بعداً همین trans_id را وریفای می‌کند
+        _record_callback(trans, trans_id)
+        raise
+
+    changes = _transition(trans_id, result)
+    if changes is None:
+        _record_callback(trans, trans_id)
+        return _unchanged_outcome(trans, trans_id, result)
+
+    updated = Transaction.objects.filter(pk=trans.pk, status='pending').update(**changes)
+    if not updated:
+        # یک درخواست همزمان دیگر وضعیت را نهایی کرده است
+        trans.refresh_from_db()
+        return _terminal_outcome(transaction_reader.serialize(trans))
+    mark_dirty_for(trans.created_at)
+    return _outcome_for(trans, changes)
+
+
+async def averify_payment(trans_id, id_get):
+    outcome = _cached_outcome(trans_id, id_get)
+    if outcome is not None:
+        return outcome
+
+    trans = await Transaction.objects.filter(card_num=id_get).afirst()
+    if trans is None:
+        return VerifyOutcome(NOT_FOUND)
+    if trans.status != 'pending':
+        data = transaction_reader.serialize(trans)
+        _remember(trans_id, data)
+        return _terminal_outcome(data)
+
+    try:
+        result = await _async_flight.do((id_get, trans_id), lambda: bitpay.averify(trans_id, id_get))
+    except Exception:
+        await sync_to_async(_record_callback)(trans, trans_id)
+        raise
+
+    changes = _transition(trans_id, result)
+    if changes is None:
+        await sync_to_async(_record_callback)(trans, trans_id)
+        return _unchanged_outcome(trans, trans_id, result)
+
+    updated = await Transaction.objects.filter(pk=trans.pk, status='pending').aupdate(**changes)
+    if not updated:
+        await trans.arefresh_from_db()
+        return _terminal_outcome(transaction_reader.serialize(trans))
+    await sync_to_async(mark_dirty_for)(trans.created_at)
+    return _outcome_for(trans, changes)
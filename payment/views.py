@@ -1,24 +1,40 @@
 import requests
 from django.conf import settings
-from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
 from rest_framework import status, generics
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 
-from .models import Transaction, SubscriptionPlan, Subscription, SubscriptionTransaction
+from account.authentication import ClaimsJWTAuthentication
+from core.db_router import ReplicaReadMixin, pin_to_primary
+from core.throttling import TokenBucketThrottle
+
+from . import bitpay
+from .models import Transaction, SubscriptionPlan, Subscription, DailyRevenue, DailySubscribers
+from .catalogue import get_catalogue
+from .entitlements import get_entitlement
+from .subscriptions import extend_subscription
+from .verification import verify_payment, VERIFIED, ALREADY_VERIFIED, NOT_FOUND
+from .analytics import revenue_totals
+from .exports import DATASETS, CONTENT_TYPES, filter_kwargs, iter_rows, stream_export, export_filename
 from .serializers import (
-    TransactionSerializer, CreateTransactionSerializer,
+    CreateTransactionSerializer,
     SubscriptionPlanSerializer, SubscriptionSerializer,
-    PurchaseSubscriptionSerializer
+    PurchaseSubscriptionSerializer, ExportSerializer,
+    AnalyticsQuerySerializer, DailyRevenueSerializer, DailySubscribersSerializer,
+    subscription_reader,
 )
 
 
 class CreateTransactionAPIView(APIView):
     """ایجاد تراکنش پرداخت BitPay"""
     permission_classes = [IsAuthenticated]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'payment'
+    throttle_keys = ('user', 'ip')
     
     def post(self, request):
         serializer = CreateTransactionSerializer(data=request.data)
@@ -32,18 +48,10 @@ class CreateTransactionAPIView(APIView):
         redirect_url = f"{site_url}/api/payment/verify/"
         
         # فراخوانی BitPay send API
-        send_url = "https://bitpay.ir/payment/gateway-send"
-        payload = {
-            'api': settings.BITPAY_API_KEY,
-            'redirect': redirect_url,
-            'amount': amount,
-            'factorId': f"order_{user.id}_{timezone.now().timestamp()}"
-        }
+        factor_id = f"order_{user.id}_{timezone.now().timestamp()}"
         
         try:
-            response = requests.post(send_url, data=payload, timeout=10)
-            response.raise_for_status()
-            result = response.json()
+            result = bitpay.get_client().send(amount, redirect_url, factor_id)
             
             # بررسی موفقیت
             if result.get('status') != 1:
@@ -62,14 +70,14 @@ class CreateTransactionAPIView(APIView):
             
             # ایجاد تراکنش
             trans = Transaction.objects.create(
-                user=user,
+                user_id=user.id,
                 amount=amount,
                 card_num=id_get,
                 status='pending'
             )
             
             # URL پرداخت
-            payment_url = f"https://bitpay.ir/payment/gateway-{id_get}-get"
+            payment_url = bitpay.payment_url(id_get)
             
             return Response({
                 'transaction_id': trans.id,
@@ -77,6 +85,11 @@ class CreateTransactionAPIView(APIView):
                 'id_get': id_get
             }, status=status.HTTP_201_CREATED)
             
+        except bitpay.CircuitOpenError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except requests.RequestException as e:
             return Response(
                 {'error': f'خطا در ارتباط با درگاه: {str(e)}'},
@@ -87,6 +100,8 @@ class CreateTransactionAPIView(APIView):
 class VerifyPaymentAPIView(APIView):
     """وریفای پرداخت BitPay"""
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'payment_verify'
     
     def post(self, request):
         trans_id = request.data.get('trans_id')
@@ -99,89 +114,100 @@ class VerifyPaymentAPIView(APIView):
             )
         
         # فراخوانی BitPay verify API
-        verify_url = "https://bitpay.ir/payment/gateway-result-second"
-        payload = {
-            'api': settings.BITPAY_API_KEY,
-            'trans_id': trans_id,
-            'id_get': id_get,
-            'json': 1
-        }
-        
         try:
-            response = requests.post(verify_url, data=payload, timeout=10)
-            response.raise_for_status()
-            result = response.json()
-            
-            verify_status = result.get('status')
-            
-            # یافتن تراکنش
-            try:
-                trans = Transaction.objects.get(card_num=id_get)
-            except Transaction.DoesNotExist:
-                return Response(
-                    {'error': 'تراکنش یافت نشد'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
-            
-            # بررسی وضعیت
-            if verify_status == 1:
-                # پرداخت موفق
-                trans.status = 'successful'
-                trans.trans_id = trans_id
-                trans.factor_id = result.get('factorId', trans_id)
-                trans.save()
-                
-                return Response({
-                    'message': 'پرداخت با موفقیت تایید شد',
-                    'transaction': TransactionSerializer(trans).data
-                }, status=status.HTTP_200_OK)
-                
-            elif verify_status == 11:
-                # تراکنش قبلاً تایید شده
-                return Response({
-                    'message': 'Transaction verified in the past',
-                    'transaction': TransactionSerializer(trans).data
-                }, status=status.HTTP_200_OK)
-                
-            else:
-                # پرداخت ناموفق
-                trans.status = 'failed'
-                trans.save()
-                
-                error_message = result.get('message', 'پرداخت ناموفق')
-                return Response(
-                    {'error': error_message},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-                
+            outcome = verify_payment(trans_id, id_get)
+        except bitpay.CircuitOpenError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
         except requests.RequestException as e:
             return Response(
                 {'error': f'خطا در ارتباط با درگاه: {str(e)}'},
                 status=status.HTTP_503_SERVICE_UNAVAILABLE
             )
+        
+        if outcome.result == NOT_FOUND:
+            return Response(
+                {'error': 'تراکنش یافت نشد'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if outcome.result == VERIFIED:
+            # پرداخت موفق
+            return Response({
+                'message': 'پرداخت با موفقیت تایید شد',
+                'transaction': outcome.transaction
+            }, status=status.HTTP_200_OK)
+        
+        if outcome.result == ALREADY_VERIFIED:
+            # تراکنش قبلاً تایید شده
+            return Response({
+                'message': 'Transaction verified in the past',
+                'transaction': outcome.transaction
+            }, status=status.HTTP_200_OK)
+        
+        # پرداخت ناموفق
+        return Response(
+            {'error': outcome.message},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+
+class PreRenderedResponse(Response):
+    """پاسخی که بدنه JSON از پیش رندرشده را بدون رندر مجدد برمی‌گرداند"""
+    
+    def __init__(self, data=None, prerendered=None, **kwargs):
+        super().__init__(data, **kwargs)
+        self.prerendered = prerendered
+    
+    @property
+    def rendered_content(self):
+        if self.prerendered is not None and self.accepted_media_type == 'application/json':
+            self['Content-Type'] = self.accepted_media_type
+            return self.prerendered
+        return super().rendered_content
 
 
 class SubscriptionPlanListAPIView(generics.ListAPIView):
-    """لیست پلن‌های اشتراک"""
+    """لیست پلن‌های اشتراک (از کاتالوگ کش‌شده با ETag)"""
     permission_classes = [AllowAny]
     serializer_class = SubscriptionPlanSerializer
     queryset = SubscriptionPlan.objects.filter(is_active=True)
+    
+    def list(self, request, *args, **kwargs):
+        snapshot = get_catalogue()
+        key = request.build_absolute_uri()
+        entry = snapshot.rendered(key)
+        if entry is None:
+            page = self.paginate_queryset(list(snapshot.plans))
+            data = self.get_paginated_response(page).data
+            renderer = next(r for r in self.get_renderers() if r.format == 'json')
+            entry = snapshot.store_rendered(key, data, renderer.render(data, 'application/json'))
+        data, body, etag = entry
+        
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return PreRenderedResponse(data, prerendered=body, headers={'ETag': etag})
 
 
-class UserSubscriptionAPIView(APIView):
+class UserSubscriptionAPIView(ReplicaReadMixin, APIView):
     """اشتراک فعال کاربر"""
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        # یافتن آخرین اشتراک فعال
-        subscription = Subscription.objects.filter(
-            user=request.user,
-            end_date__gte=timezone.now()
-        ).select_related('plan').first()
+        # وضعیت اشتراک از entitlement (کش) و سپس خود اشتراک با کلید اصلی
+        now = timezone.now()
+        entitlement = get_entitlement(request.user.id)
+        row = None
+        if entitlement is not None and entitlement.is_active(now) and entitlement.subscription_id:
+            row = subscription_reader.values(
+                Subscription.objects.filter(pk=entitlement.subscription_id)
+            ).first()
         
-        if subscription:
+        if row:
             return Response(
-                SubscriptionSerializer(subscription).data,
+                subscription_reader.serialize_row(row, context={'now': now}),
                 status=status.HTTP_200_OK
             )
         
@@ -195,71 +221,89 @@ class PurchaseSubscriptionAPIView(APIView):
     """خرید اشتراک"""
     permission_classes = [IsAuthenticated]
     
-    @transaction.atomic
     def post(self, request):
         serializer = PurchaseSubscriptionSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
         plan_id = serializer.validated_data['plan_id']
         
-        # یافتن پلن
-        try:
-            plan = SubscriptionPlan.objects.get(id=plan_id, is_active=True)
-        except SubscriptionPlan.DoesNotExist:
+        # یافتن پلن (از کاتالوگ پلن‌ها)
+        plan = get_catalogue().get_plan(plan_id)
+        if plan is None:
             return Response(
                 {'error': 'پلن یافت نشد'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # یافتن اشتراک فعال فعلی (اگر وجود دارد)
-        current_subscription = Subscription.objects.filter(
-            user=request.user,
-            end_date__gte=timezone.now()
-        ).first()
-        
-        before_end_date = current_subscription.end_date if current_subscription else None
-        
-        # ایجاد SubscriptionTransaction
-        sub_trans = SubscriptionTransaction.objects.create(
-            user=request.user,
-            plan=plan,
-            amount=plan.price,
-            currency=plan.currency,
-            status='PENDING',
-            description=f'خرید اشتراک {plan.name}',
-            before_end_date=before_end_date
-        )
-        
         # برای سادگی، فرض می‌کنیم پرداخت موفق است (در واقعیت باید از CreateTransaction استفاده شود)
-        # اینجا فقط منطق تمدید را پیاده‌سازی می‌کنیم
+        # تمدید اتمیک اشتراک فعال یا ایجاد اشتراک جدید، همراه با ثبت تراکنش اشتراک
+        now = timezone.now()
+        subscription, sub_trans = extend_subscription(request.user, plan, now)
+        pin_to_primary(request.user.pk)
         
-        # تعیین تاریخ شروع و پایان
-        if current_subscription:
-            start_date = current_subscription.end_date
-        else:
-            start_date = timezone.now()
+        return Response({
+            'message': 'اشتراک با موفقیت خریداری شد',
+            'subscription': SubscriptionSerializer(subscription, context={'now': now}).data
+        }, status=status.HTTP_201_CREATED)
+
+
+class ExportAPIView(APIView):
+    """خروجی جریانی CSV/NDJSON تراکنش‌ها برای کارکنان (حافظه ثابت، exports.py)"""
+    # کارکنان می‌توانند با نشست ادمین هم مستقیماً از مرورگر دانلود کنند
+    authentication_classes = [ClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, dataset):
+        spec = DATASETS.get(dataset)
+        if spec is None:
+            return Response(
+                {'error': 'خروجی یافت نشد'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        end_date = start_date + timedelta(days=plan.duration_days)
+        serializer = ExportSerializer(data=request.query_params, context={'dataset': spec})
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
         
-        # ایجاد یا بروزرسانی اشتراک
-        if current_subscription:
-            current_subscription.end_date = end_date
-            current_subscription.save()
-            subscription = current_subscription
-        else:
-            subscription = Subscription.objects.create(
-                user=request.user,
-                plan=plan,
-                start_date=start_date,
-                end_date=end_date
-            )
+        rows = iter_rows(spec, filter_kwargs(
+            status=params.get('status'),
+            date_from=params.get('date_from'),
+            date_to=params.get('date_to'),
+            plan=params.get('plan'),
+        ))
+        file_format, compress = params['file_format'], params['gzip']
+        response = StreamingHttpResponse(
+            stream_export(spec, rows, file_format, compress),
+            content_type='application/gzip' if compress else CONTENT_TYPES[file_format]
+        )
+        filename = export_filename(dataset, file_format, compress, timezone.localtime())
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class AnalyticsAPIView(ReplicaReadMixin, APIView):
+    """گزارش روزانه درآمد و مشترکین از جدول‌های rollup (analytics.py)"""
+    authentication_classes = [ClaimsJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        serializer = AnalyticsQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        date_range = (params['date_from'], params['date_to'])
         
-        # بروزرسانی SubscriptionTransaction
-        sub_trans.status = 'SUCCESS'
-        sub_trans.after_end_date = end_date
-        sub_trans.save()
+        revenue = DailyRevenue.objects.filter(date__range=date_range)
+        for field in ('source', 'currency'):
+            if params.get(field):
+                revenue = revenue.filter(**{field: params[field]})
+        if params.get('plan'):
+            revenue = revenue.filter(plan_id=params['plan'])
+        subscribers = DailySubscribers.objects.filter(date__range=date_range)
         
         return Response({
-            'message': 'اشتراک با موفقیت خریداری شد',
-            'subscription': SubscriptionSerializer(subscription).data
-        }, status=status.HTTP_201_CREATED)
+            'date_from': params['date_from'],
+            'date_to': params['date_to'],
+            'totals': revenue_totals(revenue),
+            'revenue': DailyRevenueSerializer(revenue, many=True).data,
+            'subscribers': DailySubscribersSerializer(subscribers, many=True).data,
+        }, status=status.HTTP_200_OK)